@@ -22,4 +22,7 @@ setup(
     ],
     packages=find_packages('src'),
     package_dir={'': 'src'},
+    extras_require={
+        'numpy': ['numpy'],
+    },
 )
@@ -1,4 +1,35 @@
-from directorfile.common import Endianness, ParsingError
+from typing import TYPE_CHECKING
 
-from directorfile.projector import load_projector
-from directorfile.archive import load_director_archive
+if TYPE_CHECKING:
+    from directorfile.common import Endianness, LimitExceededError, ParsingError, ParsingLimits, ValidationLevel
+
+    from directorfile.projector import load_projector
+    from directorfile.archive import load_director_archive
+
+_LAZY_ATTRIBUTES = {
+    'Endianness': 'directorfile.common',
+    'LimitExceededError': 'directorfile.common',
+    'ParsingError': 'directorfile.common',
+    'ParsingLimits': 'directorfile.common',
+    'ValidationLevel': 'directorfile.common',
+    'load_projector': 'directorfile.projector',
+    'load_director_archive': 'directorfile.archive.director',
+}
+
+
+__all__ = list(_LAZY_ATTRIBUTES)
+
+
+def __getattr__(name):
+    module_name = _LAZY_ATTRIBUTES.get(name)
+    if module_name is None:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+    from importlib import import_module
+    value = getattr(import_module(module_name), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted({*globals(), *_LAZY_ATTRIBUTES})
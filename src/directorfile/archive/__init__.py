@@ -1,19 +1,53 @@
-from directorfile.archive.base import RIFXArchiveResource
-from directorfile.archive.director import DirectorArchiveResource
-from directorfile.archive.application import ApplicationArchiveResource
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from directorfile.archive.base import RIFXArchiveResource
+    from directorfile.archive.director import DirectorArchiveResource
+    from directorfile.archive.application import ApplicationArchiveResource
+
+    from directorfile.archive.director import load_director_archive
+
+_LAZY_ATTRIBUTES = {
+    'RIFXArchiveResource': 'directorfile.archive.base',
+    'DirectorArchiveResource': 'directorfile.archive.director',
+    'ApplicationArchiveResource': 'directorfile.archive.application',
+    'load_director_archive': 'directorfile.archive.director',
+}
+
+
+__all__ = list(_LAZY_ATTRIBUTES)
 
-from directorfile.archive.director import load_director_archive
+
+def __getattr__(name):
+    module_name = _LAZY_ATTRIBUTES.get(name)
+    if module_name is None:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+    from importlib import import_module
+    value = getattr(import_module(module_name), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted({*globals(), *_LAZY_ATTRIBUTES})
 
 
 def _init_parsers():
-    from directorfile.archive.base import RIFXArchiveResource
-    from directorfile.archive.director import DirectorArchiveParser
-    from directorfile.archive.shockwave import ShockwaveArchiveParser
+    from directorfile.archive.registry import register_parser, register_resource
+
+    register_parser('directorfile.archive.director:DirectorArchiveParser')
+    register_parser('directorfile.archive.shockwave:ShockwaveArchiveParser')
 
-    RIFXArchiveResource.PARSERS = [
-        DirectorArchiveParser,
-        ShockwaveArchiveParser
-    ]
+    register_resource('BITD', 'directorfile.archive.bitmap:BitmapResource')
+    register_resource('CASt', 'directorfile.archive.cast:CastMemberResource')
+    register_resource('CAS*', 'directorfile.archive.cast:CastTableResource')
+    register_resource('KEY*', 'directorfile.archive.cast:KeyTableResource')
+    register_resource('LctX', 'directorfile.archive.lingo:ScriptContextResource')
+    register_resource('Lctx', 'directorfile.archive.lingo:LegacyScriptContextResource')
+    register_resource('Lnam', 'directorfile.archive.lingo:NameTableResource')
+    register_resource('Lscr', 'directorfile.archive.lingo:ScriptResource')
+    register_resource('STXT', 'directorfile.archive.text:TextResource')
 
 
 _init_parsers()
@@ -4,12 +4,15 @@ import os
 import zlib
 from dataclasses import asdict, dataclass
 from enum import IntEnum
+from struct import pack, unpack_from
 from typing import BinaryIO, Dict, List, Optional, Sequence, Tuple, Type
 
 from directorfile.archive.base import FileResource, Resource
+from directorfile.archive.registry import ParserRegistry
 from directorfile.archive.director import DirectorArchiveParser, DirectorArchiveResource, DirectorArchiveSerializer, \
     MMapResource, RIFXArchiveResource
-from directorfile.common import Endianness, EndiannessAwareStream, ParsingError, calculate_alignment_remainder
+from directorfile.common import Endianness, EndiannessAwareStream, ParsingError, ParsingLimits, \
+    calculate_alignment_remainder
 
 
 class FileType(IntEnum):
@@ -46,18 +49,19 @@ class DictResource(Resource):
         header_offset = reader.get_current_pos()
         values_base = header_offset + values_chunk_offset
 
-        assert reader.read_ui32() == 0
-        assert reader.read_ui32() == 0
+        reader.expect_ui32(0)
+        reader.expect_ui32(0)
 
         length = reader.read_ui32()
         allocated_length = reader.read_ui32()
-        assert allocated_length >= length
+        reader.check(allocated_length >= length, f'Dict length {length} exceeds allocated {allocated_length}')
+        reader.limits.check_entries(allocated_length, DictResource.ENTRY_WIDTH, size - 8 - DictResource.HEADER_SIZE)
 
-        assert reader.read_ui16() == DictResource.HEADER_SIZE
-        assert reader.read_ui16() == DictResource.ENTRY_WIDTH
+        reader.expect_ui16(DictResource.HEADER_SIZE, 'Dict header size')
+        reader.expect_ui16(DictResource.ENTRY_WIDTH, 'Dict entry width')
 
-        assert reader.read_ui32() == 0
-        assert reader.read_ui32() == 0
+        reader.expect_ui32(0)
+        reader.expect_ui32(0)
 
         pairs = []
         for i in range(length):
@@ -66,22 +70,24 @@ class DictResource(Resource):
             pairs.append((key, value_offset))
 
         reader.skip(8 * (allocated_length - length))
-        assert reader.get_current_pos() == values_base
+        reader.check(reader.get_current_pos() == values_base, 'Dict values do not follow its entries')
+        reader.jump(values_base)
 
-        assert reader.read_ui32() == 0
-        assert reader.read_ui32() == 0
+        reader.expect_ui32(0)
+        reader.expect_ui32(0)
 
         values_chunk_used = reader.read_ui32()
-        assert values_chunk_used <= values_chunk_size
+        reader.check(values_chunk_used <= values_chunk_size,
+                     f'Dict values use {values_chunk_used} bytes out of {values_chunk_size}')
 
-        assert reader.read_ui32() == values_chunk_size
-        assert reader.read_ui32() == 20
+        reader.expect_ui32(values_chunk_size, 'Dict values size')
+        reader.expect_ui32(20, 'Dict values header size')
 
         mapping = {}
         for key, value_offset in pairs:
-            assert key not in mapping
+            reader.check(key not in mapping, f'Duplicate Dict key {key}')
             reader.jump(values_base + value_offset)
-            value = reader.read_string()
+            value = reader.read_string(values_chunk_size)
             mapping[key] = value
         self.mapping = mapping
 
@@ -154,9 +160,10 @@ class ListResource(Resource):
         reader.skip(8)
         length = reader.read_ui32()
         allocated_length = reader.read_ui32()
-        assert allocated_length >= length
-        assert reader.read_ui16() == 0x14
-        assert reader.read_ui16() == 0x08
+        reader.check(allocated_length >= length, f'List length {length} exceeds allocated {allocated_length}')
+        reader.limits.check_entries(length, ListResource.ENTRY_WIDTH, size - ListResource.HEADER_SIZE)
+        reader.expect_ui16(ListResource.HEADER_SIZE, 'List header size')
+        reader.expect_ui16(ListResource.ENTRY_WIDTH, 'List entry width')
 
         pairs = []
         for i in range(length):
@@ -184,50 +191,84 @@ class BadDResource(DictResource):
     TAG = 'BadD'
 
 
+# The header following the RIFF chunk header of an Xtra, up to its compressed data
+@dataclass
+class XtraHeader:
+    KIND = b'XtraFILE'
+    FORMAT = '8sII8xI4xI4x'
+    SIZE = 0x28
+    INNER_SIZE = 0x1c
+
+    kind: bytes
+    headered_size: int
+    header_size: int
+    uncompressed_size: int
+    compressed_size: int
+
+    @classmethod
+    def create(cls, uncompressed_size: int, compressed_size: int) -> XtraHeader:
+        return cls(cls.KIND, compressed_size + cls.INNER_SIZE, cls.INNER_SIZE, uncompressed_size, compressed_size)
+
+    @classmethod
+    def unpack(cls, data: bytes, endianness: Endianness = Endianness.BIG_ENDIAN, offset: int = 0) -> XtraHeader:
+        return cls(*unpack_from(endianness + cls.FORMAT, data, offset))
+
+    def pack(self, endianness: Endianness = Endianness.BIG_ENDIAN) -> bytes:
+        return pack(endianness + self.FORMAT, self.kind, self.headered_size, self.header_size, self.uncompressed_size,
+                    self.compressed_size)
+
+    def problems(self) -> List[str]:
+        problems = []
+        if self.kind != XtraHeader.KIND:
+            problems.append(f'Unexpected Xtra header {self.kind!r}')
+        if self.header_size != XtraHeader.INNER_SIZE:
+            problems.append(f'Unexpected Xtra header size {self.header_size}')
+        if self.headered_size != self.compressed_size + self.header_size:
+            problems.append(f'Xtra compressed size {self.compressed_size} disagrees with its headered size '
+                            f'{self.headered_size}')
+        return problems
+
+    def fits(self, chunk_size: int) -> bool:
+        return XtraHeader.SIZE + self.compressed_size <= chunk_size
+
+
 class RIFFXtraFileResource(FileResource):
     TAG = 'RIFF'
 
-    HEADER_SIZE = 0x1c
+    HEADER_SIZE = XtraHeader.INNER_SIZE
+    FULL_HEADER_SIZE = XtraHeader.SIZE
 
     def _parse(self, reader: EndiannessAwareStream, size: int):
-        assert reader.read_tag() == 'Xtra'
-        assert reader.read_tag() == 'FILE'
-
-        headered_size = reader.read_ui32()
-        header_size = reader.read_ui32()
-        assert header_size == RIFFXtraFileResource.HEADER_SIZE
-
-        reader.skip(8)
-        uncompressed_size = reader.read_ui32()
-        reader.skip(4)
-        compressed_size = reader.read_ui32()
-        reader.skip(4)
-
-        assert headered_size == compressed_size + header_size
-
-        self.data = zlib.decompress(reader.read_buffer(compressed_size))
-
-        assert len(self.data) == uncompressed_size
+        header_position = reader.get_current_pos()
+        if size < XtraHeader.SIZE:
+            raise ParsingError(f'Xtra chunk of {size} bytes is shorter than its header', header_position)
+        header = XtraHeader.unpack(reader.read_buffer(XtraHeader.SIZE), reader.endianness)
+        problems = header.problems()
+        reader.check(not problems, '; '.join(problems), header_position)
+        if not header.fits(size):
+            raise ParsingError(f'Xtra compressed size {header.compressed_size} exceeds its chunk', header_position)
+
+        uncompressed_size, compressed_size = header.uncompressed_size, header.compressed_size
+        reader.limits.check_decompressed(uncompressed_size)
+        reader.context.consume(compressed_size + uncompressed_size)
+
+        # Decompression stops at the declared size, so a lying header cannot inflate the output. A length of 0 means
+        # no limit to zlib, so at least one byte is requested and an empty Xtra must end right away
+        decompressor = zlib.decompressobj()
+        data_position = reader.get_current_pos()
+        self.data = decompressor.decompress(reader.read_buffer(compressed_size), max(uncompressed_size, 1))
+
+        if not decompressor.eof or decompressor.unconsumed_tail:
+            raise ParsingError(f'Xtra data does not end within {uncompressed_size} bytes', data_position)
+        reader.check(len(self.data) == uncompressed_size,
+                     f'Xtra data does not decompress to {uncompressed_size} bytes', data_position)
 
     def save(self, fp: BinaryIO, endianness: Endianness, position: Optional[int] = None) -> int:
         return super().save(fp, Endianness.BIG_ENDIAN, position)
 
     def _serialize(self, writer: EndiannessAwareStream) -> None:
-        writer.write_tag('Xtra')
-        writer.write_tag('FILE')
-
         compressed_data = zlib.compress(self.data)
-
-        writer.write_ui32(len(compressed_data) + RIFFXtraFileResource.HEADER_SIZE)
-        writer.write_ui32(RIFFXtraFileResource.HEADER_SIZE)
-
-        writer.write_ui32(0)
-        writer.write_ui32(0)
-        writer.write_ui32(len(self.data))
-        writer.write_ui32(0)
-        writer.write_ui32(len(compressed_data))
-        writer.write_ui32(0)
-
+        writer.write_buffer(XtraHeader.create(len(self.data), len(compressed_data)).pack(writer.endianness))
         writer.write_buffer(compressed_data)
 
 
@@ -252,41 +293,36 @@ class ApplicationArchiveParser(DirectorArchiveParser):
 
     def parse(self):
         super().parse()
-        entries = self._mmap.entries
-
-        list_entry = entries[3]
-        assert list_entry.tag == 'List'
-        file_type_list = self._fetch_resource(list_entry)
-        assert isinstance(file_type_list, ListResource)
 
-        dict_entry = entries[4]
-        assert dict_entry.tag == 'Dict'
-        filename_dict = self._fetch_resource(dict_entry)
-        assert isinstance(filename_dict, DictResource)
-
-        badd_entry = entries[5]
-        assert badd_entry.tag == 'BadD'
-        badd_dict = self._fetch_resource(badd_entry)
-        assert isinstance(badd_dict, DictResource)
+        file_type_list = self._fetch_table(3, ListResource)
+        filename_dict = self._fetch_table(4, DictResource)
+        badd_dict = self._fetch_table(5, BadDResource)
 
         files = []
-        for i, (entry_index, file_type) in enumerate(file_type_list.members):
-            entry = entries[entry_index]
-
-            assert entry.tag == 'File'
-
-            filename = filename_dict.mapping[i]
+        for entry_index, (filename, file_type) in _file_table(self._mmap, file_type_list, filename_dict).items():
+            self._check_entry_tag(self._mmap, entry_index, 'File')
 
-            file_resource = self._fetch_resource(entry)
-
-            assert isinstance(file_resource, FileResource)
+            file_resource = self._fetch_resource(self._mmap.entries[entry_index])
             file_resource.filename = filename
 
-            files.append(FileRecord(filename, FileType(file_type), file_resource))
+            files.append(FileRecord(filename, file_type, file_resource))
 
         self.files = files
         self.badd = badd_dict.mapping
 
+    def _fetch_table(self, index: int, resource_class: Type[Resource]) -> Resource:
+        self._check_entry_tag(self._mmap, index, resource_class.TAG)
+        resource = self._fetch_resource(self._mmap.entry(index))
+        if not isinstance(resource, resource_class):
+            raise ParsingError(f'Expected mmap entry {index} to be {resource_class.TAG}, got {resource.TAG}')
+        return resource
+
+    def _chunk_span(self, entry: MMapResource.Entry) -> Tuple[int, int]:
+        # File entries count their own header in the size
+        if entry.tag == 'File':
+            return entry.position, entry.size
+        return super()._chunk_span(entry)
+
     def _reconstruct_resource(self, entry: MMapResource.Entry):
         fp = self._reader.fp
 
@@ -295,19 +331,19 @@ class ApplicationArchiveParser(DirectorArchiveParser):
         size = entry.size
 
         if tag == 'File':
+            fp.seek(position)
+            file_tag = fp.read(4).decode('latin-1')
             for resource_class in self.FILE_RESOURCE_CLASSES:
-                try:
-                    return resource_class().load(fp=fp, position=position, size=size)
-                except ParsingError:
-                    pass
+                if file_tag in (resource_class.TAG, resource_class.TAG[::-1]):
+                    return self._load_resource(resource_class(), position, size)
             else:
                 fp.seek(position)
-                raise ParsingError(f"Unknown file header: {fp.read(12)}")
+                raise ParsingError(f"Unknown file header: {fp.read(12)}", position)
         else:
             resource_class = self.RESOURCE_CLASSES.get(tag)
             if resource_class is None:
-                raise ParsingError(f"Unknown resource type '{tag}'")
-            return resource_class().load(fp=fp, position=position, size=size)
+                raise ParsingError(f"Unknown resource type '{tag}'", position)
+            return self._load_resource(resource_class(), position, size)
 
 
 class ApplicationArchiveSerializer(DirectorArchiveSerializer):
@@ -344,8 +380,8 @@ class ApplicationArchiveSerializer(DirectorArchiveSerializer):
 
         self._serialize_resources(stream, 'APPL', resources)
 
-    def _generate_entries(self, stream, resources):
-        entries = super()._generate_entries(stream, resources)
+    def _generate_entries(self, stream, resources, order=None):
+        entries = super()._generate_entries(stream, resources, order)
         for entry in entries:
             if entry.tag in ('RIFF', 'RIFX'):
                 entry.tag = 'File'
@@ -353,8 +389,30 @@ class ApplicationArchiveSerializer(DirectorArchiveSerializer):
         return entries
 
 
+def _file_table(mmap: MMapResource, file_type_list: ListResource,
+                filename_dict: DictResource) -> Dict[int, Tuple[str, FileType]]:
+    table = {}
+    for i, (entry_index, file_type) in enumerate(file_type_list.members):
+        mmap.entry(entry_index)
+        if i not in filename_dict.mapping:
+            raise ParsingError(f'File {i} has no name in the Dict')
+        try:
+            file_type = FileType(file_type)
+        except ValueError:
+            raise ParsingError(f'Unknown type {file_type} of file {i}')
+        table[entry_index] = (filename_dict.mapping[i], file_type)
+    return table
+
+
+def load_file_table(fp: BinaryIO, mmap: MMapResource,
+                    limits: Optional[ParsingLimits] = None) -> Dict[int, Tuple[str, FileType]]:
+    file_type_list = ListResource().load(fp, mmap.entry(3).position, limits=limits)
+    filename_dict = DictResource().load(fp, mmap.entry(4).position, limits=limits)
+    return _file_table(mmap, file_type_list, filename_dict)
+
+
 class ApplicationArchiveResource(RIFXArchiveResource):
-    PARSERS = [ApplicationArchiveParser]
+    PARSERS = ParserRegistry([ApplicationArchiveParser])
 
     _parser: ApplicationArchiveParser
     xtras: List[Tuple[str, RIFFXtraFileResource]]
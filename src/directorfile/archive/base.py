@@ -1,23 +1,34 @@
 from __future__ import annotations
 
 from abc import ABCMeta, abstractmethod
-from typing import BinaryIO, Optional, Sequence, Type
+from typing import TYPE_CHECKING, BinaryIO, Optional, Tuple
 
-from directorfile.common import Endianness, EndiannessAwareStream, ParsingError
+from directorfile.archive.registry import ARCHIVE_PARSERS, ParserRegistry
+from directorfile.common import Endianness, EndiannessAwareStream, ParsingContext, ParsingError, ParsingLimits, \
+    ValidationLevel, buffered_writer
+
+if TYPE_CHECKING:
+    from directorfile.archive.cache import ResourceCache
 
 
 class Resource(metaclass=ABCMeta):
     def __repr__(self):
         return f'<{type(self).__qualname__} at {hex(id(self))}>'
 
-    def load(self, fp: BinaryIO, position: Optional[int] = None, size: int = 0) -> Resource:
+    def load(self, fp: BinaryIO, position: Optional[int] = None, size: int = 0,
+             limits: Optional[ParsingLimits] = None, validation: ValidationLevel = ValidationLevel.STRICT,
+             context: Optional[ParsingContext] = None) -> Resource:
         if position is not None:
             fp.seek(position)
 
         reader = self.parse_tag(fp)
+        reader.context = context if context is not None else ParsingContext(limits)
+        reader.validation = validation
         data_size = reader.read_ui32()
-        if size:
-            assert size >= data_size
+        # The entry's range is the one checked against the archive bounds, so this holds at every validation level
+        if size and data_size > size:
+            raise ParsingError(f'{self.TAG} chunk of {data_size} bytes exceeds its {size} bytes entry',
+                               reader.get_current_pos() - 4)
         return self.parse(reader, data_size)
 
     def parse(self, reader: EndiannessAwareStream, size: int) -> Resource:
@@ -42,15 +53,15 @@ class Resource(metaclass=ABCMeta):
         if position is not None:
             fp.seek(position)
 
-        stream = EndiannessAwareStream(fp, endianness)
-        stream.skip(8)
+        with buffered_writer(fp, endianness) as stream:
+            stream.skip(8)
 
-        start = stream.get_current_pos()
-        self.serialize(stream)
-        size = stream.get_current_pos() - start
-        stream.jump(start - 8)
-        self.serialize_header(stream, size)
-        stream.skip(size)
+            start = stream.get_current_pos()
+            self.serialize(stream)
+            size = stream.get_current_pos() - start
+            stream.jump(start - 8)
+            self.serialize_header(stream, size)
+            stream.skip(size)
 
         return size
 
@@ -76,9 +87,17 @@ class Resource(metaclass=ABCMeta):
 
 
 class ArchiveParser(metaclass=ABCMeta):
-    def __init__(self, archive: RIFXArchiveResource, reader: EndiannessAwareStream):
+    bounds: Tuple[int, int]
+
+    def __init__(self, archive: RIFXArchiveResource, reader: EndiannessAwareStream,
+                 bounds: Optional[Tuple[int, int]] = None):
         self.archive = archive
         self._reader = reader
+        self.bounds = bounds if bounds is not None else (0, 0xffffffff)
+
+    def _load_resource(self, resource: Resource, position: int, size: int = 0) -> Resource:
+        return resource.load(self._reader.fp, position, size, validation=self._reader.validation,
+                             context=self._reader.context)
 
     @abstractmethod
     def parse(self):
@@ -95,9 +114,14 @@ class ArchiveSerializer(metaclass=ABCMeta):
         self.endianness = endianness
         self.director_version = director_version
 
-    def serialize(self, fp: BinaryIO, archive: RIFXArchiveResource):
-        stream = EndiannessAwareStream(fp, self.endianness)
-        self._serialize(stream, archive)
+    def serialize(self, fp: BinaryIO, archive: RIFXArchiveResource, buffered: bool = True):
+        # Unbuffered serialization writes every resource straight to fp, for resources streamed from other files
+        if not buffered:
+            self._serialize(EndiannessAwareStream(fp, self.endianness), archive)
+            return
+
+        with buffered_writer(fp, self.endianness) as stream:
+            self._serialize(stream, archive)
 
     @abstractmethod
     def _serialize(self, stream: EndiannessAwareStream, archive: RIFXArchiveResource):
@@ -122,22 +146,24 @@ class FileResource(Resource, metaclass=ABCMeta):
 class RIFXArchiveResource(FileResource):
     TAG = 'RIFX'
 
-    PARSERS: Sequence[Type[ArchiveParser]] = tuple()
+    PARSERS: ParserRegistry = ARCHIVE_PARSERS
+
+    resource_cache: Optional[ResourceCache] = None
 
     _parser: ArchiveParser
 
     def _parse(self, reader: EndiannessAwareStream, size: int) -> None:
+        start = reader.get_current_pos() - 8
         tag = reader.read_tag()
 
-        for parser_class in self.PARSERS:
-            if tag in parser_class.TYPES:
-                parser = parser_class(self, reader)
-                break
-        else:
+        parser_class = self.PARSERS.get(tag)
+        if parser_class is None:
             raise ParsingError(f'Could not find parser for a {tag} archive')
+        parser = parser_class(self, reader, (start, start + 8 + size))
 
         self._parser = parser
-        parser.parse()
+        with reader.context.nested():
+            parser.parse()
 
     def _serialize(self, writer: EndiannessAwareStream) -> None:
         raise NotImplementedError('Not directly serializable')
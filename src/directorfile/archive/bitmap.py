@@ -0,0 +1,222 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from operator import or_
+from typing import Dict, Mapping, Optional, Sequence, Tuple
+
+from directorfile.archive.director import DirectorArchiveResource, GenericResource
+from directorfile.common import ParsingError
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+Palette = Sequence[Tuple[int, int, int]]
+INDEXED_BIT_DEPTHS = (1, 2, 4, 8)
+SUPPORTED_BIT_DEPTHS = (*INDEXED_BIT_DEPTHS, 16, 32)
+RUN_JUMP_LEVELS = 5
+
+
+@dataclass
+class BitmapFormat:
+    width: int
+    height: int
+    bit_depth: int = 8
+    palette: Optional[Palette] = None
+
+    @property
+    def pitch(self) -> int:
+        # Rows are padded to 16-bit boundaries
+        return (self.width * self.bit_depth + 15) // 16 * 2
+
+    @property
+    def channels(self) -> int:
+        if self.bit_depth == 32:
+            return 4
+        if self.bit_depth == 16 or self.palette is not None:
+            return 3
+        return 1
+
+
+class BitmapResource(GenericResource):
+    TAG = 'BITD'
+
+    def __init__(self):
+        super().__init__(BitmapResource.TAG)
+
+    def __repr__(self):
+        return f'<BitmapResource ({len(self.data)} bytes) at {hex(id(self))}>'
+
+    def expand(self, bitmap_format: BitmapFormat) -> bytes:
+        expected_size = bitmap_format.pitch * bitmap_format.height
+        if len(self.data) == expected_size:
+            return self.data
+
+        if numpy is not None:
+            expanded = _expand_array(self.data, expected_size)
+        else:
+            expanded = _expand_buffer(self.data)
+        if len(expanded) < expected_size:
+            expanded += bytes(expected_size - len(expanded))
+        return expanded[:expected_size]
+
+    def decode(self, bitmap_format: BitmapFormat):
+        if bitmap_format.bit_depth not in SUPPORTED_BIT_DEPTHS:
+            raise ParsingError(f'Unsupported bitmap bit depth {bitmap_format.bit_depth}')
+
+        expanded = self.expand(bitmap_format)
+        if numpy is not None:
+            return _decode_array(expanded, bitmap_format)
+        return _decode_buffer(expanded, bitmap_format)
+
+
+# PackBits runs: a control byte below 0x80 copies the next control + 1 bytes, otherwise the next byte is repeated
+# 0x101 - control times
+def _expand_buffer(data: bytes) -> bytes:
+    pieces = []
+    position = 0
+    data_size = len(data)
+    while position < data_size:
+        control = data[position]
+        position += 1
+        if control < 0x80:
+            pieces.append(data[position:position + control + 1])
+            position += control + 1
+        else:
+            pieces.append(data[position:position + 1] * (0x101 - control))
+            position += 1
+    return b''.join(pieces)
+
+
+def _expand_array(data: bytes, expected_size: int) -> bytes:
+    data_size = len(data)
+    if not data_size:
+        return b''
+    values = numpy.frombuffer(data, dtype=numpy.uint8)
+    following = numpy.arange(2, data_size + 3, dtype=numpy.intp)
+    following[:-1] += numpy.where(values < 0x80, values, 0)
+    numpy.minimum(following, data_size, out=following)
+
+    # The run starts form a chain from the first byte. jumps[k] skips 2 ** k runs, so the chain is walked in steps of
+    # 2 ** RUN_JUMP_LEVELS runs and then filled in level by level
+    jumps = [following]
+    for _ in range(RUN_JUMP_LEVELS):
+        jumps.append(numpy.take(jumps[-1], jumps[-1]))
+    far = jumps.pop()
+    starts = []
+    position = 0
+    while position < data_size:
+        starts.append(position)
+        position = far.item(position)
+    starts = numpy.array(starts, dtype=numpy.intp)
+    for jump in reversed(jumps):
+        starts = numpy.stack((starts, numpy.take(jump, starts)), axis=1).ravel()
+    starts = starts[starts < data_size]
+
+    # Runs past the expected size are not expanded
+    controls = values[starts].astype(numpy.intp)
+    literal = controls < 0x80
+    last = numpy.searchsorted(numpy.cumsum(numpy.where(literal, controls + 1, 0x101 - controls)), expected_size)
+    end = following[starts[last]] if last < len(starts) else data_size
+
+    # Every byte is repeated once, except for control bytes and the values of repeated runs
+    counts = numpy.ones(end, dtype=numpy.intp)
+    counts[starts[starts < end]] = 0
+    repeated = starts[~literal] + 1
+    repeated = repeated[repeated < end]
+    counts[repeated] = 0x101 - controls[~literal][:len(repeated)]
+    return numpy.repeat(values[:end], counts).tobytes()
+
+
+def _decode_array(expanded: bytes, bitmap_format: BitmapFormat):
+    width, height, bit_depth = bitmap_format.width, bitmap_format.height, bitmap_format.bit_depth
+    rows = numpy.frombuffer(expanded, dtype=numpy.uint8).reshape(height, bitmap_format.pitch)
+
+    if bit_depth == 32:
+        planes = rows[:, :width * 4].reshape(height, 4, width)
+        return numpy.ascontiguousarray(planes[:, (1, 2, 3, 0), :].transpose(0, 2, 1))
+
+    if bit_depth == 16:
+        planes = rows[:, :width * 2].reshape(height, 2, width).astype(numpy.uint16)
+        color = (planes[:, 0] << 8) | planes[:, 1]
+        channels = numpy.stack(((color >> 10) & 0x1f, (color >> 5) & 0x1f, color & 0x1f), axis=-1)
+        return ((channels << 3) | (channels >> 2)).astype(numpy.uint8)
+
+    if bit_depth == 8:
+        indices = rows[:, :width]
+    else:
+        pixels_per_byte = 8 // bit_depth
+        shifts = numpy.arange(8 - bit_depth, -1, -bit_depth, dtype=numpy.uint8)
+        unpacked = (rows[:, :, None] >> shifts) & ((1 << bit_depth) - 1)
+        indices = unpacked.reshape(height, bitmap_format.pitch * pixels_per_byte)[:, :width]
+
+    if bitmap_format.palette is None:
+        return numpy.ascontiguousarray(indices)
+    colors = numpy.zeros((256, 3), dtype=numpy.uint8)
+    palette = numpy.asarray(bitmap_format.palette, dtype=numpy.uint8).reshape(-1, 3)[:256]
+    colors[:len(palette)] = palette
+    return colors[indices]
+
+
+def _expand_channel_table(bits: int, shift: int, mask: int) -> bytes:
+    return bytes(((value >> shift) & mask) << (8 - bits) | ((value >> shift) & mask) >> (2 * bits - 8)
+                 for value in range(256))
+
+
+_RED_TABLE = _expand_channel_table(5, 2, 0x1f)
+_LOW_BITS_TABLE = _expand_channel_table(5, 0, 0x1f)
+_GREEN_HIGH_TABLE = bytes((value & 0x03) << 3 for value in range(256))
+_GREEN_LOW_TABLE = bytes(value >> 5 for value in range(256))
+
+
+def _decode_buffer(expanded: bytes, bitmap_format: BitmapFormat) -> memoryview:
+    width, height, bit_depth, pitch = (bitmap_format.width, bitmap_format.height, bitmap_format.bit_depth,
+                                       bitmap_format.pitch)
+    channels = bitmap_format.channels
+
+    def plane(index: int, plane_width: int = width) -> bytes:
+        return b''.join(expanded[y * pitch + index * plane_width:y * pitch + (index + 1) * plane_width]
+                        for y in range(height))
+
+    output = bytearray(width * height * channels)
+    if bit_depth == 32:
+        for channel, plane_index in enumerate((1, 2, 3, 0)):
+            output[channel::4] = plane(plane_index)
+    elif bit_depth == 16:
+        high, low = plane(0), plane(1)
+        output[0::3] = high.translate(_RED_TABLE)
+        green = bytes(map(or_, high.translate(_GREEN_HIGH_TABLE), low.translate(_GREEN_LOW_TABLE)))
+        output[1::3] = green.translate(_LOW_BITS_TABLE)
+        output[2::3] = low.translate(_LOW_BITS_TABLE)
+    else:
+        if bit_depth == 8:
+            indices = plane(0)
+        else:
+            pixels_per_byte = 8 // bit_depth
+            mask = (1 << bit_depth) - 1
+            table = [bytes((value >> shift) & mask for shift in range(8 - bit_depth, -1, -bit_depth))
+                     for value in range(256)]
+            unpacked = b''.join(map(table.__getitem__, expanded))
+            row_size = pitch * pixels_per_byte
+            indices = b''.join(unpacked[y * row_size:y * row_size + width] for y in range(height))
+
+        if bitmap_format.palette is None:
+            output[:] = indices
+        else:
+            # Indices past the end of a short palette are black, as in the array decoder
+            colors = [bytes(color) for color in bitmap_format.palette][:256]
+            colors += [bytes(3)] * (256 - len(colors))
+            output[:] = b''.join(map(colors.__getitem__, indices))
+
+    return memoryview(output).cast('B', (height, width, channels) if channels > 1 else (height, width))
+
+
+def decode_bitmaps(archive: DirectorArchiveResource, formats: Mapping[int, BitmapFormat]) -> Dict[int, object]:
+    bitmaps = {}
+    for index, bitmap_format in formats.items():
+        resource = archive.resources[index]
+        if not isinstance(resource, BitmapResource):
+            raise ParsingError(f'Resource {index} is not a bitmap')
+        bitmaps[index] = resource.decode(bitmap_format)
+    return bitmaps
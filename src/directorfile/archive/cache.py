@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Hashable, Optional
+
+from directorfile.archive.base import Resource
+
+
+@dataclass
+class CacheStatistics:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    size: int = 0
+
+
+class ResourceCache:
+    budget: Optional[int]
+    statistics: CacheStatistics
+
+    _pinned: Dict[Hashable, Resource]
+    _evictable: OrderedDict[Hashable, Resource]
+    _sizes: Dict[Hashable, int]
+
+    def __init__(self, budget: Optional[int] = None):
+        self.budget = budget
+        self.statistics = CacheStatistics()
+        self._pinned = {}
+        self._evictable = OrderedDict()
+        self._sizes = {}
+
+    def __repr__(self):
+        budget = 'unbounded' if self.budget is None else f'{self.statistics.size}/{self.budget} bytes'
+        return f'<{type(self).__qualname__} ({budget}) at {hex(id(self))}>'
+
+    def __len__(self):
+        return len(self._pinned) + len(self._evictable)
+
+    def get(self, key: Hashable) -> Optional[Resource]:
+        resource = self._pinned.get(key)
+        if resource is None:
+            resource = self._evictable.get(key)
+            if resource is not None:
+                self._evictable.move_to_end(key)
+
+        if resource is None:
+            self.statistics.misses += 1
+        else:
+            self.statistics.hits += 1
+        return resource
+
+    def put(self, key: Hashable, resource: Resource, size: int = 0, evictable: bool = True):
+        self.discard(key)
+
+        if not evictable:
+            self._pinned[key] = resource
+            return
+
+        self._evictable[key] = resource
+        self._sizes[key] = size
+        self.statistics.size += size
+        self._evict()
+
+    def discard(self, key: Hashable):
+        self._pinned.pop(key, None)
+        if self._evictable.pop(key, None) is not None:
+            self.statistics.size -= self._sizes.pop(key)
+
+    def clear(self):
+        self._pinned.clear()
+        self._evictable.clear()
+        self._sizes.clear()
+        self.statistics.size = 0
+
+    def _evict(self):
+        if self.budget is None:
+            return
+
+        # The most recently used resource is kept even if it exceeds the budget on its own
+        while self.statistics.size > self.budget and len(self._evictable) > 1:
+            key, _ = self._evictable.popitem(last=False)
+            self.statistics.size -= self._sizes.pop(key)
+            self.statistics.evictions += 1
+
+
+def estimate_resource_size(resource: Resource, stored_size: int) -> int:
+    data = getattr(resource, 'data', None)
+    if isinstance(data, (bytes, bytearray)):
+        return max(len(data), stored_size)
+    return stored_size
@@ -0,0 +1,231 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from enum import IntEnum
+from struct import unpack
+from typing import Dict, List, Optional
+
+from directorfile.archive.base import Resource
+from directorfile.archive.director import DirectorArchiveResource, GenericResource
+from directorfile.common import Endianness, EndiannessAwareStream, ParsingError
+
+
+class CastMemberType(IntEnum):
+    NULL = 0
+    BITMAP = 1
+    FILM_LOOP = 2
+    TEXT = 3
+    PALETTE = 4
+    PICTURE = 5
+    SOUND = 6
+    BUTTON = 7
+    SHAPE = 8
+    MOVIE = 9
+    DIGITAL_VIDEO = 10
+    SCRIPT = 11
+    RICH_TEXT = 12
+    OLE = 13
+    TRANSITION = 14
+    XTRA = 15
+
+
+class KeyTableResource(Resource):
+    TAG = 'KEY*'
+
+    HEADER_SIZE = 0x0c
+    ENTRY_WIDTH = 0x0c
+
+    entries: List["KeyTableResource.Entry"]
+    allocated_length: int
+    reserved: bytes
+
+    def __init__(self, entries: List["KeyTableResource.Entry"] = None, allocated_length: int = 0):
+        if entries:
+            self.entries = list(entries)
+        else:
+            self.entries = []
+        self.allocated_length = allocated_length
+        self.reserved = b''
+
+    def _parse(self, reader: EndiannessAwareStream, size: int):
+        if size < KeyTableResource.HEADER_SIZE:
+            raise ParsingError('KEY* chunk is shorter than its header', reader.get_current_pos())
+        reader.expect_ui16(KeyTableResource.HEADER_SIZE, 'KEY* header size')
+        reader.expect_ui16(KeyTableResource.ENTRY_WIDTH, 'KEY* entry width')
+
+        allocated_length = reader.read_ui32()
+        length = reader.read_ui32()
+        if allocated_length < length:
+            raise ParsingError(f'KEY* length {length} exceeds allocated {allocated_length}', reader.get_current_pos())
+        reader.limits.check_entries(length, KeyTableResource.ENTRY_WIDTH, size - KeyTableResource.HEADER_SIZE)
+
+        entries = []
+        for i in range(length):
+            index = reader.read_ui32()
+            owner = reader.read_ui32()
+            tag = reader.read_tag()
+            entries.append(KeyTableResource.Entry(index=index, owner=owner, tag=tag))
+        self.entries = entries
+        self.allocated_length = allocated_length
+        # Whatever follows the used entries, such as unused allocated slots, is kept so the table round-trips
+        self.reserved = reader.read_buffer(size - KeyTableResource.HEADER_SIZE - length * KeyTableResource.ENTRY_WIDTH)
+
+    def _serialize(self, writer: EndiannessAwareStream) -> None:
+        writer.write_ui16(KeyTableResource.HEADER_SIZE)
+        writer.write_ui16(KeyTableResource.ENTRY_WIDTH)
+
+        writer.write_ui32(max(self.allocated_length, len(self.entries)))
+        writer.write_ui32(len(self.entries))
+
+        for entry in self.entries:
+            writer.write_ui32(entry.index)
+            writer.write_ui32(entry.owner)
+            writer.write_tag(entry.tag)
+        writer.write_buffer(self.reserved)
+
+    @dataclass
+    class Entry:
+        index: int
+        owner: int
+        tag: str
+
+        def __repr__(self):
+            return f'<KEY* Entry for "{self.tag}" #{self.index} owned by #{self.owner}>'
+
+
+class CastTableResource(Resource):
+    TAG = 'CAS*'
+
+    member_indices: List[int]
+
+    def __init__(self, member_indices: List[int] = None):
+        if member_indices:
+            self.member_indices = list(member_indices)
+        else:
+            self.member_indices = []
+
+    def _parse(self, reader: EndiannessAwareStream, size: int):
+        reader.limits.check_entries(size // 4, 4, size)
+
+        # The table is big-endian regardless of the archive
+        reader = EndiannessAwareStream(reader.fp, Endianness.BIG_ENDIAN)
+        self.member_indices = [reader.read_ui32() for i in range(size // 4)]
+
+    def _serialize(self, writer: EndiannessAwareStream) -> None:
+        writer = EndiannessAwareStream(writer.fp, Endianness.BIG_ENDIAN)
+        for index in self.member_indices:
+            writer.write_ui32(index)
+
+
+class CastMemberResource(GenericResource):
+    TAG = 'CASt'
+
+    HEADER_SIZE = 0x0c
+
+    member_type: Optional[CastMemberType]
+    info: bytes
+    specific_data: bytes
+
+    def __init__(self):
+        super().__init__(CastMemberResource.TAG)
+        self.member_type = None
+        self.info = b''
+        self.specific_data = b''
+
+    def __repr__(self):
+        member_type = self.member_type.name if self.member_type is not None else 'unknown'
+        return f'<CastMemberResource ({member_type}) at {hex(id(self))}>'
+
+    def _parse(self, reader: EndiannessAwareStream, size: int) -> None:
+        super()._parse(reader, size)
+
+        # Only the Director 5+ layout is decoded, older members are kept as raw data
+        if size < CastMemberResource.HEADER_SIZE:
+            return
+        member_type, info_size, specific_data_size = unpack('>III', self.data[:CastMemberResource.HEADER_SIZE])
+        if CastMemberResource.HEADER_SIZE + info_size + specific_data_size != size:
+            return
+
+        try:
+            self.member_type = CastMemberType(member_type)
+        except ValueError:
+            return
+        info_end = CastMemberResource.HEADER_SIZE + info_size
+        self.info = self.data[CastMemberResource.HEADER_SIZE:info_end]
+        self.specific_data = self.data[info_end:]
+
+
+@dataclass
+class CastMemberRecord:
+    number: int
+    library: int
+    index: int
+    chunks: Dict[int, str] = field(default_factory=dict)
+
+    def __repr__(self):
+        return f'<Cast member {self.number} of library {self.library} (#{self.index}, {len(self.chunks)} chunks)>'
+
+
+class CastIndex:
+    archive: DirectorArchiveResource
+    libraries: Dict[int, Dict[int, CastMemberRecord]]
+
+    _owners: Dict[int, CastMemberRecord]
+
+    def __init__(self, archive: DirectorArchiveResource, first_member: int = 1):
+        self.archive = archive
+        self.libraries = {}
+        self._owners = {}
+        self._build(first_member)
+
+    def __repr__(self):
+        return f'<CastIndex ({sum(map(len, self.libraries.values()))} members) at {hex(id(self))}>'
+
+    def _build(self, first_member: int):
+        key_table_indices = self.archive.find_resources(KeyTableResource.TAG)
+        if not key_table_indices:
+            raise ParsingError('Archive has no KEY* table')
+        key_table = self.archive.resources[key_table_indices[0]]
+        if not isinstance(key_table, KeyTableResource):
+            raise ParsingError(f'Resource {key_table_indices[0]} is not a valid KEY* table')
+
+        owned_chunks: Dict[int, Dict[int, str]] = {}
+        for entry in key_table.entries:
+            owned_chunks.setdefault(entry.owner, {})[entry.index] = entry.tag
+
+        for entry in key_table.entries:
+            if entry.tag != CastTableResource.TAG:
+                continue
+
+            cast_table = self.archive.resources.get(entry.index)
+            if not isinstance(cast_table, CastTableResource):
+                raise ParsingError(f'KEY* entry {entry.index} does not point to a CAS* table')
+
+            members = {}
+            for i, member_index in enumerate(cast_table.member_indices):
+                if member_index == 0:
+                    continue
+                record = CastMemberRecord(number=first_member + i, library=entry.owner, index=member_index,
+                                          chunks=owned_chunks.get(member_index, {}))
+                members[record.number] = record
+                self._owners[member_index] = record
+                for chunk_index in record.chunks:
+                    self._owners[chunk_index] = record
+            self.libraries[entry.owner] = members
+
+    def member(self, number: int, library: Optional[int] = None) -> CastMemberRecord:
+        if library is None:
+            if not self.libraries:
+                raise KeyError(number)
+            library = next(iter(self.libraries))
+        return self.libraries[library][number]
+
+    def owner_of(self, index: int) -> Optional[CastMemberRecord]:
+        return self._owners.get(index)
+
+    def member_resource(self, number: int, library: Optional[int] = None) -> CastMemberResource:
+        return self.archive.resources[self.member(number, library).index]
+
+    def member_chunks(self, number: int, library: Optional[int] = None) -> Dict[int, Resource]:
+        record = self.member(number, library)
+        return {index: self.archive.resources[index] for index in record.chunks}
@@ -1,10 +1,14 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import BinaryIO, Dict, List, Tuple
+from struct import error as StructError
+from typing import BinaryIO, Dict, Iterator, List, MutableMapping, Optional, Sequence, Set, Tuple
 
 from directorfile.archive.base import ArchiveParser, ArchiveSerializer, RIFXArchiveResource, Resource
-from directorfile.common import EndiannessAwareStream, calculate_alignment_remainder
+from directorfile.archive.cache import ResourceCache, estimate_resource_size
+from directorfile.archive.registry import DIRECTOR_RESOURCES, ResourceRegistry
+from directorfile.common import EndiannessAwareStream, LimitExceededError, ParsingError, ParsingLimits, \
+    ValidationLevel, calculate_alignment_remainder
 
 DIRECTOR_VERSIONS = {
     0x404: '3.0',
@@ -26,6 +30,11 @@ DIRECTOR_VERSIONS = {
 }
 
 
+# Chunks read when a movie starts, laid out first by optimize_layout
+STARTUP_TAGS = ('KEY*', 'CAS*', 'Cinf', 'MCsL', 'VWCF', 'DRCF', 'VWFI', 'VWLB', 'VWSC', 'Sord', 'FXmp', 'VWFM',
+                'VWtc', 'SCRF', 'CLUT')
+
+
 class GenericResource(Resource):
     data: bytes
 
@@ -41,6 +50,7 @@ class GenericResource(Resource):
         return f'<GenericResource "{self._tag}" ({len(self.data)} bytes) at {hex(id(self))}>'
 
     def _parse(self, reader: EndiannessAwareStream, size: int) -> None:
+        reader.context.consume(size)
         self.data = reader.read_buffer(size)
 
     def _serialize(self, writer: EndiannessAwareStream) -> None:
@@ -58,14 +68,15 @@ class IMapResource(Resource):
         self.director_version = director_version
 
     def _parse(self, reader: EndiannessAwareStream, size: int) -> None:
-        assert reader.read_ui32() == 1
+        reader.expect_ui32(1, 'imap count')
         self.mmap_position = reader.read_ui32()
         self.director_version = reader.read_ui32()
-        assert self.director_version in DIRECTOR_VERSIONS, f'Unsupported version code 0x{self.director_version:02x}'
-        assert reader.read_i32() == 0
+        reader.check(self.director_version in DIRECTOR_VERSIONS,
+                     f'Unsupported version code 0x{self.director_version:02x}', reader.get_current_pos() - 4)
+        reader.expect_i32(0)
 
-        assert reader.read_i32() == 0
-        assert reader.read_i32() == 0
+        reader.expect_i32(0)
+        reader.expect_i32(0)
 
     def _serialize(self, writer: EndiannessAwareStream) -> None:
         writer.write_ui32(1)
@@ -92,14 +103,13 @@ class MMapResource(Resource):
             self.entries = []
 
     def _parse(self, reader: EndiannessAwareStream, size: int):
-        header_size = reader.read_ui16()
-        assert header_size == MMapResource.HEADER_SIZE
-        width = reader.read_ui16()
-        assert width == MMapResource.ENTRY_WIDTH
+        reader.expect_ui16(MMapResource.HEADER_SIZE, 'mmap header size')
+        reader.expect_ui16(MMapResource.ENTRY_WIDTH, 'mmap entry width')
 
         allocated_length = reader.read_ui32()
         length = reader.read_ui32()
-        assert allocated_length >= length
+        reader.check(allocated_length >= length, f'mmap length {length} exceeds allocated {allocated_length}')
+        reader.limits.check_entries(length, MMapResource.ENTRY_WIDTH, size - MMapResource.HEADER_SIZE)
 
         # TODO: support free amd junk indices
         unk_junk_indices = [reader.read_i32(), reader.read_i32()]
@@ -115,8 +125,12 @@ class MMapResource(Resource):
 
             entries.append(MMapResource.Entry(index=index, tag=tag, position=position, size=size))
 
-        assert all(index == -1 or entries[index].tag == 'junk' for index in unk_junk_indices)
-        assert unk_free_index == -1 or entries[unk_free_index].tag == 'free'
+        if reader.strict:
+            reader.check(all(index == -1 or 0 <= index < length and entries[index].tag == 'junk'
+                             for index in unk_junk_indices),
+                         f'mmap junk indices {unk_junk_indices} do not point to junk entries')
+            reader.check(unk_free_index == -1 or 0 <= unk_free_index < length and entries[unk_free_index].tag == 'free',
+                         f'mmap free index {unk_free_index} does not point to a free entry')
 
         self.entries = entries
 
@@ -141,6 +155,11 @@ class MMapResource(Resource):
             writer.write_ui32(0)
             writer.write_ui32(0)
 
+    def entry(self, index: int) -> "MMapResource.Entry":
+        if not 0 <= index < len(self.entries):
+            raise ParsingError(f'mmap has no entry {index} out of {len(self.entries)}')
+        return self.entries[index]
+
     @staticmethod
     def calculate_needed_size(length):
         return MMapResource.HEADER_SIZE + length * MMapResource.ENTRY_WIDTH
@@ -160,59 +179,122 @@ class DirectorArchiveParser(ArchiveParser):
     TYPES = {'M!07', 'M!08', 'M!85', 'M!93', 'M!95', 'M!97', 'M*07', 'M*08', 'M*85', 'M*95', 'M*97', 'MC07',
              'MC08', 'MC85', 'MC95', 'MC97', 'MMQ5', 'MV07', 'MV08', 'MV85', 'MV93', 'MV95', 'MV97'}
 
+    RESOURCE_CLASSES: ResourceRegistry = DIRECTOR_RESOURCES
+
     _mmap: MMapResource
 
     director_version: int
+    lazy: bool
     entries: List[Tuple[MMapResource.Entry, Resource]]
+    resource_entries: List[MMapResource.Entry]
+    access_order: Dict[int, None]
 
-    _resources: Dict[Tuple[str, int], Resource]
+    _resources: ResourceCache
+    _fixed: Dict[int, Resource]
 
-    def __init__(self, archive: RIFXArchiveResource, reader: EndiannessAwareStream):
-        super().__init__(archive, reader)
+    def __init__(self, archive: RIFXArchiveResource, reader: EndiannessAwareStream,
+                 bounds: Optional[Tuple[int, int]] = None):
+        super().__init__(archive, reader, bounds)
         self.entries = []
-        self._resources = {}
+        self.resource_entries = []
+        self.access_order = {}
 
-    def _populate_fetched_resource(self, resource: Resource, position: int):
-        self._resources[(resource.TAG, position)] = resource
+        # The archive, imap and mmap are held by the parser, so a shared cache only holds evictable chunks
+        self._fixed = {}
+
+        # Keys are namespaced per parser, since one cache can be shared by any number of archives
+        self._cache_namespace = object()
+        self.lazy = archive.resource_cache is not None
+        if self.lazy:
+            self._resources = archive.resource_cache
+        else:
+            self._resources = ResourceCache()
+
+    def _populate_fetched_resource(self, resource: Resource, index: int):
+        self._fixed[index] = resource
 
     def _fetch_resource(self, entry: MMapResource.Entry) -> Resource:
-        resource = self._resources.get((entry.tag, entry.position))
+        if entry.index in self._fixed:
+            return self._fixed[entry.index]
+
+        key = (self._cache_namespace, entry.tag, entry.position)
+        resource = self._resources.get(key)
         if resource is None:
             resource = self._reconstruct_resource(entry)
-            self._populate_fetched_resource(resource, entry.position)
+            self._resources.put(key, resource, estimate_resource_size(resource, entry.size))
+            self.access_order.setdefault(entry.index)
         return resource
 
     def _reconstruct_resource(self, entry: MMapResource.Entry) -> Resource:
-        return GenericResource(entry.tag).load(self._reader.fp, entry.position, entry.size)
+        resource_class = self.RESOURCE_CLASSES.get(entry.tag)
+        if resource_class is not None:
+            context = self._reader.context
+            total_size = context.total_size
+            try:
+                return self._load_resource(resource_class(), entry.position, entry.size)
+            except LimitExceededError:
+                raise
+            except (ParsingError, StructError, UnicodeDecodeError):
+                # A chunk that does not match its typed layout is kept as raw data, so the archive still round-trips
+                context.total_size = total_size
+        return self._load_resource(GenericResource(entry.tag), entry.position, entry.size)
+
+    def _chunk_span(self, entry: MMapResource.Entry) -> Tuple[int, int]:
+        return entry.position, entry.size + 8
 
     def parse(self):
         imap_position = self._reader.get_current_pos()
+        limits = self._reader.limits
+
+        imap = self._load_resource(IMapResource(), imap_position)
+        limits.check_chunk(imap.mmap_position, 8, self.bounds)
+        mmap = self._load_resource(MMapResource(), imap.mmap_position)
+        if len(mmap.entries) < 3:
+            raise ParsingError('mmap lacks the entries of the archive, imap and mmap', imap.mmap_position)
+
+        # Every chunk is checked against the archive bounds before any of them is read. The archive itself and
+        # embedded files are containers, whose chunks are size-checked when they are parsed
+        for entry in mmap.entries:
+            if entry.tag in ('free', 'junk'):
+                continue
+            if entry.index == 0 or entry.tag == 'File':
+                limits.check_bounds(*self._chunk_span(entry), self.bounds)
+            else:
+                limits.check_chunk(*self._chunk_span(entry), self.bounds)
 
-        imap = IMapResource().load(self._reader.fp, imap_position)
-        mmap = MMapResource().load(self._reader.fp, imap.mmap_position)
-
-        assert mmap.entries[0].tag == 'RIFX'
-        self._populate_fetched_resource(self.archive, mmap.entries[0].position)
+        self._check_entry_tag(mmap, 0, 'RIFX')
+        self._populate_fetched_resource(self.archive, 0)
 
-        assert mmap.entries[1].tag == 'imap'
-        self._populate_fetched_resource(imap, imap_position)
+        self._check_entry_tag(mmap, 1, 'imap')
+        self._populate_fetched_resource(imap, 1)
 
-        assert mmap.entries[2].tag == 'mmap'
-        self._populate_fetched_resource(mmap, imap.mmap_position)
+        self._check_entry_tag(mmap, 2, 'mmap')
+        self._populate_fetched_resource(mmap, 2)
 
         self._mmap = mmap
 
         self.director_version = imap.director_version
-        self.entries = [(entry, self._fetch_resource(entry))
-                        for entry in mmap.entries[3:]
-                        if entry.tag not in ('free', 'junk')]
+        self.resource_entries = [entry for entry in mmap.entries[3:]
+                                 if entry.tag not in ('free', 'junk', '\x00\x00\x00\x00')]
+        if not self.lazy:
+            self.entries = [(entry, self._fetch_resource(entry)) for entry in self.resource_entries]
+
+    def _check_entry_tag(self, mmap: MMapResource, index: int, tag: str):
+        if self._reader.strict:
+            actual = mmap.entries[index].tag if index < len(mmap.entries) else None
+            self._reader.check(actual == tag, f'Expected mmap entry {index} to be {tag}, got {actual}',
+                               mmap.entries[index].position if actual is not None else None)
+
+    def fetch_resource(self, index: int) -> Resource:
+        return self._fetch_resource(self._mmap.entries[index])
 
 
 class DirectorArchiveSerializer(ArchiveSerializer):
     def _serialize(self, stream: EndiannessAwareStream, archive: DirectorArchiveResource):
-        self._serialize_resources(stream, 'MV93', archive.resources)
+        self._serialize_resources(stream, 'MV93', archive.resources, archive.chunk_order)
 
-    def _serialize_resources(self, stream: EndiannessAwareStream, archive_type: str, resources: Dict[int, Resource]):
+    def _serialize_resources(self, stream: EndiannessAwareStream, archive_type: str,
+                             resources: MutableMapping[int, Resource], order: Optional[Sequence[int]] = None):
         archive_position = stream.get_current_pos() - 8
         imap_position = archive_position + 12
         mmap_position = imap_position + 8 + 0x18
@@ -220,7 +302,7 @@ class DirectorArchiveSerializer(ArchiveSerializer):
         resources_offset = mmap_position + 8 + mmap_size
         stream.jump(resources_offset)
 
-        entries = self._generate_entries(stream, resources)
+        entries = self._generate_entries(stream, resources, order)
         archive_size = max(entry.position + entry.size + 8 for entry in entries) - archive_position - 8
 
         entries = [
@@ -235,11 +317,19 @@ class DirectorArchiveSerializer(ArchiveSerializer):
         stream.write_tag(archive_type)
         stream.jump(archive_position + 8 + archive_size)
 
-    def _generate_entries(self, stream: EndiannessAwareStream, resources: Dict[int, Resource]):
+    def _generate_entries(self, stream: EndiannessAwareStream, resources: MutableMapping[int, Resource],
+                          order: Optional[Sequence[int]] = None):
+        if order is None:
+            indices = list(resources.keys())
+        else:
+            indices = [index for index in dict.fromkeys(order) if index in resources]
+            indices += sorted(set(resources.keys()).difference(indices))
+
         entry_dict = {}
-        for index, resource in resources.items():
+        for index in indices:
             if index < 3:
                 continue
+            resource = resources[index]
 
             # 16-bit alignment (critical for Xtra file loading)
             stream.skip(calculate_alignment_remainder(stream.get_current_pos(), 2))
@@ -255,13 +345,66 @@ class DirectorArchiveSerializer(ArchiveSerializer):
         return entries
 
 
+class LazyResourceMap(MutableMapping[int, Resource]):
+    _parser: DirectorArchiveParser
+    _indices: Set[int]
+    _overrides: Dict[int, Optional[Resource]]
+
+    def __init__(self, parser: DirectorArchiveParser):
+        self._parser = parser
+        self._indices = {entry.index for entry in parser.resource_entries}
+        self._overrides = {}
+
+    def __repr__(self):
+        return f'<{type(self).__qualname__} ({len(self)} resources) at {hex(id(self))}>'
+
+    def __getitem__(self, index: int) -> Resource:
+        if index in self._overrides:
+            resource = self._overrides[index]
+            if resource is None:
+                raise KeyError(index)
+            return resource
+        if index not in self._indices:
+            raise KeyError(index)
+        return self._parser.fetch_resource(index)
+
+    def __setitem__(self, index: int, resource: Resource):
+        self._overrides[index] = resource
+
+    def __delitem__(self, index: int):
+        if index not in self:
+            raise KeyError(index)
+        self._overrides[index] = None
+
+    def __iter__(self) -> Iterator[int]:
+        for entry in self._parser.resource_entries:
+            index = entry.index
+            if self._overrides.get(index, True) is not None:
+                yield index
+        for index, resource in self._overrides.items():
+            if index not in self._indices and resource is not None:
+                yield index
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def indices_of(self, tag: str) -> List[int]:
+        indices = [entry.index for entry in self._parser.resource_entries
+                   if entry.tag == tag and entry.index not in self._overrides]
+        indices += [index for index, resource in self._overrides.items()
+                    if resource is not None and resource.TAG == tag]
+        return sorted(indices)
+
+
 class DirectorArchiveResource(RIFXArchiveResource):
     _parser: DirectorArchiveParser
 
-    resources: Dict[int, Resource]
+    resources: MutableMapping[int, Resource]
     director_version: int
+    chunk_order: Optional[List[int]]
 
-    def __init__(self, filename: str = '', resources: Dict[int, Resource] = None, director_version: int = None):
+    def __init__(self, filename: str = '', resources: Dict[int, Resource] = None, director_version: int = None,
+                 resource_cache: Optional[ResourceCache] = None):
         super().__init__(filename=filename)
         if not resources:
             self.resources = {}
@@ -269,20 +412,56 @@ class DirectorArchiveResource(RIFXArchiveResource):
             self.resources = resources
 
         self.director_version = director_version
+        self.resource_cache = resource_cache
+        self.chunk_order = None
 
     def _parse(self, reader: EndiannessAwareStream, size: int):
         super()._parse(reader, size)
 
         self.director_version = self._parser.director_version
 
-        for entry, resource in self._parser.entries:
-            if entry.tag not in ('free', 'junk', '\x00\x00\x00\x00'):
+        if self._parser.lazy:
+            self.resources = LazyResourceMap(self._parser)
+        else:
+            for entry, resource in self._parser.entries:
                 self.resources[entry.index] = resource
 
+    @property
+    def access_order(self) -> List[int]:
+        parser = getattr(self, '_parser', None)
+        if parser is None:
+            return []
+        return list(parser.access_order)
+
+    def optimize_layout(self, access_order: Optional[Sequence[int]] = None):
+        if access_order is None:
+            access_order = self.access_order
+
+        startup = [index for tag in STARTUP_TAGS for index in self.find_resources(tag)]
+        self.chunk_order = list(dict.fromkeys([*startup, *access_order]))
+
+    def find_resources(self, tag: str) -> List[int]:
+        if isinstance(self.resources, LazyResourceMap):
+            return self.resources.indices_of(tag)
+        return sorted(index for index, resource in self.resources.items() if resource.TAG == tag)
+
     def _serialize(self, writer: EndiannessAwareStream) -> None:
         serializer = DirectorArchiveSerializer(writer.endianness, self.director_version)
         serializer.serialize(writer.fp, self)
 
 
-def load_director_archive(fp: BinaryIO):
-    return DirectorArchiveResource().load(fp)
+def load_director_archive(fp: BinaryIO, resource_cache: Optional[ResourceCache] = None,
+                          limits: Optional[ParsingLimits] = None, validation: ValidationLevel = ValidationLevel.STRICT):
+    return DirectorArchiveResource(resource_cache=resource_cache).load(fp, limits=limits, validation=validation)
+
+
+def load_memory_map(fp: BinaryIO, position: int = 0,
+                    limits: Optional[ParsingLimits] = None) -> Tuple[str, IMapResource, MMapResource]:
+    fp.seek(position)
+    reader = RIFXArchiveResource().parse_tag(fp)
+    reader.skip(4)
+    archive_type = reader.read_tag()
+
+    imap = IMapResource().load(fp, reader.get_current_pos(), limits=limits)
+    mmap = MMapResource().load(fp, imap.mmap_position, limits=limits)
+    return archive_type, imap, mmap
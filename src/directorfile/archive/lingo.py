@@ -0,0 +1,440 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from enum import IntEnum
+from functools import cached_property
+from struct import Struct, error as StructError, unpack_from
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+from directorfile.archive.director import DirectorArchiveResource, GenericResource
+from directorfile.common import EndiannessAwareStream, ParsingError
+
+
+class LingoOpcode(IntEnum):
+    RET = 0x01
+    RET_FACTORY = 0x02
+    PUSH_ZERO = 0x03
+    MUL = 0x04
+    ADD = 0x05
+    SUB = 0x06
+    DIV = 0x07
+    MOD = 0x08
+    INV = 0x09
+    JOIN_STR = 0x0a
+    JOIN_PAD_STR = 0x0b
+    LT = 0x0c
+    LT_EQ = 0x0d
+    NT_EQ = 0x0e
+    EQ = 0x0f
+    GT = 0x10
+    GT_EQ = 0x11
+    AND = 0x12
+    OR = 0x13
+    NOT = 0x14
+    CONTAINS_STR = 0x15
+    CONTAINS_0_STR = 0x16
+    GET_CHUNK = 0x17
+    HILITE_CHUNK = 0x18
+    ONTO_SPR = 0x19
+    INTO_SPR = 0x1a
+    GET_FIELD = 0x1b
+    START_TELL = 0x1c
+    END_TELL = 0x1d
+    PUSH_LIST = 0x1e
+    PUSH_PROP_LIST = 0x1f
+    SWAP = 0x21
+
+    PUSH_INT8 = 0x41
+    PUSH_ARG_LIST_NO_RET = 0x42
+    PUSH_ARG_LIST = 0x43
+    PUSH_CONS = 0x44
+    PUSH_SYMB = 0x45
+    PUSH_VAR_REF = 0x46
+    GET_GLOBAL2 = 0x48
+    GET_GLOBAL = 0x49
+    GET_PROP = 0x4a
+    GET_PARAM = 0x4b
+    GET_LOCAL = 0x4c
+    SET_GLOBAL2 = 0x4e
+    SET_GLOBAL = 0x4f
+    SET_PROP = 0x50
+    SET_PARAM = 0x51
+    SET_LOCAL = 0x52
+    JMP = 0x53
+    END_REPEAT = 0x54
+    JMP_IF_Z = 0x55
+    LOCAL_CALL = 0x56
+    EXT_CALL = 0x57
+    OBJ_CALL_V4 = 0x58
+    PUT = 0x59
+    PUT_CHUNK = 0x5a
+    DELETE_CHUNK = 0x5b
+    GET = 0x5c
+    SET = 0x5d
+    GET_MOVIE_PROP = 0x5f
+    SET_MOVIE_PROP = 0x60
+    GET_OBJ_PROP = 0x61
+    SET_OBJ_PROP = 0x62
+    TELL_CALL = 0x63
+    PEEK = 0x64
+    POP = 0x65
+    THE_BUILTIN = 0x66
+    OBJ_CALL = 0x67
+    PUSH_CHUNK_VAR_REF = 0x6d
+    PUSH_INT16 = 0x6e
+    PUSH_INT32 = 0x6f
+    GET_CHAINED_PROP = 0x70
+    PUSH_FLOAT32 = 0x71
+    GET_TOP_LEVEL_PROP = 0x72
+    NEW_OBJ = 0x73
+
+
+# Opcodes whose operand is an index into the name table
+NAME_OPCODES = frozenset((
+    LingoOpcode.PUSH_SYMB, LingoOpcode.PUSH_VAR_REF, LingoOpcode.GET_GLOBAL2, LingoOpcode.GET_GLOBAL,
+    LingoOpcode.GET_PROP, LingoOpcode.SET_GLOBAL2, LingoOpcode.SET_GLOBAL, LingoOpcode.SET_PROP, LingoOpcode.EXT_CALL,
+    LingoOpcode.GET_MOVIE_PROP, LingoOpcode.SET_MOVIE_PROP, LingoOpcode.GET_OBJ_PROP, LingoOpcode.SET_OBJ_PROP,
+    LingoOpcode.TELL_CALL, LingoOpcode.THE_BUILTIN, LingoOpcode.OBJ_CALL, LingoOpcode.GET_CHAINED_PROP,
+    LingoOpcode.GET_TOP_LEVEL_PROP, LingoOpcode.NEW_OBJ,
+))
+SIGNED_OPERAND_OPCODES = frozenset((LingoOpcode.PUSH_INT8, LingoOpcode.PUSH_INT16, LingoOpcode.PUSH_INT32))
+
+_OPCODES = {opcode.value: opcode for opcode in LingoOpcode}
+
+
+class LiteralType(IntEnum):
+    STRING = 1
+    INTEGER = 4
+    FLOAT = 9
+
+
+Literal = Union[str, int, float, bytes]
+
+
+def _unpack_array(data: bytes, offset: int, count: int, code: str = 'h') -> Tuple:
+    try:
+        return unpack_from(f'>{count}{code}', data, offset)
+    except StructError:
+        raise ParsingError(f'Array of {count} items at {hex(offset)} exceeds its {len(data)} bytes chunk')
+
+
+def _resolve_name(names: Sequence[str], name_id: int) -> Optional[str]:
+    if 0 <= name_id < len(names):
+        return names[name_id]
+    return None
+
+
+def _decode_extended(data: bytes) -> float:
+    # 80-bit extended precision, as written by the classic Mac OS toolbox
+    exponent, mantissa = unpack_from('>HQ', data)
+    sign = -1 if exponent & 0x8000 else 1
+    exponent &= 0x7fff
+    if exponent == 0 and mantissa == 0:
+        return 0.0
+    return sign * mantissa * 2.0 ** (exponent - 16383 - 63)
+
+
+# Lingo chunks are big-endian regardless of the archive
+class NameTableResource(GenericResource):
+    TAG = 'Lnam'
+
+    HEADER = Struct('>iiIIHH')
+
+    names: List[str]
+
+    def __init__(self):
+        super().__init__(NameTableResource.TAG)
+        self.names = []
+
+    def __repr__(self):
+        return f'<NameTableResource ({len(self.names)} names) at {hex(id(self))}>'
+
+    def _parse(self, reader: EndiannessAwareStream, size: int) -> None:
+        super()._parse(reader, size)
+
+        if size < NameTableResource.HEADER.size:
+            raise ParsingError('Lnam chunk is shorter than its header', reader.get_current_pos() - size)
+        *_, names_offset, names_count = NameTableResource.HEADER.unpack_from(self.data)
+        reader.limits.check_entries(names_count, 1, size - names_offset)
+
+        data = self.data
+        names = []
+        position = names_offset
+        for i in range(names_count):
+            if position >= size:
+                raise ParsingError(f'Lnam names exceed its {size} bytes chunk', reader.get_current_pos() - size)
+            length = data[position]
+            names.append(data[position + 1:position + 1 + length].decode('latin-1'))
+            position += 1 + length
+        self.names = names
+
+
+class ScriptContextResource(GenericResource):
+    TAG = 'LctX'
+
+    HEADER = Struct('>iiIIHhiiiiHHh')
+    ENTRY = Struct('>iiHH')
+
+    # Handler records of LctX contexts carry an extra stack height field
+    HANDLER_STACK_HEIGHT = True
+
+    names_index: int
+    script_indices: Dict[int, int]
+
+    def __init__(self):
+        super().__init__(self.TAG)
+        self.names_index = -1
+        self.script_indices = {}
+
+    def __repr__(self):
+        return f'<{type(self).__qualname__} ({len(self.script_indices)} scripts) at {hex(id(self))}>'
+
+    def _parse(self, reader: EndiannessAwareStream, size: int) -> None:
+        super()._parse(reader, size)
+
+        if size < ScriptContextResource.HEADER.size:
+            raise ParsingError(f'{self.TAG} chunk is shorter than its header', reader.get_current_pos() - size)
+        (_, _, entry_count, _, entries_offset, _, _, _, _, names_index,
+         *_) = ScriptContextResource.HEADER.unpack_from(self.data)
+        reader.limits.check_entries(entry_count, ScriptContextResource.ENTRY.size, size - entries_offset)
+
+        self.names_index = names_index
+        self.script_indices = {
+            number: section_index
+            for number, (_, section_index, _, _) in enumerate(
+                ScriptContextResource.ENTRY.iter_unpack(
+                    self.data[entries_offset:entries_offset + entry_count * ScriptContextResource.ENTRY.size]),
+                start=1)
+            if section_index >= 0
+        }
+
+
+class LegacyScriptContextResource(ScriptContextResource):
+    TAG = 'Lctx'
+
+    HANDLER_STACK_HEIGHT = False
+
+
+class ScriptResource(GenericResource):
+    TAG = 'Lscr'
+
+    HEADER = Struct('>IhihHIIHIHIHIHIII')
+    HEADER_OFFSET = 38
+    HEADER_SIZE = HEADER_OFFSET + HEADER.size
+    HANDLER = Struct('>hHIIHIHIHIIHHI')
+    HANDLER_WITH_STACK_HEIGHT = Struct('>hHIIHIHIHIIHHII')
+    LITERAL = Struct('>Ii')
+
+    script_number: int
+    flags: int
+    property_name_ids: Tuple[int, ...]
+    global_name_ids: Tuple[int, ...]
+
+    _handlers: Tuple[int, int]
+    _literals: Tuple[int, int, int]
+
+    def __init__(self):
+        super().__init__(ScriptResource.TAG)
+        self.script_number = 0
+        self.flags = 0
+        self.property_name_ids = ()
+        self.global_name_ids = ()
+        self._handlers = (0, 0)
+        self._literals = (0, 0, 0)
+
+    def __repr__(self):
+        return f'<ScriptResource #{self.script_number} ({self._handlers[0]} handlers) at {hex(id(self))}>'
+
+    def _parse(self, reader: EndiannessAwareStream, size: int) -> None:
+        super()._parse(reader, size)
+
+        # Only the Director 5+ layout is decoded, older scripts are kept as raw data
+        if size < ScriptResource.HEADER_SIZE:
+            return
+
+        (self.script_number,) = unpack_from('>H', self.data, 18)
+        (self.flags, _, _, _, _, _, _, properties_count, properties_offset, globals_count, globals_offset,
+         handlers_count, handlers_offset, literals_count, literals_offset, _,
+         literals_data_offset) = ScriptResource.HEADER.unpack_from(self.data, ScriptResource.HEADER_OFFSET)
+
+        reader.limits.check_entries(handlers_count, ScriptResource.HANDLER.size, size - handlers_offset)
+        reader.limits.check_entries(literals_count, ScriptResource.LITERAL.size, size - literals_offset)
+        self.property_name_ids = _unpack_array(self.data, properties_offset, properties_count)
+        self.global_name_ids = _unpack_array(self.data, globals_offset, globals_count)
+        self._handlers = (handlers_count, handlers_offset)
+        self._literals = (literals_count, literals_offset, literals_data_offset)
+
+    def handler_records(self, stack_height: bool = True) -> List[Tuple[int, ...]]:
+        record = ScriptResource.HANDLER_WITH_STACK_HEIGHT if stack_height else ScriptResource.HANDLER
+        count, offset = self._handlers
+        end = offset + count * record.size
+        if end > len(self.data):
+            raise ParsingError(f'{count} handlers at {hex(offset)} exceed the {len(self.data)} bytes script')
+        return list(record.iter_unpack(self.data[offset:end]))
+
+    @cached_property
+    def literals(self) -> List[Literal]:
+        count, offset, data_offset = self._literals
+        end = offset + count * ScriptResource.LITERAL.size
+        if end > len(self.data):
+            raise ParsingError(f'{count} literals at {hex(offset)} exceed the {len(self.data)} bytes script')
+
+        data = self.data
+        literals = []
+        for literal_type, value in ScriptResource.LITERAL.iter_unpack(data[offset:end]):
+            if literal_type == LiteralType.INTEGER:
+                literals.append(value)
+                continue
+
+            position = data_offset + value
+            if not 0 <= position <= len(data) - 4:
+                raise ParsingError(f'Literal at {hex(position)} exceeds the {len(data)} bytes script')
+            (length,) = unpack_from('>I', data, position)
+            value = data[position + 4:position + 4 + length]
+            if literal_type == LiteralType.STRING:
+                literals.append(value.rstrip(b'\x00').decode('latin-1'))
+            elif literal_type == LiteralType.FLOAT and length == 8:
+                literals.append(unpack_from('>d', value)[0])
+            elif literal_type == LiteralType.FLOAT and length == 10:
+                literals.append(_decode_extended(value))
+            else:
+                literals.append(value)
+        return literals
+
+
+@dataclass
+class LingoInstruction:
+    offset: int
+    opcode: Union[LingoOpcode, int]
+    operand: Optional[int] = None
+    name: Optional[str] = None
+
+    def __repr__(self):
+        opcode = self.opcode.name.lower() if isinstance(self.opcode, LingoOpcode) else hex(self.opcode)
+        operand = '' if self.operand is None else f' {self.name if self.name is not None else self.operand}'
+        return f'<[{self.offset}] {opcode}{operand}>'
+
+
+def decode_bytecode(bytecode: bytes, names: Sequence[str] = ()) -> List[LingoInstruction]:
+    instructions = []
+    position = 0
+    size = len(bytecode)
+    while position < size:
+        offset = position
+        op = bytecode[position]
+        position += 1
+        if op < 0x40:
+            instructions.append(LingoInstruction(offset, _OPCODES.get(op, op)))
+            continue
+
+        opcode = _OPCODES.get(0x40 | (op & 0x3f), 0x40 | (op & 0x3f))
+        operand_size = 4 if op >= 0xc0 else 2 if op >= 0x80 else 1
+        operand = int.from_bytes(bytecode[position:position + operand_size], 'big',
+                                 signed=operand_size == 4 or opcode in SIGNED_OPERAND_OPCODES)
+        position += operand_size
+
+        name = _resolve_name(names, operand) if opcode in NAME_OPCODES else None
+        instructions.append(LingoInstruction(offset, opcode, operand, name))
+    return instructions
+
+
+@dataclass
+class LingoHandler:
+    name: Optional[str]
+    arguments: List[Optional[str]]
+    locals: List[Optional[str]]
+    globals: List[Optional[str]]
+    bytecode: bytes = field(repr=False)
+    names: Sequence[str] = field(repr=False, default=())
+
+    @cached_property
+    def instructions(self) -> List[LingoInstruction]:
+        return decode_bytecode(self.bytecode, self.names)
+
+
+class ScriptIndex:
+    archive: DirectorArchiveResource
+    contexts: Dict[int, ScriptContextResource]
+
+    _script_contexts: Dict[int, int]
+    _names: Dict[int, List[str]]
+    _handlers: Dict[int, List[LingoHandler]]
+
+    def __init__(self, archive: DirectorArchiveResource):
+        self.archive = archive
+        self.contexts = {}
+        self._script_contexts = {}
+        self._names = {}
+        self._handlers = {}
+        self._build()
+
+    def __repr__(self):
+        return f'<ScriptIndex ({len(self._script_contexts)} scripts) at {hex(id(self))}>'
+
+    def _build(self):
+        for context_class in (ScriptContextResource, LegacyScriptContextResource):
+            for index in self.archive.find_resources(context_class.TAG):
+                context = self._resource(index, context_class)
+                self.contexts[index] = context
+                for script_index in context.script_indices.values():
+                    self._script_contexts[script_index] = index
+
+    def _resource(self, index: int, resource_class: type):
+        resource = self.archive.resources.get(index)
+        if not isinstance(resource, resource_class):
+            raise ParsingError(f'Resource {index} is not a valid {resource_class.TAG} chunk')
+        return resource
+
+    @property
+    def script_indices(self) -> List[int]:
+        return sorted(self._script_contexts)
+
+    def context_of(self, index: int) -> ScriptContextResource:
+        return self.contexts[self._script_contexts[index]]
+
+    def names(self, index: int) -> List[str]:
+        # Contexts usually share a single name table, which is decoded once per archive
+        names_index = self.context_of(index).names_index
+        names = self._names.get(names_index)
+        if names is None:
+            names = self._names[names_index] = self._resource(names_index, NameTableResource).names
+        return names
+
+    def script(self, index: int) -> ScriptResource:
+        return self._resource(index, ScriptResource)
+
+    def handlers(self, index: int) -> List[LingoHandler]:
+        handlers = self._handlers.get(index)
+        if handlers is not None:
+            return handlers
+
+        script = self.script(index)
+        names = self.names(index)
+        data = script.data
+
+        def resolve(offset: int, count: int) -> List[Optional[str]]:
+            return [_resolve_name(names, name_id) for name_id in _unpack_array(data, offset, count)]
+
+        handlers = []
+        for (name_id, _, compiled_size, compiled_offset, arguments_count, arguments_offset, locals_count,
+             locals_offset, globals_count, globals_offset, *_) in script.handler_records(
+                self.context_of(index).HANDLER_STACK_HEIGHT):
+            handlers.append(LingoHandler(
+                name=_resolve_name(names, name_id),
+                arguments=resolve(arguments_offset, arguments_count),
+                locals=resolve(locals_offset, locals_count),
+                globals=resolve(globals_offset, globals_count),
+                bytecode=data[compiled_offset:compiled_offset + compiled_size],
+                names=names,
+            ))
+        self._handlers[index] = handlers
+        return handlers
+
+    def properties(self, index: int) -> List[Optional[str]]:
+        names = self.names(index)
+        return [_resolve_name(names, name_id) for name_id in self.script(index).property_name_ids]
+
+    def iter_handlers(self) -> Iterator[Tuple[int, LingoHandler]]:
+        for index in self.script_indices:
+            for handler in self.handlers(index):
+                yield index, handler
@@ -0,0 +1,99 @@
+from importlib import import_module
+from typing import Dict, Iterable, List, Optional, Type, Union
+
+ClassReference = Union[str, type]
+
+PARSER_ENTRY_POINT_GROUP = 'directorfile.parsers'
+RESOURCE_ENTRY_POINT_GROUP = 'directorfile.resources'
+
+
+def resolve_class(reference: ClassReference) -> type:
+    if isinstance(reference, type):
+        return reference
+
+    module_name, _, qualified_name = reference.partition(':')
+    target = import_module(module_name)
+    for name in qualified_name.split('.'):
+        target = getattr(target, name)
+    return target
+
+
+def _iter_entry_points(group: str):
+    from importlib.metadata import entry_points
+    return entry_points(group=group)
+
+
+# Parsers are imported on first use and matched by archive type tag against their TYPES
+class ParserRegistry:
+    _references: List[ClassReference]
+    _classes: Dict[str, type]
+
+    def __init__(self, references: Iterable[ClassReference] = ()):
+        self._references = list(references)
+        self._classes = {}
+
+    def register(self, reference: ClassReference):
+        self._references.append(reference)
+        self._classes.clear()
+
+    def load_entry_points(self, group: str = PARSER_ENTRY_POINT_GROUP):
+        for entry_point in _iter_entry_points(group):
+            self.register(entry_point.value)
+
+    def get(self, archive_type: str) -> Optional[type]:
+        parser_class = self._classes.get(archive_type)
+        if parser_class is None:
+            parser_class = self._find(archive_type)
+            if parser_class is not None:
+                self._classes[archive_type] = parser_class
+        return parser_class
+
+    def _find(self, archive_type: str) -> Optional[type]:
+        for index, reference in enumerate(self._references):
+            parser_class = resolve_class(reference)
+            self._references[index] = parser_class
+            if archive_type in parser_class.TYPES:
+                return parser_class
+        return None
+
+
+# Resource classes are imported on first use of their chunk tag
+class ResourceRegistry:
+    _references: Dict[str, ClassReference]
+
+    def __init__(self, references: Dict[str, ClassReference] = None):
+        self._references = dict(references or {})
+
+    def register(self, tag: str, reference: ClassReference):
+        self._references[tag] = reference
+
+    def load_entry_points(self, group: str = RESOURCE_ENTRY_POINT_GROUP):
+        for entry_point in _iter_entry_points(group):
+            self._references.setdefault(entry_point.name, entry_point.value)
+
+    def get(self, tag: str, default: Optional[Type] = None) -> Optional[Type]:
+        reference = self._references.get(tag)
+        if reference is None:
+            return default
+
+        resource_class = resolve_class(reference)
+        self._references[tag] = resource_class
+        return resource_class
+
+
+ARCHIVE_PARSERS = ParserRegistry()
+DIRECTOR_RESOURCES = ResourceRegistry()
+
+
+def register_parser(reference: ClassReference):
+    ARCHIVE_PARSERS.register(reference)
+
+
+def register_resource(tag: str, reference: ClassReference):
+    DIRECTOR_RESOURCES.register(tag, reference)
+
+
+# Scanning the installed distributions is slow, so plugins declared as entry points are only registered on request
+def load_entry_points():
+    ARCHIVE_PARSERS.load_entry_points()
+    DIRECTOR_RESOURCES.load_entry_points()
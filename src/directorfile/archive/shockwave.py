@@ -1,4 +1,15 @@
-from directorfile.archive.base import ArchiveParser
+from __future__ import annotations
+
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, List, Optional, Tuple
+
+from directorfile.archive.base import ArchiveParser, ArchiveSerializer, Resource
+from directorfile.archive.director import DIRECTOR_VERSIONS, STARTUP_TAGS, DirectorArchiveResource
+from directorfile.common import BufferedWriteStream, Endianness, EndiannessAwareStream, WriteBuffer, encode_varint
+
+ZLIB_COMPRESSION_ID = (0xAC99E904, 0x0070, 0x0B36, bytes((0x00, 0x00, 0x08, 0x00, 0x07, 0x37, 0x7A, 0x34)))
+NULL_COMPRESSION_ID = (0xAC99982E, 0x005D, 0x0D50, bytes((0x00, 0x00, 0x08, 0x00, 0x07, 0x37, 0x7A, 0x34)))
 
 
 class ShockwaveArchiveParser(ArchiveParser):
@@ -6,3 +17,136 @@ class ShockwaveArchiveParser(ArchiveParser):
 
     def parse(self):
         raise NotImplementedError("Shockwave archives are not yet supported")
+
+
+class ShockwaveArchiveSerializer(ArchiveSerializer):
+    FVER_VERSION = 0x501
+    ILS_RESOURCE_ID = 2
+    UNLOADED_OFFSET = 0xffffffff
+
+    COMPRESSION_TYPES = [
+        (ZLIB_COMPRESSION_ID, 'zlib'),
+        (NULL_COMPRESSION_ID, ''),
+    ]
+    ZLIB_COMPRESSION = 0
+    NULL_COMPRESSION = 1
+
+    # Chunks read at startup, which are stored together in the initial load segment
+    INITIAL_LOAD_TAGS = frozenset(STARTUP_TAGS)
+
+    def __init__(self, endianness: Endianness, director_version: int,
+                 compression_level: int = zlib.Z_BEST_COMPRESSION, max_workers: Optional[int] = None):
+        super().__init__(endianness, director_version)
+        self.compression_level = compression_level
+        self.max_workers = max_workers
+
+    def _serialize(self, stream: EndiannessAwareStream, archive: DirectorArchiveResource):
+        payloads = {index: (resource.TAG, self._serialize_payload(resource))
+                    for index, resource in sorted(archive.resources.items())}
+
+        initial_load = [(index, tag, data) for index, (tag, data) in payloads.items()
+                        if tag in self.INITIAL_LOAD_TAGS]
+        streamed = [(index, tag, data) for index, (tag, data) in payloads.items()
+                    if tag not in self.INITIAL_LOAD_TAGS]
+
+        ils_data = b''.join(encode_varint(index) + data for index, tag, data in initial_load)
+        with ThreadPoolExecutor(self.max_workers) as executor:
+            ils_compressed, *compressed = executor.map(self._compress, [ils_data] + [data for _, _, data in streamed])
+
+        entries = [(self.ILS_RESOURCE_ID, 0, len(ils_compressed), len(ils_data), self.ZLIB_COMPRESSION, 'ILS ')]
+        entries += [(index, self.UNLOADED_OFFSET, len(data), len(data), self.NULL_COMPRESSION, tag)
+                    for index, tag, data in initial_load]
+
+        offset = len(ils_compressed)
+        bodies = []
+        for (index, tag, data), compressed_data in zip(streamed, compressed):
+            # Chunks that do not shrink are stored as is
+            if len(compressed_data) < len(data):
+                body, compression = compressed_data, self.ZLIB_COMPRESSION
+            else:
+                body, compression = data, self.NULL_COMPRESSION
+            entries.append((index, offset, len(body), len(data), compression, tag))
+            bodies.append(body)
+            offset += len(body)
+
+        archive_position = stream.get_current_pos()
+        stream.write_tag('RIFX')
+        stream.write_ui32(0)
+        stream.write_tag('FGDM')
+
+        self._write_section(stream, 'Fver', self._serialize_version())
+        self._write_section(stream, 'Fcdr', self._compress(self._serialize_compression_types()))
+        self._write_section(stream, 'ABMP', self._serialize_resource_map(entries))
+
+        stream.write_tag('FGEI')
+        stream.write_varint(0)
+        stream.write_buffer(ils_compressed)
+        for body in bodies:
+            stream.write_buffer(body)
+
+        end = stream.get_current_pos()
+        stream.jump(archive_position + 4)
+        stream.write_ui32(end - archive_position - 8)
+        stream.jump(end)
+
+    def _compress(self, data: bytes) -> bytes:
+        return zlib.compress(data, self.compression_level)
+
+    def _serialize_payload(self, resource: Resource) -> bytes:
+        buffer = WriteBuffer()
+        resource.serialize(BufferedWriteStream(buffer, self.endianness))
+        return buffer.getvalue()
+
+    def _write_section(self, stream: EndiannessAwareStream, tag: str, data: bytes):
+        stream.write_tag(tag)
+        stream.write_varint(len(data))
+        stream.write_buffer(data)
+
+    def _serialize_version(self) -> bytes:
+        version_string = DIRECTOR_VERSIONS.get(self.director_version, '').encode('ascii')
+        return b''.join((
+            encode_varint(self.FVER_VERSION),
+            encode_varint(0),
+            encode_varint(self.director_version),
+            bytes((len(version_string),)),
+            version_string,
+        ))
+
+    def _serialize_compression_types(self) -> bytes:
+        buffer = WriteBuffer()
+        writer = BufferedWriteStream(buffer, self.endianness)
+
+        writer.write_ui16(len(self.COMPRESSION_TYPES))
+        for (data1, data2, data3, data4), name in self.COMPRESSION_TYPES:
+            writer.write_ui32(data1)
+            writer.write_ui16(data2)
+            writer.write_ui16(data3)
+            writer.write_buffer(data4)
+        for moa_id, name in self.COMPRESSION_TYPES:
+            writer.write_buffer(name.encode('ascii') + b'\x00')
+        return buffer.getvalue()
+
+    def _serialize_resource_map(self, entries: List[Tuple[int, int, int, int, int, str]]) -> bytes:
+        buffer = WriteBuffer()
+        writer = BufferedWriteStream(buffer, self.endianness)
+
+        writer.write_varint(0)
+        writer.write_varint(0)
+        writer.write_varint(len(entries))
+        for index, offset, compressed_size, uncompressed_size, compression, tag in entries:
+            writer.write_varint(index)
+            writer.write_varint(offset)
+            writer.write_varint(compressed_size)
+            writer.write_varint(uncompressed_size)
+            writer.write_varint(compression)
+            writer.write_tag(tag)
+
+        resource_map = buffer.getvalue()
+        return encode_varint(self.ZLIB_COMPRESSION) + encode_varint(len(resource_map)) + self._compress(resource_map)
+
+
+def save_shockwave_archive(archive: DirectorArchiveResource, fp: BinaryIO,
+                           endianness: Endianness = Endianness.BIG_ENDIAN,
+                           compression_level: int = zlib.Z_BEST_COMPRESSION, max_workers: Optional[int] = None):
+    serializer = ShockwaveArchiveSerializer(endianness, archive.director_version, compression_level, max_workers)
+    serializer.serialize(fp, archive)
@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+from enum import StrEnum
+from struct import Struct
+from typing import Optional
+
+from directorfile.archive.director import GenericResource
+from directorfile.common import Endianness, EndiannessAwareStream
+
+
+class TextEncoding(StrEnum):
+    MAC_ROMAN = 'mac_roman'
+    WINDOWS = 'cp1252'
+
+    @classmethod
+    def for_endianness(cls, endianness: Endianness) -> TextEncoding:
+        # Big-endian archives are authored on a Mac, little-endian ones on Windows
+        return cls.MAC_ROMAN if endianness == Endianness.BIG_ENDIAN else cls.WINDOWS
+
+
+class TextResource(GenericResource):
+    TAG = 'STXT'
+
+    # The header is big-endian regardless of the archive
+    HEADER = Struct('>III')
+
+    text_data: bytes
+    formatting: bytes
+    encoding: TextEncoding
+
+    def __init__(self):
+        super().__init__(TextResource.TAG)
+        self.text_data = b''
+        self.formatting = b''
+        self.encoding = TextEncoding.MAC_ROMAN
+
+    def __repr__(self):
+        return f'<TextResource ({len(self.text_data)} characters) at {hex(id(self))}>'
+
+    def _parse(self, reader: EndiannessAwareStream, size: int) -> None:
+        super()._parse(reader, size)
+        self.encoding = TextEncoding.for_endianness(reader.endianness)
+
+        # Chunks that do not match the layout are kept as raw data
+        if size < TextResource.HEADER.size:
+            return
+        header_size, text_size, formatting_size = TextResource.HEADER.unpack_from(self.data)
+        if header_size + text_size + formatting_size > size:
+            return
+
+        text_end = header_size + text_size
+        self.text_data = self.data[header_size:text_end]
+        self.formatting = self.data[text_end:text_end + formatting_size]
+
+    def decode(self, encoding: Optional[str] = None) -> str:
+        text = self.text_data.decode(encoding or self.encoding, errors='replace')
+        return text.replace('\r\n', '\n').replace('\r', '\n')
+
+    @property
+    def text(self) -> str:
+        return self.decode()
@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import os
+import zlib
+from contextlib import contextmanager
+from typing import BinaryIO, Iterator, Optional, Union
+
+from directorfile.archive.application import ApplicationArchiveResource, ApplicationArchiveSerializer, \
+    RIFFXtraFileResource, XtraHeader
+from directorfile.archive.base import FileResource, RIFXArchiveResource
+from directorfile.common import Endianness, EndiannessAwareStream, buffered_writer
+from directorfile.layout import READ_BLOCK_SIZE, copy_archive, copy_range
+from directorfile.projector import Projector
+
+Source = Union[str, os.PathLike, BinaryIO]
+
+
+@contextmanager
+def _open_source(source: Source) -> Iterator[BinaryIO]:
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as fp:
+            yield fp
+    else:
+        yield source
+
+
+def _source_name(source: Source) -> str:
+    if isinstance(source, (str, os.PathLike)):
+        return os.path.basename(source)
+    return os.path.basename(getattr(source, 'name', ''))
+
+
+# Files are only opened while they are written, and streamed to the output in blocks
+class StreamedResource(FileResource):
+    source: Source
+
+    def __init__(self, source: Source, filename: str = ''):
+        super().__init__(filename or _source_name(source))
+        self.source = source
+
+    def _parse(self, reader: EndiannessAwareStream, size: int):
+        raise NotImplementedError('Streamed resources can only be written')
+
+    def _serialize(self, writer: EndiannessAwareStream) -> None:
+        raise NotImplementedError('Streamed resources are written by save')
+
+
+class StreamedXtraResource(StreamedResource):
+    TAG = RIFFXtraFileResource.TAG
+
+    def __init__(self, source: Source, filename: str = '', compression_level: int = zlib.Z_DEFAULT_COMPRESSION):
+        super().__init__(source, filename)
+        self.compression_level = compression_level
+
+    def save(self, fp: BinaryIO, endianness: Endianness, position: Optional[int] = None) -> int:
+        if position is not None:
+            fp.seek(position)
+        start = fp.tell()
+        fp.seek(start + 8 + XtraHeader.SIZE)
+
+        compressor = zlib.compressobj(self.compression_level)
+        uncompressed_size = compressed_size = 0
+        with _open_source(self.source) as source:
+            while block := source.read(READ_BLOCK_SIZE):
+                uncompressed_size += len(block)
+                compressed = compressor.compress(block)
+                compressed_size += len(compressed)
+                fp.write(compressed)
+        compressed = compressor.flush()
+        compressed_size += len(compressed)
+        fp.write(compressed)
+        end = fp.tell()
+
+        fp.seek(start)
+        size = XtraHeader.SIZE + compressed_size
+        with buffered_writer(fp, Endianness.BIG_ENDIAN) as writer:
+            self.serialize_header(writer, size)
+            writer.write_buffer(XtraHeader.create(uncompressed_size, compressed_size).pack())
+        fp.seek(end)
+
+        return size
+
+
+# Movies and casts are copied as is from their source
+class StreamedMovieResource(StreamedResource):
+    TAG = RIFXArchiveResource.TAG
+
+    def save(self, fp: BinaryIO, endianness: Endianness, position: Optional[int] = None) -> int:
+        if position is not None:
+            fp.seek(position)
+
+        with _open_source(self.source) as source:
+            return copy_archive(source, fp)
+
+
+class ApplicationBuilder:
+    archive: ApplicationArchiveResource
+    compression_level: int
+
+    def __init__(self, director_version: int, compression_level: int = zlib.Z_DEFAULT_COMPRESSION):
+        self.archive = ApplicationArchiveResource()
+        self.archive.director_version = director_version
+        self.archive.badd = {}
+        self.compression_level = compression_level
+
+    def __repr__(self):
+        return (f'<ApplicationBuilder ({len(self.archive.xtras)} xtras, {len(self.archive.movies)} movies, '
+                f'{len(self.archive.casts)} casts) at {hex(id(self))}>')
+
+    def add_xtra(self, source: Source, filename: str = ''):
+        resource = StreamedXtraResource(source, filename, self.compression_level)
+        self.archive.xtras.append((resource.filename, resource))
+
+    def add_movie(self, source: Source, filename: str = ''):
+        resource = StreamedMovieResource(source, filename)
+        self.archive.movies.append((resource.filename, resource))
+
+    def add_cast(self, source: Source, filename: str = ''):
+        resource = StreamedMovieResource(source, filename)
+        self.archive.casts.append((resource.filename, resource))
+
+    def save(self, fp: BinaryIO, endianness: Endianness = Endianness.LITTLE_ENDIAN) -> int:
+        # The archive is not buffered as a whole, so that files are streamed straight to the output
+        serializer = ApplicationArchiveSerializer(endianness, self.archive.director_version)
+        stream = EndiannessAwareStream(fp, endianness)
+        stream.skip(8)
+
+        start = stream.get_current_pos()
+        serializer.serialize(fp, self.archive, buffered=False)
+        size = stream.get_current_pos() - start
+        stream.jump(start - 8)
+        self.archive.serialize_header(stream, size)
+        stream.skip(size)
+
+        return size
+
+
+def save_projector(fp: BinaryIO, template: Source, builder: ApplicationBuilder,
+                   endianness: Endianness = Endianness.LITTLE_ENDIAN):
+    projector = Projector()
+    with _open_source(template) as stub:
+        position = projector.locate_application(stub)
+        stub.seek(0)
+        copy_range(stub, fp, position)
+
+    builder.save(fp, endianness)
+    projector.write_trailer(fp)
@@ -1,8 +1,12 @@
+from __future__ import annotations
+
 from abc import ABCMeta
+from contextlib import contextmanager
+from dataclasses import dataclass
 from enum import StrEnum
-from io import SEEK_CUR
-from struct import pack, unpack
-from typing import BinaryIO
+from io import SEEK_CUR, SEEK_END, SEEK_SET
+from struct import Struct, pack, unpack
+from typing import BinaryIO, Iterator, Optional, Tuple
 
 
 class Endianness(StrEnum):
@@ -10,13 +14,56 @@ class Endianness(StrEnum):
     LITTLE_ENDIAN = '<'
 
 
+class ValidationLevel(StrEnum):
+    STRICT = 'strict'
+    TRUSTED = 'trusted'
+
+
 class EndiannessAwareStream(metaclass=ABCMeta):
     fp: BinaryIO
     endianness: Endianness
+    context: ParsingContext
+    validation: ValidationLevel
 
-    def __init__(self, fp: BinaryIO, endianness: Endianness):
+    def __init__(self, fp: BinaryIO, endianness: Endianness, limits: Optional[ParsingLimits] = None,
+                 validation: ValidationLevel = ValidationLevel.STRICT, context: Optional[ParsingContext] = None):
         self.fp = fp
         self.endianness = endianness
+        self.context = context if context is not None else ParsingContext(limits)
+        self.validation = validation
+
+    @property
+    def limits(self) -> ParsingLimits:
+        return self.context.limits
+
+    @property
+    def strict(self) -> bool:
+        return self.validation == ValidationLevel.STRICT
+
+    def check(self, condition: bool, message: str, position: Optional[int] = None):
+        if not condition and self.strict:
+            raise ParsingError(message, self.get_current_pos() if position is None else position)
+
+    def _expect(self, read, size: int, expected, name: str):
+        if not self.strict:
+            self.skip(size)
+            return
+        position = self.get_current_pos()
+        value = read()
+        if value != expected:
+            raise ParsingError(f'Expected {name} to be {expected!r}, got {value!r}', position)
+
+    def expect_ui16(self, expected: int, name: str = 'value'):
+        self._expect(self.read_ui16, 2, expected, name)
+
+    def expect_ui32(self, expected: int, name: str = 'value'):
+        self._expect(self.read_ui32, 4, expected, name)
+
+    def expect_i32(self, expected: int, name: str = 'value'):
+        self._expect(self.read_i32, 4, expected, name)
+
+    def expect_tag(self, expected: str, name: str = 'tag'):
+        self._expect(self.read_tag, 4, expected, name)
 
     def jump(self, position):
         self.fp.seek(position)
@@ -53,8 +100,18 @@ class EndiannessAwareStream(metaclass=ABCMeta):
             tag = tag[::-1]
         return tag.decode("ascii")
 
-    def read_string(self) -> str:
+    def read_varint(self) -> int:
+        num = 0
+        while True:
+            byte = self.read_buffer(1)[0]
+            num = (num << 7) | (byte & 0x7f)
+            if not byte & 0x80:
+                return num
+
+    def read_string(self, max_length: Optional[int] = None) -> str:
         length = self.read_ui32()
+        if max_length is not None and length > max_length:
+            raise ParsingError(f'String of {length} bytes exceeds the {max_length} available')
         return self.read_buffer(length).decode('ascii')
 
     def write_ui16(self, num: int):
@@ -69,6 +126,9 @@ class EndiannessAwareStream(metaclass=ABCMeta):
     def write_i32(self, num: int):
         self.fp.write(pack(self.endianness + "i", num))
 
+    def write_varint(self, num: int):
+        self.write_buffer(encode_varint(num))
+
     def write_buffer(self, data: bytes):
         self.fp.write(data)
 
@@ -82,9 +142,181 @@ class EndiannessAwareStream(metaclass=ABCMeta):
         self.write_buffer(string.encode('ascii'))
 
 
+# A growable in-memory file which keeps the absolute positions of the file it is eventually flushed to
+class WriteBuffer:
+    INITIAL_CAPACITY = 0x1000
+
+    base: int
+    data: bytearray
+    length: int
+    position: int
+
+    def __init__(self, base: int = 0, capacity: int = INITIAL_CAPACITY):
+        self.base = base
+        self.data = bytearray(capacity)
+        self.length = 0
+        self.position = base
+
+    def __repr__(self):
+        return f'<WriteBuffer ({self.length} bytes at {hex(self.base)}) at {hex(id(self))}>'
+
+    def tell(self) -> int:
+        return self.position
+
+    def seek(self, offset: int, whence: int = SEEK_SET) -> int:
+        if whence == SEEK_CUR:
+            offset += self.position
+        elif whence == SEEK_END:
+            offset += self.base + self.length
+        if offset < self.base:
+            raise ValueError(f'Cannot seek to {hex(offset)} before the buffer start {hex(self.base)}')
+        self.position = offset
+        return offset
+
+    def reserve(self, size: int) -> int:
+        offset = self.position - self.base
+        end = offset + size
+        if end > len(self.data):
+            self.data.extend(bytes(max(end, 2 * len(self.data)) - len(self.data)))
+        if end > self.length:
+            self.length = end
+        self.position += size
+        return offset
+
+    def write(self, data: bytes) -> int:
+        size = len(data)
+        offset = self.reserve(size)
+        self.data[offset:offset + size] = data
+        return size
+
+    def getbuffer(self) -> memoryview:
+        return memoryview(self.data)[:self.length]
+
+    def getvalue(self) -> bytes:
+        return bytes(self.getbuffer())
+
+    def flush_to(self, fp: BinaryIO):
+        fp.seek(self.base)
+        with self.getbuffer() as view:
+            fp.write(view)
+        fp.seek(self.position)
+
+
+class BufferedWriteStream(EndiannessAwareStream):
+    fp: WriteBuffer
+
+    def __init__(self, fp: WriteBuffer, endianness: Endianness):
+        super().__init__(fp, endianness)
+        self._ui16 = Struct(endianness + 'H')
+        self._i16 = Struct(endianness + 'h')
+        self._ui32 = Struct(endianness + 'I')
+        self._i32 = Struct(endianness + 'i')
+
+    def write_ui16(self, num: int):
+        self._ui16.pack_into(self.fp.data, self.fp.reserve(2), num)
+
+    def write_i16(self, num: int):
+        self._i16.pack_into(self.fp.data, self.fp.reserve(2), num)
+
+    def write_ui32(self, num: int):
+        self._ui32.pack_into(self.fp.data, self.fp.reserve(4), num)
+
+    def write_i32(self, num: int):
+        self._i32.pack_into(self.fp.data, self.fp.reserve(4), num)
+
+
+# Serializers write through a buffer which is flushed to the file in a single call once the outermost save completes
+@contextmanager
+def buffered_writer(fp: BinaryIO, endianness: Endianness) -> Iterator[BufferedWriteStream]:
+    if isinstance(fp, WriteBuffer):
+        yield BufferedWriteStream(fp, endianness)
+        return
+
+    buffer = WriteBuffer(fp.tell())
+    yield BufferedWriteStream(buffer, endianness)
+    buffer.flush_to(fp)
+
+
 class ParsingError(Exception):
+    position: Optional[int]
+
+    def __init__(self, message: str = '', position: Optional[int] = None):
+        if position is not None:
+            message = f'{message} (at 0x{position:08x})'
+        super().__init__(message)
+        self.position = position
+
+
+class LimitExceededError(ParsingError):
     pass
 
 
+@dataclass(frozen=True)
+class ParsingLimits:
+    max_entries: Optional[int] = None
+    max_chunk_size: Optional[int] = None
+    max_decompressed_size: Optional[int] = None
+    max_nesting_depth: Optional[int] = None
+    max_total_size: Optional[int] = None
+
+    def check_entries(self, count: int, width: int, available: int):
+        if self.max_entries is not None and count > self.max_entries:
+            raise LimitExceededError(f'{count} entries exceed the limit of {self.max_entries}')
+        if count * width > available:
+            raise ParsingError(f'{count} entries of {width} bytes exceed the {available} bytes available')
+
+    def check_chunk(self, position: int, size: int, bounds: Tuple[int, int]):
+        if self.max_chunk_size is not None and size > self.max_chunk_size:
+            raise LimitExceededError(f'Chunk of {size} bytes exceeds the limit of {self.max_chunk_size}')
+        self.check_bounds(position, size, bounds)
+
+    @staticmethod
+    def check_bounds(position: int, size: int, bounds: Tuple[int, int]):
+        start, end = bounds
+        if position < start or position + size > end:
+            raise ParsingError(f'Chunk at 0x{position:08x} ({size} bytes) lies outside of 0x{start:08x}-0x{end:08x}')
+
+    def check_decompressed(self, size: int):
+        if self.max_decompressed_size is not None and size > self.max_decompressed_size:
+            raise LimitExceededError(f'{size} decompressed bytes exceed the limit of {self.max_decompressed_size}')
+
+
+# The usage of one load, so that a limits object can be shared by any number of loads
+class ParsingContext:
+    limits: ParsingLimits
+    total_size: int
+    depth: int
+
+    def __init__(self, limits: Optional[ParsingLimits] = None):
+        self.limits = limits if limits is not None else ParsingLimits()
+        self.total_size = 0
+        self.depth = 0
+
+    def consume(self, size: int):
+        self.total_size += size
+        if self.limits.max_total_size is not None and self.total_size > self.limits.max_total_size:
+            raise LimitExceededError(f'{self.total_size} bytes exceed the budget of {self.limits.max_total_size}')
+
+    @contextmanager
+    def nested(self):
+        if self.limits.max_nesting_depth is not None and self.depth >= self.limits.max_nesting_depth:
+            raise LimitExceededError(f'Archives nested deeper than {self.limits.max_nesting_depth} levels')
+        self.depth += 1
+        try:
+            yield
+        finally:
+            self.depth -= 1
+
+
+def encode_varint(num: int) -> bytes:
+    # Big-endian groups of 7 bits, with the high bit set on all but the last byte
+    groups = [num & 0x7f]
+    num >>= 7
+    while num:
+        groups.append(0x80 | (num & 0x7f))
+        num >>= 7
+    return bytes(reversed(groups))
+
+
 def calculate_alignment_remainder(value, alignment):
     return (alignment - value) % alignment
@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import argparse
+import hashlib
+from dataclasses import dataclass
+from enum import StrEnum
+from typing import BinaryIO, Dict, List, Optional, Union
+
+from directorfile.archive.application import load_file_table
+from directorfile.archive.director import MMapResource, load_memory_map
+from directorfile.layout import IGNORED_TAGS, RangeReader, hash_range, locate_archive, payload_range
+
+
+class ChangeType(StrEnum):
+    ADDED = '+'
+    REMOVED = '-'
+    CHANGED = '~'
+
+
+@dataclass
+class ResourceChange:
+    change: ChangeType
+    tag: str
+    old_index: Optional[int]
+    new_index: Optional[int]
+    filename: str = ''
+
+    def __str__(self):
+        indices = '/'.join('' if index is None else str(index) for index in (self.old_index, self.new_index))
+        name = f' "{self.filename}"' if self.filename else ''
+        return f'{self.change} {indices} {self.tag}{name}'
+
+
+@dataclass
+class ChunkDigest:
+    entry: MMapResource.Entry
+    digest: bytes
+    filename: str = ''
+
+
+def _digest_entry(fp: BinaryIO, reader: RangeReader, entry: MMapResource.Entry) -> bytes:
+    # Embedded movies and casts hold absolute positions in their imap and mmap, so their chunks are hashed instead
+    if entry.tag == 'File' and reader.read(entry.position, 4) in (b'RIFX', b'XFIR'):
+        digest = hashlib.sha1()
+        for key, nested in digest_archive(fp, entry.position).items():
+            digest.update(f'{key}:{nested.entry.tag}:'.encode('latin-1') + nested.digest)
+        return digest.digest()
+    return hash_range(reader, *payload_range(entry))
+
+
+def digest_archive(fp: BinaryIO, position: Optional[int] = None) -> Dict[Union[int, str], ChunkDigest]:
+    if position is None:
+        position = locate_archive(fp)
+
+    archive_type, imap, mmap = load_memory_map(fp, position)
+    filenames = {}
+    if archive_type == 'APPL':
+        filenames = {index: filename for index, (filename, file_type) in load_file_table(fp, mmap).items()}
+
+    reader = RangeReader(fp)
+    digests = {}
+    for entry in mmap.entries[3:]:
+        if entry.tag in IGNORED_TAGS:
+            continue
+
+        filename = filenames.get(entry.index, '')
+        digest = ChunkDigest(entry, _digest_entry(fp, reader, entry), filename)
+        digests[filename or entry.index] = digest
+    return digests
+
+
+def diff_archives(old_fp: BinaryIO, new_fp: BinaryIO,
+                  old_position: Optional[int] = None, new_position: Optional[int] = None) -> List[ResourceChange]:
+    old_digests = digest_archive(old_fp, old_position)
+    new_digests = digest_archive(new_fp, new_position)
+
+    changes = []
+    for key, old in old_digests.items():
+        new = new_digests.get(key)
+        if new is None or new.entry.tag != old.entry.tag:
+            changes.append(ResourceChange(ChangeType.REMOVED, old.entry.tag, old.entry.index, None, old.filename))
+        elif new.digest != old.digest:
+            changes.append(ResourceChange(ChangeType.CHANGED, old.entry.tag, old.entry.index, new.entry.index,
+                                          old.filename))
+
+    for key, new in new_digests.items():
+        old = old_digests.get(key)
+        if old is None or new.entry.tag != old.entry.tag:
+            changes.append(ResourceChange(ChangeType.ADDED, new.entry.tag, None, new.entry.index, new.filename))
+
+    return changes
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m directorfile.diff',
+                                     description='List resources that differ between two archives or projectors')
+    parser.add_argument('old')
+    parser.add_argument('new')
+    args = parser.parse_args(argv)
+
+    with open(args.old, 'rb') as old_fp, open(args.new, 'rb') as new_fp:
+        changes = diff_archives(old_fp, new_fp)
+
+    for change in changes:
+        print(change)
+    return 1 if changes else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from functools import partial
+from struct import error as StructError
+from typing import BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from directorfile.archive.application import FileType, load_file_table
+from directorfile.archive.cast import CastTableResource, KeyTableResource
+from directorfile.archive.director import MMapResource, load_memory_map
+from directorfile.archive.text import TextResource
+from directorfile.common import ParsingError, ParsingLimits
+from directorfile.layout import locate_archive
+
+MOVIE_FILE_TYPES = (FileType.DIRECTOR_MOVIE, FileType.DIRECTOR_CAST)
+
+
+@dataclass
+class TextRecord:
+    source: str
+    index: int
+    member: Optional[int]
+    text: str
+    filename: str = ''
+
+
+def _find_entries(mmap: MMapResource, tag: str) -> List[MMapResource.Entry]:
+    return [entry for entry in mmap.entries if entry.tag == tag]
+
+
+def _member_numbers(fp: BinaryIO, mmap: MMapResource, limits: Optional[ParsingLimits],
+                    first_member: int = 1) -> Dict[int, int]:
+    key_tables = _find_entries(mmap, KeyTableResource.TAG)
+    if not key_tables:
+        return {}
+    key_table = KeyTableResource().load(fp, key_tables[0].position, key_tables[0].size, limits)
+
+    members = {}
+    for entry in key_table.entries:
+        if entry.tag != CastTableResource.TAG:
+            continue
+        cast_entry = mmap.entry(entry.index)
+        cast_table = CastTableResource().load(fp, cast_entry.position, cast_entry.size, limits)
+        members.update((member_index, first_member + i)
+                       for i, member_index in enumerate(cast_table.member_indices) if member_index)
+
+    # Text chunks are owned by their cast member
+    return {entry.index: members[entry.owner] for entry in key_table.entries
+            if entry.tag == TextResource.TAG and entry.owner in members}
+
+
+def _iter_movie_text(fp: BinaryIO, source: str, position: int, encoding: Optional[str],
+                     limits: Optional[ParsingLimits], filename: str = '') -> Iterator[TextRecord]:
+    archive_type, imap, mmap = load_memory_map(fp, position, limits)
+    text_entries = _find_entries(mmap, TextResource.TAG)
+    if not text_entries:
+        return
+
+    members = _member_numbers(fp, mmap, limits)
+    for entry in text_entries:
+        text = TextResource().load(fp, entry.position, entry.size, limits)
+        yield TextRecord(source, entry.index, members.get(entry.index), text.decode(encoding), filename)
+
+
+# Only the memory maps, cast tables and text chunks are read, other payloads are skipped
+def iter_archive_text(fp: BinaryIO, source: str = '', position: Optional[int] = None, encoding: Optional[str] = None,
+                      limits: Optional[ParsingLimits] = None) -> Iterator[TextRecord]:
+    if not source:
+        source = os.path.abspath(getattr(fp, 'name', ''))
+    if position is None:
+        position = locate_archive(fp)
+
+    archive_type, imap, mmap = load_memory_map(fp, position, limits)
+    if archive_type != 'APPL':
+        yield from _iter_movie_text(fp, source, position, encoding, limits)
+        return
+
+    for entry_index, (filename, file_type) in load_file_table(fp, mmap, limits).items():
+        if file_type in MOVIE_FILE_TYPES:
+            yield from _iter_movie_text(fp, source, mmap.entries[entry_index].position, encoding, limits, filename)
+
+
+def extract_text(path: str, encoding: Optional[str] = None, limits: Optional[ParsingLimits] = None) -> List[TextRecord]:
+    with open(path, 'rb') as fp:
+        return list(iter_archive_text(fp, os.path.abspath(path), encoding=encoding, limits=limits))
+
+
+def _extract_corpus_text(path: str, encoding: Optional[str],
+                         limits: Optional[ParsingLimits]) -> Tuple[List[TextRecord], Optional[str]]:
+    try:
+        return extract_text(path, encoding, limits), None
+    except (OSError, ParsingError, StructError, UnicodeDecodeError) as e:
+        return [], str(e) or type(e).__name__
+
+
+# Files that cannot be read are reported to on_error with their path and skipped
+def iter_corpus_text(paths: Iterable[str], encoding: Optional[str] = None, max_workers: Optional[int] = None,
+                     limits: Optional[ParsingLimits] = None,
+                     on_error: Optional[Callable[[str, str], None]] = None) -> Iterator[TextRecord]:
+    paths = list(paths)
+    with ProcessPoolExecutor(max_workers) as executor:
+        results = executor.map(partial(_extract_corpus_text, encoding=encoding, limits=limits), paths)
+        for path, (records, error) in zip(paths, results):
+            if error is not None and on_error is not None:
+                on_error(path, error)
+            yield from records
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m directorfile.fulltext',
+                                     description='Print the text cast members of archives or projectors as JSON lines')
+    parser.add_argument('paths', nargs='+')
+    parser.add_argument('--encoding', help='text encoding (default: by platform of the archive)')
+    parser.add_argument('--workers', type=int, help='number of worker processes')
+    args = parser.parse_args(argv)
+
+    failed = []
+
+    def report(path: str, error: str):
+        failed.append(path)
+        print(f'{path}: {error}', file=sys.stderr)
+
+    for record in iter_corpus_text(args.paths, args.encoding, args.workers, on_error=report):
+        print(json.dumps(asdict(record), ensure_ascii=False))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
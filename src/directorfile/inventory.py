@@ -0,0 +1,296 @@
+from __future__ import annotations
+
+import argparse
+import zlib
+from dataclasses import dataclass, field
+from struct import error as StructError, unpack_from
+from typing import BinaryIO, List, Optional, Tuple
+
+from directorfile.archive.application import FileType, XtraHeader, load_file_table
+from directorfile.archive.director import load_memory_map
+from directorfile.common import ParsingError, ParsingLimits
+from directorfile.layout import READ_BLOCK_SIZE, RangeReader, hash_range, locate_archive
+
+DEFAULT_MAX_INSPECTED_SIZE = 16 * 1024 * 1024
+
+RT_VERSION = 16
+VS_FIXEDFILEINFO_SIGNATURE = b'\xbd\x04\xef\xfe'
+
+MACHO_MAGICS = {
+    b'\xfe\xed\xfa\xce': ('>', 28),
+    b'\xce\xfa\xed\xfe': ('<', 28),
+    b'\xfe\xed\xfa\xcf': ('>', 32),
+    b'\xcf\xfa\xed\xfe': ('<', 32),
+}
+MACHO_FAT_MAGIC = b'\xca\xfe\xba\xbe'
+LC_ID_DYLIB = 0x0d
+LC_SOURCE_VERSION = 0x2a
+
+
+@dataclass
+class XtraInfo:
+    filename: str
+    index: int
+    compressed_size: int
+    uncompressed_size: int
+    digest: str
+    format: str = ''
+    machine: Optional[int] = None
+    file_version: Optional[str] = None
+    product_version: Optional[str] = None
+    exports: List[str] = field(default_factory=list)
+    inspected_size: int = 0
+
+    def __str__(self):
+        version = self.file_version or self.product_version or '-'
+        return (f'{self.index:5} {self.filename} {self.format or "?"} {version} '
+                f'{self.compressed_size}/{self.uncompressed_size} {self.digest}')
+
+
+# Decompresses the payload of an Xtra only as far as it is read
+class _PartialPayload:
+    def __init__(self, reader: RangeReader, position: int, compressed_size: int, uncompressed_size: int,
+                 max_size: int):
+        self._blocks = reader.iter_blocks(position, compressed_size, READ_BLOCK_SIZE)
+        self._decompressor = zlib.decompressobj()
+        self._limit = min(uncompressed_size, max_size)
+        self.data = bytearray()
+
+    def ensure(self, end: int) -> bool:
+        end = min(end, self._limit)
+        while len(self.data) < end and not self._decompressor.eof:
+            tail = self._decompressor.unconsumed_tail
+            if not tail:
+                tail = next(self._blocks, b'')
+                if not tail:
+                    break
+            self.data += self._decompressor.decompress(tail, self._limit - len(self.data))
+        return len(self.data) >= end
+
+    def read(self, position: int, size: int) -> Optional[bytes]:
+        if position < 0 or not self.ensure(position + size):
+            return None
+        return bytes(self.data[position:position + size])
+
+    def read_string(self, position: int, max_size: int = 0x100) -> Optional[str]:
+        self.ensure(position + max_size)
+        end = self.data.find(b'\x00', position, position + max_size)
+        if position >= len(self.data) or end < 0:
+            return None
+        return self.data[position:end].decode('latin-1')
+
+
+def _format_version(most_significant: int, least_significant: int) -> str:
+    return '.'.join(str(part) for part in (most_significant >> 16, most_significant & 0xffff,
+                                           least_significant >> 16, least_significant & 0xffff))
+
+
+def _inspect_pe(payload: _PartialPayload, info: XtraInfo):
+    headers = payload.read(0, 0x40)
+    if headers is None:
+        return
+    (pe_offset,) = unpack_from('<I', headers, 0x3c)
+    coff = payload.read(pe_offset, 24)
+    if coff is None or coff[:4] != b'PE\x00\x00':
+        return
+    info.format = 'PE'
+    machine, sections_count, _, _, _, optional_size, _ = unpack_from('<HHIIIHH', coff, 4)
+    info.machine = machine
+
+    optional_position = pe_offset + 24
+    optional = payload.read(optional_position, optional_size)
+    if optional is None:
+        return
+    (magic,) = unpack_from('<H', optional)
+    directories_offset = 112 if magic == 0x20b else 96
+    export_rva, _ = unpack_from('<II', optional, directories_offset)
+    resource_rva, _ = unpack_from('<II', optional, directories_offset + 16)
+
+    sections = []
+    section_table = payload.read(optional_position + optional_size, sections_count * 40)
+    if section_table is None:
+        return
+    for i in range(sections_count):
+        virtual_size, virtual_address, raw_size, raw_position = unpack_from('<IIII', section_table, i * 40 + 8)
+        sections.append((virtual_address, max(virtual_size, raw_size), raw_position))
+
+    def offset_of(rva: int) -> Optional[int]:
+        for virtual_address, size, raw_position in sections:
+            if virtual_address <= rva < virtual_address + size:
+                return rva - virtual_address + raw_position
+        return None
+
+    export_offset = offset_of(export_rva) if export_rva else None
+    if export_offset is not None:
+        _inspect_pe_exports(payload, info, export_offset, offset_of)
+
+    resource_offset = offset_of(resource_rva) if resource_rva else None
+    if resource_offset is not None:
+        _inspect_pe_version(payload, info, resource_offset, offset_of)
+
+
+def _inspect_pe_exports(payload: _PartialPayload, info: XtraInfo, export_offset: int, offset_of):
+    directory = payload.read(export_offset, 40)
+    if directory is None:
+        return
+    names_count, _, names_rva = unpack_from('<III', directory, 24)
+    names_offset = offset_of(names_rva)
+    names = payload.read(names_offset, names_count * 4) if names_offset is not None else None
+    if names is None:
+        return
+    for name_rva in unpack_from(f'<{names_count}I', names):
+        name_offset = offset_of(name_rva)
+        name = payload.read_string(name_offset) if name_offset is not None else None
+        if name is not None:
+            info.exports.append(name)
+
+
+def _first_resource_entry(payload: _PartialPayload, resource_offset: int, directory_offset: int,
+                          entry_id: Optional[int] = None) -> Optional[Tuple[int, bool]]:
+    directory = payload.read(resource_offset + directory_offset, 16)
+    if directory is None:
+        return None
+    named_count, id_count = unpack_from('<HH', directory, 12)
+    entries = payload.read(resource_offset + directory_offset + 16, (named_count + id_count) * 8)
+    if entries is None:
+        return None
+    for name, offset in zip(*[iter(unpack_from(f'<{2 * (named_count + id_count)}I', entries))] * 2):
+        if entry_id is None or name == entry_id:
+            return offset & 0x7fffffff, bool(offset & 0x80000000)
+    return None
+
+
+def _inspect_pe_version(payload: _PartialPayload, info: XtraInfo, resource_offset: int, offset_of):
+    # Type, name and language levels of the resource tree
+    entry = _first_resource_entry(payload, resource_offset, 0, RT_VERSION)
+    for _ in range(2):
+        if entry is None or not entry[1]:
+            break
+        entry = _first_resource_entry(payload, resource_offset, entry[0])
+    if entry is None or entry[1]:
+        return
+
+    data_entry = payload.read(resource_offset + entry[0], 8)
+    if data_entry is None:
+        return
+    data_rva, data_size = unpack_from('<II', data_entry)
+    data_offset = offset_of(data_rva)
+    version = payload.read(data_offset, data_size) if data_offset is not None else None
+    if version is None:
+        return
+
+    fixed_info = version.find(VS_FIXEDFILEINFO_SIGNATURE)
+    if fixed_info < 0 or fixed_info + 24 > len(version):
+        return
+    file_ms, file_ls, product_ms, product_ls = unpack_from('<IIII', version, fixed_info + 8)
+    info.file_version = _format_version(file_ms, file_ls)
+    info.product_version = _format_version(product_ms, product_ls)
+
+
+def _inspect_macho(payload: _PartialPayload, info: XtraInfo, position: int = 0):
+    magic = payload.read(position, 4)
+    if magic == MACHO_FAT_MAGIC:
+        # The first architecture of a universal binary is inspected, unless it is not a Mach-O image itself
+        arch = payload.read(position + 8, 20)
+        if arch is None:
+            return
+        (arch_position,) = unpack_from('>I', arch, 8)
+        if payload.read(arch_position, 4) in MACHO_MAGICS:
+            _inspect_macho(payload, info, arch_position)
+        return
+    if magic not in MACHO_MAGICS:
+        return
+
+    endianness, header_size = MACHO_MAGICS[magic]
+    header = payload.read(position, header_size)
+    if header is None:
+        return
+    info.format = 'Mach-O'
+    info.machine, _, _, commands_count, commands_size = unpack_from(endianness + 'iIIII', header, 4)
+
+    commands = payload.read(position + header_size, commands_size)
+    if commands is None:
+        return
+    offset = 0
+    for _ in range(commands_count):
+        command, command_size = unpack_from(endianness + 'II', commands, offset)
+        if command == LC_ID_DYLIB:
+            (current,) = unpack_from(endianness + "I", commands, offset + 16)
+            info.file_version = f'{current >> 16}.{(current >> 8) & 0xff}.{current & 0xff}'
+        elif command == LC_SOURCE_VERSION:
+            (version,) = unpack_from(endianness + 'Q', commands, offset + 8)
+            info.product_version = '.'.join(str(part) for part in (
+                version >> 40, (version >> 30) & 0x3ff, (version >> 20) & 0x3ff, (version >> 10) & 0x3ff,
+                version & 0x3ff))
+        if command_size < 8:
+            break
+        offset += command_size
+
+
+def inspect_xtra(fp: BinaryIO, position: int, filename: str = '', index: int = -1,
+                 max_inspected_size: int = DEFAULT_MAX_INSPECTED_SIZE) -> XtraInfo:
+    reader = RangeReader(fp)
+    data = reader.read(position, 8 + XtraHeader.SIZE)
+    if len(data) < 8 + XtraHeader.SIZE or data[:4] != b'RIFF':
+        raise ParsingError('Not a RIFF Xtra', position)
+    header = XtraHeader.unpack(data, offset=8)
+    if header.kind != XtraHeader.KIND:
+        raise ParsingError('Not a RIFF Xtra', position)
+
+    (chunk_size,) = unpack_from('>I', data, 4)
+    uncompressed_size, compressed_size = header.uncompressed_size, header.compressed_size
+    if not header.fits(chunk_size):
+        raise ParsingError(f'Xtra compressed size {compressed_size} exceeds its chunk', position)
+
+    data_position = position + 8 + XtraHeader.SIZE
+    info = XtraInfo(filename, index, compressed_size, uncompressed_size,
+                    hash_range(reader, data_position, compressed_size).hex())
+
+    payload = _PartialPayload(reader, data_position, compressed_size, uncompressed_size, max_inspected_size)
+    try:
+        magic = payload.read(0, 4)
+        if magic is not None and magic[:2] == b'MZ':
+            _inspect_pe(payload, info)
+        elif magic is not None and (magic in MACHO_MAGICS or magic == MACHO_FAT_MAGIC):
+            _inspect_macho(payload, info)
+        elif magic is not None and payload.read(0, 8) == b'Joy!peff':
+            info.format = 'PEF'
+    except (StructError, zlib.error):
+        # Truncated or malformed images keep whatever metadata was found before the error
+        pass
+    info.inspected_size = len(payload.data)
+    return info
+
+
+def inventory_xtras(fp: BinaryIO, position: Optional[int] = None, limits: Optional[ParsingLimits] = None,
+                    max_inspected_size: int = DEFAULT_MAX_INSPECTED_SIZE) -> List[XtraInfo]:
+    if position is None:
+        position = locate_archive(fp)
+
+    archive_type, imap, mmap = load_memory_map(fp, position, limits)
+    if archive_type != 'APPL':
+        raise ParsingError(f'Expected an APPL archive, got {archive_type}')
+
+    return [
+        inspect_xtra(fp, mmap.entry(index).position, filename, index, max_inspected_size)
+        for index, (filename, file_type) in load_file_table(fp, mmap, limits).items()
+        if file_type == FileType.XTRA
+    ]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m directorfile.inventory',
+                                     description='List the Xtras of a projector with their version metadata')
+    parser.add_argument('filename')
+    args = parser.parse_args(argv)
+
+    with open(args.filename, 'rb') as fp:
+        for info in inventory_xtras(fp):
+            print(info)
+            for name in info.exports:
+                print(f'      {name}')
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
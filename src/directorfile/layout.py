@@ -0,0 +1,117 @@
+import hashlib
+import os
+import threading
+from struct import Struct
+from typing import BinaryIO, Iterator, Optional, Tuple
+
+from directorfile.archive.base import RIFXArchiveResource
+from directorfile.archive.director import MMapResource, load_memory_map
+from directorfile.common import EndiannessAwareStream, ParsingError, ParsingLimits
+from directorfile.projector import Projector
+
+READ_BLOCK_SIZE = 0x10000
+IGNORED_TAGS = ('free', 'junk', '\x00\x00\x00\x00')
+
+
+def locate_archive(fp: BinaryIO) -> int:
+    fp.seek(0)
+    if fp.read(4) in (b'RIFX', b'XFIR'):
+        return 0
+    return Projector().locate_application(fp)
+
+
+def payload_range(entry: MMapResource.Entry) -> Tuple[int, int]:
+    # Application "File" entries count their own 8-byte header in the size
+    if entry.tag == 'File':
+        return entry.position + 8, entry.size - 8
+    return entry.position + 8, entry.size
+
+
+def chunk_end(entry: MMapResource.Entry) -> int:
+    position, size = payload_range(entry)
+    return position + size
+
+
+# Reads byte ranges without relying on the shared seek position, so it can be used from several threads
+class RangeReader:
+    def __init__(self, fp: BinaryIO):
+        self.fp = fp
+        self._lock = threading.Lock()
+        try:
+            self._fileno = fp.fileno()
+        except (AttributeError, OSError):
+            self._fileno = None
+        if not hasattr(os, 'pread'):
+            self._fileno = None
+
+    def read(self, position: int, size: int) -> bytes:
+        if self._fileno is not None:
+            return os.pread(self._fileno, size, position)
+        with self._lock:
+            self.fp.seek(position)
+            return self.fp.read(size)
+
+    def iter_blocks(self, position: int, size: int, block_size: int = READ_BLOCK_SIZE) -> Iterator[bytes]:
+        while size > 0:
+            block = self.read(position, min(size, block_size))
+            if not block:
+                break
+            yield block
+            position += len(block)
+            size -= len(block)
+
+
+def hash_range(reader: RangeReader, position: int, size: int) -> bytes:
+    digest = hashlib.sha1()
+    for block in reader.iter_blocks(position, size):
+        digest.update(block)
+    return digest.digest()
+
+
+def copy_range(source: BinaryIO, fp: BinaryIO, size: int, block_size: int = READ_BLOCK_SIZE):
+    while size > 0:
+        block = source.read(min(size, block_size))
+        if not block:
+            raise EOFError(f'Source ended {size} bytes early')
+        fp.write(block)
+        size -= len(block)
+
+
+# Copies an archive as is to the current position of fp, only relocating the absolute positions in its imap and mmap
+def copy_archive(source: BinaryIO, fp: BinaryIO, source_position: Optional[int] = None,
+                 available: Optional[int] = None, limits: Optional[ParsingLimits] = None) -> int:
+    if source_position is None:
+        source_position = source.tell()
+    start = fp.tell()
+
+    source.seek(source_position)
+    reader = RIFXArchiveResource().parse_tag(source)
+    size = reader.read_ui32()
+    if available is not None and 8 + size > available:
+        raise ParsingError(f'Archive of {size} bytes exceeds the {available} bytes available', source_position)
+    archive_type, imap, mmap = load_memory_map(source, source_position, limits)
+
+    mmap_size = MMapResource.calculate_needed_size(len(mmap.entries))
+    source.seek(imap.mmap_position + 8)
+    mmap_data = bytearray(source.read(mmap_size))
+
+    source.seek(source_position)
+    copy_range(source, fp, 8 + size)
+    end = fp.tell()
+
+    offset = start - source_position
+    entry_position = Struct(reader.endianness + 'I')
+    # Free entries may be left at position 0, outside of the archive
+    for entry in mmap.entries:
+        if source_position <= entry.position <= source_position + 8 + size:
+            field_offset = MMapResource.HEADER_SIZE + entry.index * MMapResource.ENTRY_WIDTH + 8
+            entry_position.pack_into(mmap_data, field_offset, entry.position + offset)
+
+    writer = EndiannessAwareStream(fp, reader.endianness)
+    writer.jump(start + 12 + 8 + 4)
+    writer.write_ui32(imap.mmap_position + offset)
+    writer.jump(imap.mmap_position + offset + 8)
+    writer.write_buffer(mmap_data)
+    writer.jump(end)
+
+    return size
@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import os
+import re
+from dataclasses import asdict, dataclass, field
+from typing import BinaryIO, Dict, List, Optional
+
+from directorfile.archive.application import FileType, RIFFXtraFileResource, load_file_table
+from directorfile.archive.director import load_memory_map
+from directorfile.common import ParsingLimits
+from directorfile.layout import IGNORED_TAGS, RangeReader, copy_archive, locate_archive, payload_range
+
+
+@dataclass
+class WorkItem:
+    index: int
+    tag: str
+    position: int
+    size: int
+    filename: str = ''
+    file_type: Optional[FileType] = None
+
+    @property
+    def output_name(self) -> str:
+        # Projectors may hold several files of the same name from different folders
+        if self.filename:
+            basename = os.path.basename(self.filename.replace('\\', '/'))
+            return f'{self.index}_{basename}'
+        return f'{self.index}.{re.sub(r"[^0-9A-Za-z]", "_", self.tag)}'
+
+
+@dataclass
+class WorkPlan:
+    source: str
+    archive_position: int
+    archive_type: str
+    items: List[WorkItem] = field(default_factory=list)
+
+    def __repr__(self):
+        return f'<WorkPlan for "{self.source}" ({len(self.items)} items, {self.total_size} bytes)>'
+
+    @property
+    def total_size(self) -> int:
+        return sum(item.size for item in self.items)
+
+    def split(self, count: int) -> List[WorkPlan]:
+        shards = [WorkPlan(self.source, self.archive_position, self.archive_type) for _ in range(count)]
+        for item in sorted(self.items, key=lambda item: item.size, reverse=True):
+            min(shards, key=lambda shard: shard.total_size).items.append(item)
+        for shard in shards:
+            shard.items.sort(key=lambda item: item.position)
+        return shards
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> WorkPlan:
+        items = [
+            WorkItem(**{**item, 'file_type': None if item['file_type'] is None else FileType(item['file_type'])})
+            for item in data['items']
+        ]
+        return cls(data['source'], data['archive_position'], data['archive_type'], items)
+
+
+def create_work_plan(fp: BinaryIO, source: str = '', position: Optional[int] = None,
+                     limits: Optional[ParsingLimits] = None) -> WorkPlan:
+    if not source:
+        source = os.path.abspath(fp.name)
+    if position is None:
+        position = locate_archive(fp)
+
+    archive_type, imap, mmap = load_memory_map(fp, position, limits)
+    file_table = {}
+    if archive_type == 'APPL':
+        file_table = load_file_table(fp, mmap, limits)
+
+    plan = WorkPlan(source, position, archive_type)
+    for entry in mmap.entries[3:]:
+        if entry.tag in IGNORED_TAGS:
+            continue
+        if archive_type == 'APPL' and entry.tag != 'File':
+            continue
+
+        filename, file_type = file_table.get(entry.index, ('', None))
+        data_position, data_size = payload_range(entry)
+        plan.items.append(WorkItem(entry.index, entry.tag, data_position, data_size, filename, file_type))
+    return plan
+
+
+def _extract_item(fp: BinaryIO, reader: RangeReader, item: WorkItem, output: BinaryIO,
+                  limits: Optional[ParsingLimits]):
+    if item.tag != 'File':
+        for block in reader.iter_blocks(item.position, item.size):
+            output.write(block)
+        return
+
+    header_position = item.position - 8
+    tag = reader.read(header_position, 4)
+    if tag in (b'RIFF', b'FFIR'):
+        xtra = RIFFXtraFileResource().load(fp, header_position, item.size + 8, limits)
+        output.write(xtra.data)
+    else:
+        copy_archive(fp, output, header_position, item.size + 8, limits)
+
+
+def execute_plan(shard: WorkPlan, output_dir: str, fp: Optional[BinaryIO] = None,
+                 limits: Optional[ParsingLimits] = None) -> List[str]:
+    os.makedirs(output_dir, exist_ok=True)
+
+    if fp is None:
+        with open(shard.source, 'rb') as fp:
+            return execute_plan(shard, output_dir, fp, limits)
+
+    reader = RangeReader(fp)
+    paths = []
+    for item in shard.items:
+        path = os.path.join(output_dir, item.output_name)
+        with open(path, 'w+b') as output:
+            _extract_item(fp, reader, item, output, limits)
+        paths.append(path)
+    return paths
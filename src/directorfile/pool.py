@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import io
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import BinaryIO, Tuple, Union
+
+FileSignature = Tuple[int, int]
+
+
+class StaleFileError(OSError):
+    pass
+
+
+@dataclass
+class PoolStatistics:
+    hits: int = 0
+    opens: int = 0
+    closes: int = 0
+
+
+def _signature(stat: os.stat_result) -> FileSignature:
+    return stat.st_size, stat.st_mtime_ns
+
+
+# A file whose descriptor is borrowed from the pool for every read, and reopened by path once the pool closed it
+class PooledFile(io.RawIOBase):
+    name: str
+    signature: FileSignature
+
+    def __init__(self, pool: FileHandlePool, path: str, signature: FileSignature):
+        super().__init__()
+        self.name = path
+        self.signature = signature
+        self._pool = pool
+        self._position = 0
+
+    def __repr__(self):
+        return f'<PooledFile "{self.name}">'
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += self.signature[0]
+        if offset < 0:
+            raise ValueError(f'Negative seek position {offset}')
+        self._position = offset
+        return offset
+
+    def tell(self) -> int:
+        return self._position
+
+    def readinto(self, buffer) -> int:
+        count = self._pool._read_into(self, self._position, buffer)
+        self._position += count
+        return count
+
+
+# An open descriptor, closed once it is discarded and no read borrows it anymore
+class _Handle:
+    file: io.FileIO
+    signature: FileSignature
+    borrowers: int
+    discarded: bool
+
+    def __init__(self, path: str):
+        self.file = open(path, 'rb', buffering=0)
+        self.signature = _signature(os.fstat(self.file.fileno()))
+        self.borrowers = 0
+        self.discarded = False
+        self._lock = threading.Lock()
+
+    def read_into(self, position: int, buffer) -> int:
+        if hasattr(os, 'preadv'):
+            return os.preadv(self.file.fileno(), [buffer], position)
+        with self._lock:
+            self.file.seek(position)
+            return self.file.readinto(buffer)
+
+
+class FileHandlePool:
+    DEFAULT_MAX_OPEN = 64
+
+    max_open: int
+    statistics: PoolStatistics
+
+    _handles: OrderedDict[str, _Handle]
+
+    def __init__(self, max_open: int = DEFAULT_MAX_OPEN):
+        if max_open < 1:
+            raise ValueError('The pool must allow at least one open file')
+        self.max_open = max_open
+        self.statistics = PoolStatistics()
+        self._handles = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f'<{type(self).__qualname__} ({len(self._handles)}/{self.max_open} open) at {hex(id(self))}>'
+
+    def __len__(self):
+        return len(self._handles)
+
+    def open(self, path: Union[str, os.PathLike], buffering: int = io.DEFAULT_BUFFER_SIZE) -> BinaryIO:
+        path = os.path.abspath(path)
+        with self._lock:
+            # A handle opened before the file was rewritten would keep serving the old signature
+            handle = self._handles.get(path)
+            if handle is not None and handle.signature != _signature(os.stat(path)):
+                self._discard(path)
+            signature = self._acquire(path).signature
+        raw = PooledFile(self, path, signature)
+        return io.BufferedReader(raw, buffering) if buffering else raw
+
+    def close(self, path: Union[str, os.PathLike, None] = None):
+        with self._lock:
+            paths = list(self._handles) if path is None else [os.path.abspath(path)]
+            for path in paths:
+                self._discard(path)
+
+    def _discard(self, path: str):
+        handle = self._handles.pop(path, None)
+        if handle is not None:
+            handle.discarded = True
+            if not handle.borrowers:
+                handle.file.close()
+            self.statistics.closes += 1
+
+    def _acquire(self, path: str) -> _Handle:
+        handle = self._handles.get(path)
+        if handle is not None:
+            self._handles.move_to_end(path)
+            self.statistics.hits += 1
+            return handle
+
+        while len(self._handles) >= self.max_open:
+            self._discard(next(iter(self._handles)))
+
+        handle = _Handle(path)
+        self._handles[path] = handle
+        self.statistics.opens += 1
+        return handle
+
+    def _read_into(self, file: PooledFile, position: int, buffer) -> int:
+        with self._lock:
+            handle = self._acquire(file.name)
+            # A file rewritten in place keeps its descriptor, which then reads the new contents
+            if _signature(os.fstat(handle.file.fileno())) != handle.signature:
+                self._discard(file.name)
+                handle = self._acquire(file.name)
+            if handle.signature != file.signature:
+                raise StaleFileError(f'"{file.name}" changed since it was opened')
+            handle.borrowers += 1
+
+        # The pool lock is only held to borrow the handle, so that reads of different files run concurrently
+        try:
+            return handle.read_into(position, buffer)
+        finally:
+            with self._lock:
+                handle.borrowers -= 1
+                if handle.discarded and not handle.borrowers:
+                    handle.file.close()
@@ -2,10 +2,10 @@ import os
 from enum import Enum, auto
 from io import SEEK_END
 from struct import pack, unpack
-from typing import BinaryIO
+from typing import BinaryIO, Optional
 
 from directorfile.archive import ApplicationArchiveResource
-from directorfile.common import Endianness, EndiannessAwareStream, ParsingError
+from directorfile.common import Endianness, EndiannessAwareStream, ParsingError, ParsingLimits, ValidationLevel
 
 
 class ProjectorFormat(Enum):
@@ -26,6 +26,7 @@ class Projector:
 
     _filename: str
     _format: ProjectorFormat
+    _pj_position: int
 
     def __init__(self, filename: str = ''):
         self._filename = filename
@@ -36,18 +37,27 @@ class Projector:
         else:
             return f'<Projector at {hex(id(self))}>'
 
-    def load(self, fp: BinaryIO):
+    @property
+    def format(self) -> ProjectorFormat:
+        return self._format
+
+    @property
+    def pj_position(self) -> int:
+        return self._pj_position
+
+    def load(self, fp: BinaryIO, limits: Optional[ParsingLimits] = None,
+             validation: ValidationLevel = ValidationLevel.STRICT):
         if hasattr(fp, 'name'):
             self._filename = os.path.abspath(fp.name)
 
-        position = self._locate_application(fp)
+        position = self.locate_application(fp)
         fp.seek(0)
         self.executable = fp.read(position)
-        self.application = ApplicationArchiveResource().load(fp, position)
+        self.application = ApplicationArchiveResource().load(fp, position, limits=limits, validation=validation)
 
         return self
 
-    def _locate_application(self, fp: BinaryIO):
+    def locate_application(self, fp: BinaryIO) -> int:
         fp.seek(0)
         head = fp.read(0x20)
         if head[0:2] == b'MZ':
@@ -77,10 +87,13 @@ class Projector:
     def save(self, fp: BinaryIO, endianness: Endianness):
         fp.write(self.executable)
         self.application.save(fp, endianness)
+        self.write_trailer(fp)
 
+    def write_trailer(self, fp: BinaryIO):
         if self._format == ProjectorFormat.WINDOWS:
             fp.write(pack('<I', self._pj_position))
 
 
-def load_projector(fp: BinaryIO, name: str = ''):
-    return Projector(name).load(fp)
+def load_projector(fp: BinaryIO, name: str = '', limits: Optional[ParsingLimits] = None,
+                   validation: ValidationLevel = ValidationLevel.STRICT):
+    return Projector(name).load(fp, limits, validation)
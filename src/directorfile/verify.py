@@ -0,0 +1,206 @@
+from __future__ import annotations
+
+import argparse
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from struct import error as StructError, unpack
+from typing import BinaryIO, List, Optional
+
+from directorfile.archive.application import XtraHeader, load_file_table
+from directorfile.archive.director import MMapResource, load_memory_map
+from directorfile.common import Endianness, ParsingError
+from directorfile.layout import IGNORED_TAGS, RangeReader, chunk_end, locate_archive, payload_range
+
+DECOMPRESSION_BLOCK_SIZE = 0x10000
+FILE_TAGS = {'RIFX', 'RIFF'}
+
+
+@dataclass
+class Finding:
+    message: str
+    index: Optional[int] = None
+    tag: str = ''
+
+    def __str__(self):
+        if self.index is None:
+            return self.message
+        return f'{self.index} {self.tag}: {self.message}'
+
+
+@dataclass
+class ChunkReport:
+    entry: MMapResource.Entry
+    checksum: Optional[int] = None
+    findings: List[Finding] = field(default_factory=list)
+
+    def add_finding(self, message: str):
+        self.findings.append(Finding(message, self.entry.index, self.entry.tag))
+
+
+@dataclass
+class VerificationReport:
+    findings: List[Finding] = field(default_factory=list)
+    chunks: List[ChunkReport] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not self.findings
+
+    @property
+    def checksums(self):
+        return {chunk.entry.index: chunk.checksum for chunk in self.chunks}
+
+
+def _read_chunk_header(reader: RangeReader, position: int):
+    header = reader.read(position, 8)
+    if len(header) < 8:
+        return
+
+    tag = header[:4].decode('latin-1')
+    for endianness in Endianness:
+        size, = unpack(endianness + 'I', header[4:])
+        yield tag if endianness == Endianness.BIG_ENDIAN else tag[::-1], endianness, size
+
+
+def _verify_xtra(reader: RangeReader, report: ChunkReport, endianness: Endianness):
+    position, size = payload_range(report.entry)
+    data = reader.read(position, XtraHeader.SIZE)
+    if len(data) < XtraHeader.SIZE:
+        report.add_finding('Truncated Xtra header')
+        return
+
+    header = XtraHeader.unpack(data, endianness)
+    for problem in header.problems():
+        report.add_finding(problem)
+    if header.kind != XtraHeader.KIND:
+        return
+    if not header.fits(size):
+        report.add_finding(f'Xtra compressed size {header.compressed_size} exceeds the chunk')
+        return
+    uncompressed_size, compressed_size = header.uncompressed_size, header.compressed_size
+
+    decompressor = zlib.decompressobj()
+    total = 0
+    try:
+        for block in reader.iter_blocks(position + XtraHeader.SIZE, compressed_size):
+            while block:
+                total += len(decompressor.decompress(block, DECOMPRESSION_BLOCK_SIZE))
+                block = decompressor.unconsumed_tail
+        total += len(decompressor.flush())
+    except zlib.error as e:
+        report.add_finding(f'Corrupt Xtra stream: {e}')
+        return
+
+    if not decompressor.eof:
+        report.add_finding('Truncated Xtra stream')
+    if total != uncompressed_size:
+        report.add_finding(f'Xtra decompressed to {total} bytes, expected {uncompressed_size}')
+
+
+def _verify_chunk(reader: RangeReader, entry: MMapResource.Entry) -> ChunkReport:
+    report = ChunkReport(entry)
+    position, size = payload_range(entry)
+
+    headers = list(_read_chunk_header(reader, entry.position))
+    if not headers:
+        report.add_finding('Truncated chunk header')
+        return report
+
+    expected_tags = FILE_TAGS if entry.tag == 'File' else {entry.tag}
+    matching = [(tag, endianness, data_size) for tag, endianness, data_size in headers if tag in expected_tags]
+    if not matching:
+        report.add_finding(f'Chunk header tag {headers[0][0]!r} does not match the mmap')
+        return report
+
+    tag, endianness, data_size = matching[0]
+    if data_size != size:
+        report.add_finding(f'Chunk header size {data_size} does not match the mmap size {size}')
+
+    checksum = 0
+    for block in reader.iter_blocks(position, size):
+        checksum = zlib.crc32(block, checksum)
+    report.checksum = checksum
+
+    if tag == 'RIFF':
+        _verify_xtra(reader, report, endianness)
+
+    return report
+
+
+def verify_archive(fp: BinaryIO, position: Optional[int] = None, max_workers: Optional[int] = None) \
+        -> VerificationReport:
+    report = VerificationReport()
+    if position is None:
+        position = locate_archive(fp)
+
+    try:
+        archive_type, imap, mmap = load_memory_map(fp, position)
+    except (AssertionError, ParsingError, StructError, UnicodeDecodeError) as e:
+        report.findings.append(Finding(f'Invalid memory map: {str(e) or type(e).__name__}'))
+        return report
+
+    if not mmap.entries:
+        report.findings.append(Finding('Memory map has no entries'))
+        return report
+
+    archive_entry = mmap.entries[0]
+    if archive_entry.tag != 'RIFX' or archive_entry.position != position:
+        report.findings.append(Finding('First mmap entry does not describe the archive', 0, archive_entry.tag))
+    archive_end = position + 8 + archive_entry.size
+
+    entries = []
+    for entry in mmap.entries[1:]:
+        if entry.tag in IGNORED_TAGS:
+            continue
+        if entry.position < position or chunk_end(entry) > archive_end:
+            report.findings.append(Finding('Chunk lies outside of the archive bounds', entry.index, entry.tag))
+        else:
+            entries.append(entry)
+
+    previous = None
+    for entry in sorted(entries, key=lambda e: e.position):
+        if previous is not None and chunk_end(previous) > entry.position:
+            report.findings.append(Finding(f'Chunk overlaps chunk {previous.index}', entry.index, entry.tag))
+        previous = entry
+
+    if archive_type == 'APPL':
+        try:
+            file_table = load_file_table(fp, mmap)
+        except (AssertionError, ParsingError, StructError, UnicodeDecodeError) as e:
+            report.findings.append(Finding(f'Invalid file table: {str(e) or type(e).__name__}'))
+        else:
+            for index, (filename, file_type) in file_table.items():
+                if mmap.entries[index].tag != 'File':
+                    report.findings.append(Finding(f'File "{filename}" does not point to a File chunk', index, 'File'))
+
+    reader = RangeReader(fp)
+    with ThreadPoolExecutor(max_workers) as executor:
+        report.chunks = list(executor.map(lambda entry: _verify_chunk(reader, entry), entries))
+
+    for chunk in report.chunks:
+        report.findings.extend(chunk.findings)
+
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m directorfile.verify',
+                                     description='Validate the structure of an archive or projector')
+    parser.add_argument('filename')
+    parser.add_argument('-j', '--jobs', type=int, default=None)
+    args = parser.parse_args(argv)
+
+    with open(args.filename, 'rb') as fp:
+        report = verify_archive(fp, max_workers=args.jobs)
+
+    for chunk in report.chunks:
+        checksum = '--------' if chunk.checksum is None else f'{chunk.checksum:08x}'
+        print(f'{chunk.entry.index:5} {chunk.entry.tag} {checksum}')
+    for finding in report.findings:
+        print(finding)
+    return 0 if report.ok else 1
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
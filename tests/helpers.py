@@ -0,0 +1,77 @@
+import io
+import struct
+import zlib
+from typing import Dict, Iterable, Tuple
+
+from directorfile.archive.application import ApplicationArchiveResource, RIFFXtraFileResource
+from directorfile.archive.base import Resource
+from directorfile.archive.director import DirectorArchiveResource, GenericResource, MMapResource, load_memory_map
+from directorfile.common import Endianness
+
+DIRECTOR_VERSION = 0x79f
+PROJECTOR_STUB_SIZE = 0x2000
+
+
+def generic(tag: str, data: bytes) -> GenericResource:
+    resource = GenericResource(tag)
+    resource.data = data
+    return resource
+
+
+def movie(resources: Dict[int, Resource]) -> DirectorArchiveResource:
+    return DirectorArchiveResource(resources=dict(resources), director_version=DIRECTOR_VERSION)
+
+
+def save(resource: Resource, endianness: Endianness = Endianness.BIG_ENDIAN, prefix: bytes = b'') -> bytes:
+    fp = io.BytesIO()
+    fp.write(prefix)
+    resource.save(fp, endianness)
+    return fp.getvalue()
+
+
+def movie_bytes(resources: Dict[int, Resource], endianness: Endianness = Endianness.BIG_ENDIAN) -> bytes:
+    return save(movie(resources), endianness)
+
+
+def xtra(filename: str, data: bytes) -> RIFFXtraFileResource:
+    resource = RIFFXtraFileResource(filename)
+    resource.data = data
+    return resource
+
+
+def application(xtras: Iterable[RIFFXtraFileResource] = (), movies: Iterable[Tuple[str, Resource]] = (),
+                casts: Iterable[Tuple[str, Resource]] = ()) -> ApplicationArchiveResource:
+    app = ApplicationArchiveResource()
+    app.director_version = DIRECTOR_VERSION
+    app.badd = {}
+    app.xtras = [(resource.filename, resource) for resource in xtras]
+    app.movies = list(movies)
+    app.casts = list(casts)
+    return app
+
+
+def projector_bytes(app: ApplicationArchiveResource) -> bytes:
+    # A Windows stub whose PJ01 section points right after itself, followed by the trailing section position
+    stub = b'MZ' + bytes(PROJECTOR_STUB_SIZE - 2) + b'10JP' + struct.pack('<I', PROJECTOR_STUB_SIZE + 8)
+    return save(app, Endianness.LITTLE_ENDIAN, stub) + struct.pack('<I', PROJECTOR_STUB_SIZE)
+
+
+def xtra_chunk(payload: bytes, uncompressed_size: int = None) -> bytes:
+    compressed = zlib.compress(payload)
+    if uncompressed_size is None:
+        uncompressed_size = len(payload)
+    body = (b'XtraFILE' + struct.pack('>II', len(compressed) + 0x1c, 0x1c)
+            + struct.pack('>6I', 0, 0, uncompressed_size, 0, len(compressed), 0) + compressed)
+    return b'RIFF' + struct.pack('>I', len(body)) + body
+
+
+def patch_mmap_entry(data: bytes, index: int, position: int = None, size: int = None, archive_position: int = 0) \
+        -> bytes:
+    _, imap, mmap = load_memory_map(io.BytesIO(data), archive_position)
+    endianness = '>' if data[archive_position:archive_position + 4] == b'RIFX' else '<'
+    entry = mmap.entries[index]
+    field_position = imap.mmap_position + 8 + MMapResource.HEADER_SIZE + index * MMapResource.ENTRY_WIDTH + 4
+    patched = bytearray(data)
+    struct.pack_into(endianness + 'II', patched, field_position,
+                     entry.size if size is None else size, entry.position if position is None else position)
+    return bytes(patched)
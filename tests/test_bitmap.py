@@ -0,0 +1,80 @@
+import io
+import random
+
+import numpy
+import pytest
+
+from directorfile.archive.bitmap import BitmapFormat, BitmapResource, _decode_buffer, _expand_array, _expand_buffer, \
+    decode_bitmaps
+from directorfile.archive.director import GenericResource, load_director_archive
+from directorfile.common import Endianness, ParsingError
+
+from helpers import generic, movie_bytes
+
+PALETTE = [(i, 255 - i, i // 2) for i in range(256)]
+
+
+def _bitmap(data: bytes) -> BitmapResource:
+    resource = BitmapResource()
+    resource.data = data
+    return resource
+
+
+def test_expanders_agree():
+    rng = random.Random(0)
+    for _ in range(2000):
+        data = rng.randbytes(rng.randrange(0, 80))
+        expanded = _expand_buffer(data)
+        for expected_size in (0, 1, len(expanded), len(expanded) + 3):
+            assert _expand_array(data, expected_size)[:expected_size] == expanded[:expected_size]
+
+
+def test_expand_runs():
+    bitmap_format = BitmapFormat(width=8, height=2)
+    assert _bitmap(b'\x02abc\xfdz\xffq').expand(bitmap_format) == b'abczzzzqq' + bytes(7)
+    assert _bitmap(b'x' * 16).expand(bitmap_format) == b'x' * 16
+
+
+@pytest.mark.parametrize('bit_depth', [1, 2, 4, 8, 16, 32])
+@pytest.mark.parametrize('palette', [None, PALETTE, PALETTE[:3]])
+def test_decoders_agree(bit_depth, palette):
+    width, height = 13, 5
+    bitmap_format = BitmapFormat(width=width, height=height, bit_depth=bit_depth, palette=palette)
+    expanded = random.Random(bit_depth).randbytes(bitmap_format.pitch * height)
+
+    array = _bitmap(expanded).decode(bitmap_format)
+    buffer = numpy.asarray(_decode_buffer(expanded, bitmap_format))
+    assert array.shape == buffer.shape
+    assert (array == buffer).all()
+
+
+def test_short_palette_is_padded_with_black():
+    bitmap_format = BitmapFormat(width=2, height=1, palette=[(1, 2, 3)])
+    decoded = _bitmap(b'\x00\x05').decode(bitmap_format)
+    assert decoded.tolist() == [[[1, 2, 3], [0, 0, 0]]]
+
+
+def test_unsupported_bit_depth():
+    with pytest.raises(ParsingError):
+        _bitmap(b'').decode(BitmapFormat(width=1, height=1, bit_depth=3))
+
+
+def test_decode_bitmaps():
+    archive = load_director_archive(io.BytesIO(movie_bytes({3: generic('BITD', b'\x03\x01\x02\x03\x04'),
+                                                            4: generic('STXT', b'text')})))
+    bitmaps = decode_bitmaps(archive, {3: BitmapFormat(width=4, height=1)})
+    assert bitmaps[3].tolist() == [[1, 2, 3, 4]]
+
+    with pytest.raises(ParsingError):
+        decode_bitmaps(archive, {4: BitmapFormat(width=4, height=1)})
+
+
+def test_malformed_typed_chunk_is_kept_as_raw_data():
+    data = movie_bytes({3: generic('KEY*', b'\x00\x01\x02\x03'), 4: generic('STXT', b'text')})
+    archive = load_director_archive(io.BytesIO(data))
+
+    assert type(archive.resources[3]) is GenericResource
+    assert archive.resources[3].data == b'\x00\x01\x02\x03'
+    output = io.BytesIO()
+    archive.save(output, Endianness.BIG_ENDIAN)
+    assert output.getvalue() == data
@@ -0,0 +1,83 @@
+import io
+import struct
+
+from directorfile.archive.director import DirectorArchiveResource
+from directorfile.builder import ApplicationBuilder, save_projector
+from directorfile.common import Endianness
+from directorfile.projector import ProjectorFormat, load_projector
+
+from helpers import DIRECTOR_VERSION, PROJECTOR_STUB_SIZE, application, generic, movie_bytes, projector_bytes, \
+    save, xtra
+
+XTRA_DATA = b'xtra code ' * 100
+
+
+def _movie(text: bytes) -> bytes:
+    return movie_bytes({3: generic('STXT', struct.pack('>III', 12, len(text), 0) + text),
+                        4: generic('VWSC', b'score' * 10)}, Endianness.LITTLE_ENDIAN)
+
+
+def _builder(tmp_path) -> ApplicationBuilder:
+    xtra_path = tmp_path / 'Sound.x32'
+    xtra_path.write_bytes(XTRA_DATA)
+    movie_path = tmp_path / 'intro.dir'
+    movie_path.write_bytes(_movie(b'intro'))
+
+    builder = ApplicationBuilder(DIRECTOR_VERSION)
+    builder.add_xtra(str(xtra_path))
+    builder.add_movie(movie_path)
+    builder.add_cast(io.BytesIO(_movie(b'shared')), 'shared.cst')
+    return builder
+
+
+def _expected_application():
+    return application(
+        xtras=[xtra('Sound.x32', XTRA_DATA)],
+        movies=[('intro.dir', DirectorArchiveResource().load(io.BytesIO(_movie(b'intro'))))],
+        casts=[('shared.cst', DirectorArchiveResource().load(io.BytesIO(_movie(b'shared'))))],
+    )
+
+
+def test_builder_matches_serializer(tmp_path):
+    builder = _builder(tmp_path)
+    streamed = io.BytesIO()
+    streamed.write(b'prefix')
+    size = builder.save(streamed, Endianness.LITTLE_ENDIAN)
+
+    expected = save(_expected_application(), Endianness.LITTLE_ENDIAN, b'prefix')
+    assert streamed.getvalue() == expected
+    assert struct.unpack_from('<I', expected, 10) == (size,)
+
+
+def test_save_projector(tmp_path):
+    template = tmp_path / 'template.exe'
+    template.write_bytes(projector_bytes(application()))
+
+    output = io.BytesIO()
+    save_projector(output, str(template), _builder(tmp_path))
+
+    expected = io.BytesIO()
+    projector = load_projector(io.BytesIO(template.read_bytes()))
+    projector.application = _expected_application()
+    projector.save(expected, Endianness.LITTLE_ENDIAN)
+    assert output.getvalue() == expected.getvalue()
+
+    projector = load_projector(io.BytesIO(output.getvalue()))
+    assert projector.format == ProjectorFormat.WINDOWS
+    assert projector.pj_position == PROJECTOR_STUB_SIZE
+    app = projector.application
+    assert [(name, resource.data) for name, resource in app.xtras] == [('Sound.x32', XTRA_DATA)]
+    assert [name for name, _ in app.movies] == ['intro.dir']
+    assert app.casts[0][1].resources[3].text == 'shared'
+
+
+def test_projector_round_trip():
+    projector = load_projector(io.BytesIO(projector_bytes(application(xtras=[xtra('Sound.x32', XTRA_DATA)]))))
+    assert len(projector.executable) == PROJECTOR_STUB_SIZE + 8
+
+    saved = io.BytesIO()
+    projector.save(saved, Endianness.LITTLE_ENDIAN)
+    resaved = io.BytesIO()
+    load_projector(io.BytesIO(saved.getvalue())).save(resaved, Endianness.LITTLE_ENDIAN)
+    assert resaved.getvalue() == saved.getvalue()
+    assert saved.getvalue()[-4:] == struct.pack('<I', PROJECTOR_STUB_SIZE)
@@ -0,0 +1,113 @@
+import io
+
+from directorfile.archive.cache import ResourceCache
+from directorfile.archive.director import load_director_archive
+from directorfile.common import Endianness
+
+from helpers import generic, movie_bytes
+
+
+def _resources(count: int = 4, size: int = 100):
+    return {3 + i: generic('STXT', bytes([i]) * size) for i in range(count)}
+
+
+def test_least_recently_used_resource_is_evicted():
+    cache = ResourceCache(250)
+    a, b, c = generic('STXT', b'a'), generic('STXT', b'b'), generic('STXT', b'c')
+    cache.put('a', a, 100)
+    cache.put('b', b, 100)
+    assert cache.get('a') is a
+    cache.put('c', c, 100)
+
+    assert cache.get('b') is None
+    assert cache.get('a') is a
+    assert cache.get('c') is c
+    assert cache.statistics.evictions == 1
+    assert cache.statistics.size == 200
+
+
+def test_statistics():
+    cache = ResourceCache()
+    cache.put('a', generic('STXT', b'a'), 10)
+    cache.get('a')
+    cache.get('missing')
+    cache.put('a', generic('STXT', b'b'), 30)
+
+    assert (cache.statistics.hits, cache.statistics.misses, cache.statistics.size) == (1, 1, 30)
+    cache.discard('a')
+    assert cache.statistics.size == 0
+    assert len(cache) == 0
+
+
+def test_oversized_resource_is_kept_until_replaced():
+    cache = ResourceCache(10)
+    cache.put('a', generic('STXT', b'a'), 100)
+    assert cache.get('a') is not None
+    cache.put('b', generic('STXT', b'b'), 100)
+    assert cache.get('a') is None
+    assert cache.get('b') is not None
+
+
+def test_clear_drops_pinned_resources():
+    cache = ResourceCache()
+    cache.put('a', generic('STXT', b'a'), evictable=False)
+    cache.put('b', generic('STXT', b'b'), 10)
+    cache.clear()
+    assert len(cache) == 0
+    assert cache.statistics.size == 0
+
+
+def test_evicted_resources_are_read_again():
+    resources = _resources()
+    cache = ResourceCache(150)
+    archive = load_director_archive(io.BytesIO(movie_bytes(resources)), resource_cache=cache)
+
+    for _ in range(2):
+        for index, resource in resources.items():
+            assert archive.resources[index].data == resource.data
+    assert cache.statistics.evictions > 0
+    assert cache.statistics.size <= 150
+
+
+def test_shared_cache_keeps_archives_apart():
+    cache = ResourceCache()
+    first = load_director_archive(io.BytesIO(movie_bytes({3: generic('STXT', b'first')})), resource_cache=cache)
+    second = load_director_archive(io.BytesIO(movie_bytes({3: generic('STXT', b'other')})), resource_cache=cache)
+
+    assert first.resources[3].data == b'first'
+    assert second.resources[3].data == b'other'
+
+
+def test_repeated_loads_stay_within_the_budget():
+    data = movie_bytes(_resources())
+    cache = ResourceCache(1000)
+    for _ in range(50):
+        archive = load_director_archive(io.BytesIO(data), resource_cache=cache)
+        for index in archive.resources:
+            archive.resources[index]
+
+    assert cache.statistics.size <= 1000
+    assert len(cache) <= 10
+
+
+def test_lazy_resources_follow_the_memory_map():
+    resources = {5: generic('STXT', b'5'), 3: generic('BITD', b'3'), 4: generic('CLUT', b'4')}
+    archive = load_director_archive(io.BytesIO(movie_bytes(resources)), resource_cache=ResourceCache())
+
+    assert list(archive.resources) == [3, 4, 5]
+    assert archive.resources.indices_of('STXT') == [5]
+    assert archive.access_order == []
+    archive.resources[5]
+    archive.resources[3]
+    assert archive.access_order == [5, 3]
+
+
+def test_lazy_archive_saves_like_an_eager_one():
+    data = movie_bytes(_resources())
+    lazy = load_director_archive(io.BytesIO(data), resource_cache=ResourceCache(150))
+    eager = load_director_archive(io.BytesIO(data))
+
+    lazy_output, eager_output = io.BytesIO(), io.BytesIO()
+    lazy.save(lazy_output, Endianness.BIG_ENDIAN)
+    eager.save(eager_output, Endianness.BIG_ENDIAN)
+    assert lazy_output.getvalue() == eager_output.getvalue()
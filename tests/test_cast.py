@@ -0,0 +1,98 @@
+import io
+import struct
+
+import pytest
+
+from directorfile.archive.cache import ResourceCache
+from directorfile.archive.cast import CastIndex, CastMemberResource, CastMemberType, CastTableResource, \
+    KeyTableResource
+from directorfile.archive.director import load_director_archive
+from directorfile.common import Endianness, ParsingError
+
+from helpers import generic, movie_bytes
+
+
+def key_table(entries, allocated_length=None, reserved=b''):
+    if allocated_length is None:
+        allocated_length = len(entries)
+    data = struct.pack('>HHII', 0x0c, 0x0c, allocated_length, len(entries))
+    data += b''.join(struct.pack('>II4s', index, owner, tag.encode()) for index, owner, tag in entries)
+    return generic('KEY*', data + reserved)
+
+
+def cast_member(member_type: int, info: bytes = b'', specific_data: bytes = b''):
+    return generic('CASt', struct.pack('>III', member_type, len(info), len(specific_data)) + info + specific_data)
+
+
+def _cast_movie(key_entries=None, **kwargs):
+    if key_entries is None:
+        key_entries = [(4, 1024, 'CAS*'), (5, 6, 'STXT'), (7, 6, 'BITD')]
+    return movie_bytes({
+        3: key_table(key_entries, **kwargs),
+        4: generic('CAS*', struct.pack('>3I', 6, 0, 8)),
+        5: generic('STXT', b'text'),
+        6: cast_member(CastMemberType.TEXT, b'info', b'specific'),
+        7: generic('BITD', b'bitmap'),
+        8: cast_member(CastMemberType.BITMAP),
+    })
+
+
+def test_key_table_round_trips_unused_slots():
+    data = _cast_movie(allocated_length=8, reserved=bytes(5 * 0x0c))
+    archive = load_director_archive(io.BytesIO(data))
+
+    key_table = archive.resources[3]
+    assert isinstance(key_table, KeyTableResource)
+    assert key_table.allocated_length == 8
+    assert [entry.tag for entry in key_table.entries] == ['CAS*', 'STXT', 'BITD']
+
+    output = io.BytesIO()
+    archive.save(output, Endianness.BIG_ENDIAN)
+    assert output.getvalue() == data
+
+
+def test_cast_index():
+    archive = load_director_archive(io.BytesIO(_cast_movie()))
+    assert isinstance(archive.resources[4], CastTableResource)
+    index = CastIndex(archive)
+
+    assert list(index.libraries) == [1024]
+    first, third = index.member(1), index.member(3)
+    assert (first.index, first.chunks) == (6, {5: 'STXT', 7: 'BITD'})
+    assert (third.index, third.chunks) == (8, {})
+    with pytest.raises(KeyError):
+        index.member(2)
+
+    assert index.owner_of(5) is first
+    assert index.owner_of(6) is first
+    assert index.owner_of(4) is None
+
+    member = index.member_resource(1)
+    assert isinstance(member, CastMemberResource)
+    assert (member.member_type, member.info, member.specific_data) == (CastMemberType.TEXT, b'info', b'specific')
+    assert {i: chunk.data for i, chunk in index.member_chunks(1).items()} == {5: b'text', 7: b'bitmap'}
+
+
+def test_cast_index_loads_lazily():
+    cache = ResourceCache()
+    archive = load_director_archive(io.BytesIO(_cast_movie()), resource_cache=cache)
+    index = CastIndex(archive, first_member=10)
+
+    assert index.member(10).index == 6
+    assert archive.access_order == [3, 4]
+
+
+def test_cast_index_requires_a_cast_table():
+    archive = load_director_archive(io.BytesIO(_cast_movie([(5, 1024, 'CAS*')])))
+    with pytest.raises(ParsingError):
+        CastIndex(archive)
+
+    archive = load_director_archive(io.BytesIO(movie_bytes({3: generic('STXT', b'text')})))
+    with pytest.raises(ParsingError):
+        CastIndex(archive)
+
+
+def test_unknown_member_layout_is_kept_raw():
+    archive = load_director_archive(io.BytesIO(movie_bytes({3: cast_member(99), 4: generic('CASt', b'\x00\x01')})))
+    assert archive.resources[3].member_type is None
+    assert archive.resources[4].data == b'\x00\x01'
@@ -0,0 +1,69 @@
+import io
+
+from directorfile.common import Endianness
+from directorfile.diff import ChangeType, diff_archives, digest_archive, main
+
+from helpers import application, generic, movie, movie_bytes, projector_bytes, xtra
+
+
+def _movie_resources(fill: bytes = b'x'):
+    return {3: generic('STXT', fill * 10), 4: generic('BITD', b'bitmap'), 5: generic('CLUT', b'palette')}
+
+
+def test_identical_archives_have_no_changes():
+    data = movie_bytes(_movie_resources())
+    assert diff_archives(io.BytesIO(data), io.BytesIO(data)) == []
+
+
+def test_changed_added_and_removed_chunks():
+    old = _movie_resources()
+    new = _movie_resources()
+    new[3] = generic('STXT', b'changed')
+    del new[5]
+    new[6] = generic('VWSC', b'score')
+
+    changes = {(change.change, change.tag, change.old_index, change.new_index)
+               for change in diff_archives(io.BytesIO(movie_bytes(old)), io.BytesIO(movie_bytes(new)))}
+    assert changes == {
+        (ChangeType.CHANGED, 'STXT', 3, 3),
+        (ChangeType.REMOVED, 'CLUT', 5, None),
+        (ChangeType.ADDED, 'VWSC', None, 6),
+    }
+
+
+def test_endianness_does_not_matter_for_payloads():
+    resources = _movie_resources()
+    old = movie_bytes(resources, Endianness.BIG_ENDIAN)
+    new = movie_bytes(resources, Endianness.LITTLE_ENDIAN)
+    assert diff_archives(io.BytesIO(old), io.BytesIO(new)) == []
+
+
+def test_files_are_matched_by_filename():
+    embedded = movie(_movie_resources())
+    old = projector_bytes(application([xtra('a.x32', b'A' * 100)], [('movie.dir', embedded)]))
+    new = projector_bytes(application([xtra('a.x32', b'A' * 100), xtra('b.x32', b'B' * 100)],
+                                      [('movie.dir', embedded)]))
+
+    changes = [change for change in diff_archives(io.BytesIO(old), io.BytesIO(new)) if change.tag == 'File']
+    assert [(change.change, change.filename) for change in changes] == [(ChangeType.ADDED, 'b.x32')]
+
+
+def test_moved_embedded_movie_is_unchanged_until_its_chunks_change():
+    old = projector_bytes(application([xtra('a.x32', b'A' * 100)], [('movie.dir', movie(_movie_resources()))]))
+    moved = projector_bytes(application([xtra('a.x32', b'A' * 5000)], [('movie.dir', movie(_movie_resources()))]))
+    edited = projector_bytes(application([xtra('a.x32', b'A' * 100)], [('movie.dir', movie(_movie_resources(b'y')))]))
+
+    digests = digest_archive(io.BytesIO(old))
+    assert digests['movie.dir'].digest == digest_archive(io.BytesIO(moved))['movie.dir'].digest
+    assert digests['movie.dir'].digest != digest_archive(io.BytesIO(edited))['movie.dir'].digest
+
+
+def test_main_exit_code(tmp_path, capsys):
+    old = tmp_path / 'old.dir'
+    new = tmp_path / 'new.dir'
+    old.write_bytes(movie_bytes(_movie_resources()))
+    new.write_bytes(movie_bytes(_movie_resources(b'z')))
+
+    assert main([str(old), str(old)]) == 0
+    assert main([str(old), str(new)]) == 1
+    assert '~ 3/3 STXT' in capsys.readouterr().out
@@ -0,0 +1,134 @@
+import io
+import random
+import struct
+
+import pytest
+
+from directorfile.common import ParsingError
+from directorfile.inventory import inspect_xtra, inventory_xtras
+
+from helpers import application, generic, movie_bytes, projector_bytes, xtra, xtra_chunk
+
+LC_ID_DYLIB = 0x0d
+LC_SOURCE_VERSION = 0x2a
+
+
+def macho(endianness: str = '<') -> bytes:
+    name = b'Sound.dylib\x00'
+    id_dylib = struct.pack(endianness + 'IIIIII', LC_ID_DYLIB, 24 + len(name), 24, 0, 0x020103, 0x010000) + name
+    source_version = struct.pack(endianness + 'IIQ', LC_SOURCE_VERSION, 16, (1 << 40) | (2 << 30) | (3 << 20))
+    commands = id_dylib + source_version
+    magic = 0xfeedfacf
+    return struct.pack(endianness + 'IiIIIIII', magic, 0x01000007, 3, 6, 2, len(commands), 0, 0) + commands
+
+
+def fat(*images: bytes) -> bytes:
+    header = struct.pack('>II', 0xcafebabe, len(images))
+    position = 0x1000
+    data = b''
+    for image in images:
+        header += struct.pack('>iiIII', 0x01000007, 3, position + len(data), len(image), 12)
+        data += image
+    return header.ljust(position, b'\x00') + data
+
+
+def pe() -> bytes:
+    image = bytearray(0x400)
+    image[:2] = b'MZ'
+    struct.pack_into('<I', image, 0x3c, 0x40)
+
+    optional_size = 96 + 16 * 8
+    struct.pack_into('<4sHHIIIHH', image, 0x40, b'PE\x00\x00', 0x14c, 1, 0, 0, 0, optional_size, 0)
+    optional = 0x58
+    struct.pack_into('<H', image, optional, 0x10b)
+    struct.pack_into('<II', image, optional + 96, 0x1000, 0x40)
+    struct.pack_into('<II', image, optional + 112, 0x1080, 0x80)
+    struct.pack_into('<8sIIII', image, optional + optional_size, b'.rdata', 0x200, 0x1000, 0x200, 0x200)
+
+    section = 0x200
+    struct.pack_into('<III', image, section + 24, 2, 0, 0x1040)
+    struct.pack_into('<II', image, section + 0x40, 0x1050, 0x1060)
+    image[section + 0x50:section + 0x5c] = b'xtraInfo\x00'.ljust(12, b'\x00')
+    image[section + 0x60:section + 0x6c] = b'xtraCreate\x00'.ljust(12, b'\x00')
+
+    resources = section + 0x80
+    # Type, name and language directories, each with a single entry
+    for offset, entry_id, target in ((0, 16, 0x80000018), (0x18, 1, 0x80000030), (0x30, 0x409, 0x48)):
+        struct.pack_into('<12xHHII', image, resources + offset, 0, 1, entry_id, target)
+    struct.pack_into('<II', image, resources + 0x48, 0x1100, 0x40)
+    struct.pack_into('<8x4sIIIII', image, section + 0x100, b'\xbd\x04\xef\xfe', 0x10000,
+                     0x00080001, 0x00020003, 0x00080000, 0x00000001)
+    return bytes(image)
+
+
+def _inspect(payload: bytes, **kwargs):
+    return inspect_xtra(io.BytesIO(xtra_chunk(payload)), 0, 'Sound', **kwargs)
+
+
+@pytest.mark.parametrize('endianness', ['<', '>'])
+def test_macho(endianness):
+    info = _inspect(macho(endianness))
+    assert (info.format, info.machine) == ('Mach-O', 0x01000007)
+    assert info.file_version == '2.1.3'
+    assert info.product_version == '1.2.3.0.0'
+
+
+def test_fat_macho():
+    info = _inspect(fat(macho(), b'other'))
+    assert (info.format, info.file_version) == ('Mach-O', '2.1.3')
+
+
+def test_fat_without_macho():
+    assert _inspect(fat(b'\x7fELF' + bytes(60))).format == ''
+    # An architecture that points back to the universal header is not followed
+    looping = bytearray(fat(macho()))
+    struct.pack_into('>I', looping, 16, 0)
+    assert _inspect(bytes(looping)).format == ''
+
+
+def test_pe():
+    info = _inspect(pe())
+    assert (info.format, info.machine) == ('PE', 0x14c)
+    assert info.exports == ['xtraInfo', 'xtraCreate']
+    assert (info.file_version, info.product_version) == ('8.1.2.3', '8.0.0.1')
+    assert info.inspected_size == 0x400
+
+
+def test_pe_resource_loop():
+    image = bytearray(pe())
+    struct.pack_into('<I', image, 0x280 + 0x44, 0x80000030)
+    info = _inspect(bytes(image))
+    assert info.exports == ['xtraInfo', 'xtraCreate']
+    assert info.file_version is None
+
+
+@pytest.mark.parametrize('size', [0x30, 0x44, 0x60, 0x180, 0x300])
+def test_truncated_pe(size):
+    info = _inspect(pe()[:size])
+    assert info.file_version is None
+    assert info.inspected_size == size
+
+
+def test_random_data():
+    generator = random.Random(42)
+    for prefix in (b'', b'MZ', b'\xca\xfe\xba\xbe', b'\xcf\xfa\xed\xfe'):
+        for _ in range(50):
+            _inspect(prefix + generator.randbytes(generator.randrange(0x200)))
+
+
+def test_inspected_size_limit():
+    assert _inspect(pe(), max_inspected_size=0x100).inspected_size == 0x100
+
+
+def test_inventory_xtras():
+    data = projector_bytes(application([xtra('Sound.x32', pe()), xtra('Sound.dylib', macho())]))
+    infos = inventory_xtras(io.BytesIO(data))
+    assert [(info.filename, info.format, info.file_version) for info in infos] == [
+        ('Sound.x32', 'PE', '8.1.2.3'),
+        ('Sound.dylib', 'Mach-O', '2.1.3'),
+    ]
+
+    with pytest.raises(ParsingError):
+        inventory_xtras(io.BytesIO(movie_bytes({3: generic('STXT', bytes(12))})))
+    with pytest.raises(ParsingError):
+        inspect_xtra(io.BytesIO(data), 0)
@@ -0,0 +1,59 @@
+import io
+
+from directorfile.archive.cache import ResourceCache
+from directorfile.archive.cast import KeyTableResource
+from directorfile.archive.director import load_director_archive, load_memory_map
+from directorfile.common import Endianness
+
+from helpers import generic, movie, movie_bytes, save
+
+
+def _resources():
+    return {
+        3: generic('STXT', b'first text'),
+        4: generic('BITD', b'bitmap'),
+        5: generic('VWSC', b'score'),
+        6: KeyTableResource(),
+        7: generic('STXT', b'second text'),
+    }
+
+
+def _layout(data: bytes):
+    _, _, mmap = load_memory_map(io.BytesIO(data))
+    return [entry.index for entry in sorted(mmap.entries[3:], key=lambda entry: entry.position)]
+
+
+def test_default_layout_follows_indices():
+    assert _layout(movie_bytes(_resources())) == [3, 4, 5, 6, 7]
+
+
+def test_startup_chunks_are_laid_out_first():
+    archive = movie(_resources())
+    archive.optimize_layout()
+    assert archive.chunk_order == [6, 5]
+    assert _layout(save(archive)) == [6, 5, 3, 4, 7]
+
+
+def test_layout_follows_the_recorded_access_order():
+    data = movie_bytes(_resources())
+    archive = load_director_archive(io.BytesIO(data), resource_cache=ResourceCache())
+    archive.resources[7]
+    archive.resources[4]
+    assert archive.access_order == [7, 4]
+
+    archive.optimize_layout()
+    assert archive.chunk_order == [6, 5, 7, 4]
+    output = save(archive, Endianness.LITTLE_ENDIAN)
+    assert _layout(output) == [6, 5, 7, 4, 3]
+
+    reloaded = load_director_archive(io.BytesIO(output))
+    for index, resource in _resources().items():
+        if index != 6:
+            assert reloaded.resources[index].data == resource.data
+
+
+def test_explicit_order_ignores_unknown_indices():
+    archive = movie(_resources())
+    archive.optimize_layout([7, 99, 7, 3])
+    assert archive.chunk_order == [6, 5, 7, 99, 3]
+    assert _layout(save(archive)) == [6, 5, 7, 3, 4]
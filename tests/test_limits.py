@@ -0,0 +1,80 @@
+import io
+import struct
+
+import pytest
+
+from directorfile.archive.application import load_file_table
+from directorfile.archive.director import load_director_archive, load_memory_map
+from directorfile.common import LimitExceededError, ParsingError, ParsingLimits, ValidationLevel
+from directorfile.projector import load_projector
+
+from helpers import application, generic, movie, movie_bytes, projector_bytes, xtra
+
+
+def _movie_data():
+    return movie_bytes({3: generic('STXT', b'x' * 100), 4: generic('BITD', b'y' * 50)})
+
+
+def _patch_mmap_header(data: bytes, offset: int, value: int) -> bytes:
+    _, imap, _ = load_memory_map(io.BytesIO(data))
+    patched = bytearray(data)
+    struct.pack_into('>i', patched, imap.mmap_position + 8 + offset, value)
+    return bytes(patched)
+
+
+def test_limits_are_reusable_across_loads():
+    limits = ParsingLimits(max_total_size=200)
+    for _ in range(3):
+        load_director_archive(io.BytesIO(_movie_data()), limits=limits)
+
+
+@pytest.mark.parametrize('limits', [
+    ParsingLimits(max_chunk_size=60),
+    ParsingLimits(max_entries=4),
+    ParsingLimits(max_total_size=120),
+])
+def test_limits_are_enforced(limits):
+    with pytest.raises(LimitExceededError):
+        load_director_archive(io.BytesIO(_movie_data()), limits=limits)
+
+
+def test_nesting_depth():
+    data = projector_bytes(application(movies=[('movie.dir', movie({3: generic('STXT', b'text')}))]))
+    load_projector(io.BytesIO(data), limits=ParsingLimits(max_nesting_depth=2))
+    with pytest.raises(LimitExceededError):
+        load_projector(io.BytesIO(data), limits=ParsingLimits(max_nesting_depth=1))
+
+
+def test_decompression_bomb():
+    data = projector_bytes(application([xtra('bomb.x32', bytes(1 << 20))]))
+    load_projector(io.BytesIO(data))
+    with pytest.raises(LimitExceededError):
+        load_projector(io.BytesIO(data), limits=ParsingLimits(max_decompressed_size=1 << 16))
+
+
+@pytest.mark.parametrize('offset, value', [(0x0c, 99), (0x10, 99), (0x14, -5)])
+def test_junk_and_free_indices_out_of_range(offset, value):
+    data = _patch_mmap_header(_movie_data(), offset, value)
+    with pytest.raises(ParsingError):
+        load_director_archive(io.BytesIO(data))
+    load_director_archive(io.BytesIO(data), validation=ValidationLevel.TRUSTED)
+
+
+@pytest.mark.parametrize('validation', list(ValidationLevel))
+def test_memory_map_without_archive_entries(validation):
+    data = _patch_mmap_header(_movie_data(), 0x08, 2)
+    with pytest.raises(ParsingError):
+        load_director_archive(io.BytesIO(data), validation=validation)
+
+
+@pytest.mark.parametrize('validation', list(ValidationLevel))
+def test_file_table_errors(validation):
+    data = bytearray(projector_bytes(application([xtra('a.x32', b'data')])))
+    _, _, mmap = load_memory_map(io.BytesIO(bytes(data)), 0x2008)
+    list_position = mmap.entries[3].position + 8 + 0x14
+    for entry_index, file_type in ((99, 2), (6, 7)):
+        struct.pack_into('<II', data, list_position, entry_index, file_type)
+        with pytest.raises(ParsingError):
+            load_projector(io.BytesIO(bytes(data)), validation=validation)
+        with pytest.raises(ParsingError):
+            load_file_table(io.BytesIO(bytes(data)), mmap)
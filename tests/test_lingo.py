@@ -0,0 +1,163 @@
+import io
+import struct
+
+import pytest
+
+from directorfile.archive.director import load_director_archive
+from directorfile.archive.lingo import LegacyScriptContextResource, LingoOpcode, NameTableResource, ScriptIndex, \
+    ScriptResource, decode_bytecode
+from directorfile.common import Endianness, ParsingError
+
+from helpers import generic, movie_bytes
+
+NAMES = ['mouseUp', 'go', 'x', 'myProp', 'y', 'put']
+# pushint8 5; setlocal 0; pushcons 0; pusharglist 1; extcall go; pushint16 -2; ret
+BYTECODE = bytes([0x41, 5, 0x52, 0, 0x44, 0, 0x43, 1, 0x57, 1, 0xae, 0xff, 0xfe, 0x01])
+SCRIPT_HEADER_SIZE = 92
+
+
+def lnam(names):
+    body = b''.join(bytes([len(name)]) + name.encode('latin-1') for name in names)
+    return generic('Lnam', struct.pack('>iiIIHH', 0, 0, len(body) + 20, len(body) + 20, 20, len(names)) + body)
+
+
+def lctx(names_index, script_indices, tag='LctX'):
+    header = struct.pack('>iiIIHhiiiiHHh', 0, 0, len(script_indices), len(script_indices), 42, 12, 0, 0, 0,
+                         names_index, len(script_indices), 0, -1)
+    return generic(tag, header + b''.join(struct.pack('>iiHH', 0, index, 4, 0) for index in script_indices))
+
+
+def lscr(handlers, properties=(), literals=(), stack_height=True, script_number=1):
+    body = bytearray()
+
+    def add(data: bytes) -> int:
+        offset = SCRIPT_HEADER_SIZE + len(body)
+        body.extend(data)
+        if len(body) % 2:
+            body.append(0)
+        return offset
+
+    properties_offset = add(struct.pack(f'>{len(properties)}h', *properties))
+    records = []
+    for name_id, arguments, local_names, bytecode in handlers:
+        bytecode_offset = add(bytecode)
+        arguments_offset = add(struct.pack(f'>{len(arguments)}h', *arguments))
+        locals_offset = add(struct.pack(f'>{len(local_names)}h', *local_names))
+        records.append((name_id, 0, len(bytecode), bytecode_offset, len(arguments), arguments_offset,
+                        len(local_names), locals_offset, 0, 0, 0, 0, 0, 0) + ((7,) if stack_height else ()))
+    record_format = '>hHIIHIHIHIIHHI' + ('I' if stack_height else '')
+    handlers_offset = add(b''.join(struct.pack(record_format, *record) for record in records))
+
+    literal_records, literal_data = [], bytearray()
+    for literal in literals:
+        if isinstance(literal, int):
+            literal_records.append((4, literal))
+        elif isinstance(literal, str):
+            value = literal.encode('latin-1') + b'\x00'
+            literal_records.append((1, len(literal_data)))
+            literal_data += struct.pack('>I', len(value)) + value
+        else:
+            literal_records.append((9, len(literal_data)))
+            literal_data += struct.pack('>Id', 8, literal)
+    literals_offset = add(b''.join(struct.pack('>Ii', *record) for record in literal_records))
+    literals_data_offset = add(bytes(literal_data))
+
+    header = bytearray(SCRIPT_HEADER_SIZE)
+    struct.pack_into('>IIHH', header, 8, SCRIPT_HEADER_SIZE + len(body), SCRIPT_HEADER_SIZE + len(body),
+                     SCRIPT_HEADER_SIZE, script_number)
+    struct.pack_into('>IhihHIIHIHIHIHIII', header, 38, 0, 0, 1, -1, 0, 0, 0, len(properties), properties_offset, 0,
+                     properties_offset, len(records), handlers_offset, len(literal_records), literals_offset,
+                     len(literal_data), literals_data_offset)
+    return generic('Lscr', bytes(header + body))
+
+
+def _archive(resources, endianness=Endianness.LITTLE_ENDIAN):
+    return load_director_archive(io.BytesIO(movie_bytes(resources, endianness)))
+
+
+def _script_archive(endianness=Endianness.LITTLE_ENDIAN):
+    return _archive({
+        3: lnam(NAMES),
+        4: lctx(3, [5, 6]),
+        5: lscr([(0, [2], [4], BYTECODE)], [3], ['hello', 42, 1.5]),
+        6: lscr([(1, [], [], b'\x01')], script_number=2),
+    }, endianness)
+
+
+def test_name_table():
+    archive = _archive({3: lnam(NAMES)})
+    assert isinstance(archive.resources[3], NameTableResource)
+    assert archive.resources[3].names == NAMES
+
+
+@pytest.mark.parametrize('endianness', list(Endianness))
+def test_script_index(endianness):
+    index = ScriptIndex(_script_archive(endianness))
+    assert index.script_indices == [5, 6]
+    assert index.names(5) == NAMES
+    assert index.properties(5) == ['myProp']
+
+    script = index.script(5)
+    assert isinstance(script, ScriptResource)
+    assert script.script_number == 1
+    assert script.literals == ['hello', 42, 1.5]
+
+    handler, = index.handlers(5)
+    assert (handler.name, handler.arguments, handler.locals, handler.globals) == ('mouseUp', ['x'], ['y'], [])
+    assert [(handler.name, script_index) for script_index, handler in index.iter_handlers()] == [
+        ('mouseUp', 5), ('go', 6)]
+
+
+def test_instructions():
+    handler, = ScriptIndex(_script_archive()).handlers(5)
+    assert [(instruction.opcode, instruction.operand, instruction.name) for instruction in handler.instructions] == [
+        (LingoOpcode.PUSH_INT8, 5, None),
+        (LingoOpcode.SET_LOCAL, 0, None),
+        (LingoOpcode.PUSH_CONS, 0, None),
+        (LingoOpcode.PUSH_ARG_LIST, 1, None),
+        (LingoOpcode.EXT_CALL, 1, 'go'),
+        (LingoOpcode.PUSH_INT16, -2, None),
+        (LingoOpcode.RET, None, None),
+    ]
+    assert [instruction.offset for instruction in handler.instructions] == [0, 2, 4, 6, 8, 10, 13]
+
+
+def test_decode_bytecode_operand_sizes():
+    instructions = decode_bytecode(bytes([0xc1, 0xff, 0xff, 0xff, 0xff, 0xc9, 0, 0, 0, 2, 0x3f]), NAMES)
+    assert [(instruction.opcode, instruction.operand, instruction.name) for instruction in instructions] == [
+        (LingoOpcode.PUSH_INT8, -1, None),
+        (LingoOpcode.GET_GLOBAL, 2, 'x'),
+        (0x3f, None, None),
+    ]
+
+
+def test_legacy_context_handlers_have_no_stack_height():
+    archive = _archive({
+        3: lnam(NAMES),
+        4: lctx(3, [5], 'Lctx'),
+        5: lscr([(4, [0], [], b'\x01')], stack_height=False),
+    })
+    index = ScriptIndex(archive)
+    assert isinstance(index.context_of(5), LegacyScriptContextResource)
+    handler, = index.handlers(5)
+    assert (handler.name, handler.arguments) == ('y', ['mouseUp'])
+
+
+def test_old_scripts_are_kept_raw():
+    archive = _archive({3: generic('Lscr', b'\x00' * 40)})
+    assert archive.resources[3].data == b'\x00' * 40
+    assert archive.resources[3].literals == []
+
+
+def test_malformed_resources_raise_parsing_errors():
+    archive = _archive({3: generic('Lnam', b'short'), 4: lctx(3, [5]), 5: lscr([])})
+    with pytest.raises(ParsingError):
+        ScriptIndex(archive).names(5)
+
+    script = lscr([], literals=['text'])
+    data = bytearray(script.data)
+    literals_offset, = struct.unpack_from('>I', data, 38 + 42)
+    struct.pack_into('>i', data, literals_offset + 4, 1000)
+    archive = _archive({3: lnam(NAMES), 4: lctx(3, [5]), 5: generic('Lscr', bytes(data))})
+    with pytest.raises(ParsingError):
+        ScriptIndex(archive).script(5).literals
@@ -0,0 +1,85 @@
+import io
+import json
+
+from directorfile.archive.application import FileType
+from directorfile.archive.director import load_director_archive, load_memory_map
+from directorfile.plan import WorkItem, WorkPlan, create_work_plan, execute_plan
+
+from helpers import application, generic, movie, movie_bytes, projector_bytes, xtra
+
+
+def _projector():
+    movies = [('movies\\intro.dir', movie({3: generic('STXT', b'intro')})),
+              ('other\\intro.dir', movie({3: generic('STXT', b'other'), 4: generic('BITD', b'\x01\x02')}))]
+    return projector_bytes(application([xtra('Xtras\\a.x32', b'MZ' + bytes(300))], movies))
+
+
+def _plan(data: bytes) -> WorkPlan:
+    fp = io.BytesIO(data)
+    fp.name = 'projector.exe'
+    return create_work_plan(fp)
+
+
+def test_projector_plan():
+    plan = _plan(_projector())
+    assert plan.archive_type == 'APPL'
+    assert [(item.filename, item.file_type) for item in plan.items] == [
+        ('Xtras\\a.x32', FileType.XTRA),
+        ('movies\\intro.dir', FileType.DIRECTOR_MOVIE),
+        ('other\\intro.dir', FileType.DIRECTOR_MOVIE),
+    ]
+    names = [item.output_name for item in plan.items]
+    assert names == ['6_a.x32', '7_intro.dir', '8_intro.dir']
+
+
+def test_movie_plan_names_chunks_by_index():
+    plan = _plan(movie_bytes({3: generic('STXT', b'text'), 4: generic('KEY*', b'')}))
+    assert [item.output_name for item in plan.items] == ['3.STXT', '4.KEY_']
+
+
+def test_split_balances_sizes():
+    items = [WorkItem(i, 'STXT', position=i * 100, size=size) for i, size in enumerate([50, 40, 30, 20, 10])]
+    shards = WorkPlan('source', 0, 'MV93', items).split(2)
+
+    assert sorted(shard.total_size for shard in shards) == [70, 80]
+    assert sorted(item.index for shard in shards for item in shard.items) == [0, 1, 2, 3, 4]
+    for shard in shards:
+        assert [item.position for item in shard.items] == sorted(item.position for item in shard.items)
+
+
+def test_plan_serialization():
+    plan = _plan(_projector())
+    restored = WorkPlan.from_dict(json.loads(json.dumps(plan.to_dict())))
+    assert restored == plan
+
+
+def test_execute_plan(tmp_path):
+    data = _projector()
+    plan = _plan(data)
+    paths = []
+    for shard in plan.split(2):
+        paths += execute_plan(shard, str(tmp_path), io.BytesIO(data))
+
+    outputs = {path.rsplit('/', 1)[-1]: open(path, 'rb').read() for path in paths}
+    assert outputs['6_a.x32'] == b'MZ' + bytes(300)
+
+    # Embedded movies are copied byte for byte, apart from their relocated positions
+    item = plan.items[2]
+    embedded = data[item.position - 8:item.position + item.size]
+    other = load_director_archive(io.BytesIO(outputs['8_intro.dir']))
+    text_position = load_memory_map(io.BytesIO(outputs['8_intro.dir']))[2].entries[3].position
+    assert len(outputs['8_intro.dir']) == len(embedded)
+    assert outputs['8_intro.dir'][text_position:] == embedded[text_position:]
+    assert other.resources[3].data == b'other'
+    assert other.resources[4].data == b'\x01\x02'
+    assert load_director_archive(io.BytesIO(outputs['7_intro.dir'])).resources[3].data == b'intro'
+
+
+def test_execute_plan_on_movie(tmp_path):
+    data = movie_bytes({3: generic('STXT', b'text')})
+    path = tmp_path / 'movie.dir'
+    path.write_bytes(data)
+    with open(path, 'rb') as fp:
+        plan = create_work_plan(fp)
+    paths = execute_plan(plan, str(tmp_path / 'out'))
+    assert [open(path, 'rb').read() for path in paths] == [b'text']
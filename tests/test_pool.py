@@ -0,0 +1,112 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from directorfile.archive.cache import ResourceCache
+from directorfile.archive.director import load_director_archive
+from directorfile.pool import FileHandlePool, StaleFileError
+from directorfile.projector import load_projector
+
+from helpers import application, generic, movie, movie_bytes, projector_bytes, xtra
+
+
+def _files(tmp_path, count: int, size: int = 0x100):
+    paths = []
+    for i in range(count):
+        path = tmp_path / f'{i}.bin'
+        path.write_bytes(bytes([i]) * size)
+        paths.append(str(path))
+    return paths
+
+
+def test_least_recently_used_handle_is_closed(tmp_path):
+    a, b, c = _files(tmp_path, 3)
+    pool = FileHandlePool(2)
+    fa, fb = pool.open(a), pool.open(b)
+    assert fa.read(4) == b'\x00' * 4
+    fc = pool.open(c)
+
+    assert len(pool) == 2
+    assert pool.statistics.closes == 1
+    # The closed handle is reopened by path on the next read
+    assert fb.read(2) == b'\x01\x01'
+    assert fc.read(2) == b'\x02\x02'
+    assert fa.read() == b'\x00' * 0xfc
+    assert len(pool) == 2
+    assert (pool.statistics.opens, pool.statistics.closes) == (5, 3)
+
+
+def test_invalid_size():
+    with pytest.raises(ValueError):
+        FileHandlePool(0)
+
+
+def test_unbuffered_seek(tmp_path):
+    path = tmp_path / 'data.bin'
+    path.write_bytes(bytes(range(16)))
+    fp = FileHandlePool().open(path, buffering=0)
+    assert fp.seek(-4, os.SEEK_END) == 12
+    assert fp.read(2) == b'\x0c\x0d'
+    assert fp.seek(-6, os.SEEK_CUR) == 8
+    assert fp.read(100) == bytes(range(8, 16))
+    with pytest.raises(ValueError):
+        fp.seek(-1)
+
+
+def test_rewritten_file_is_stale(tmp_path):
+    path, = _files(tmp_path, 1)
+    pool = FileHandlePool()
+    fp = pool.open(path, buffering=0)
+    assert fp.read(1) == b'\x00'
+
+    with open(path, 'r+b') as rewritten:
+        rewritten.write(b'\xff')
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    with pytest.raises(StaleFileError):
+        fp.read(1)
+    assert pool.open(path).read(1) == b'\xff'
+
+    with open(path, 'ab') as appended:
+        appended.write(b'tail')
+    with pytest.raises(StaleFileError):
+        fp.read(1)
+
+
+def test_concurrent_reads(tmp_path):
+    paths = _files(tmp_path, 8, 0x1000)
+    pool = FileHandlePool(3)
+
+    def read(i: int) -> bool:
+        fp = pool.open(paths[i % len(paths)], buffering=0)
+        fp.seek(i % 0x100)
+        return fp.read(0x800) == bytes([i % len(paths)]) * 0x800
+
+    with ThreadPoolExecutor(8) as executor:
+        assert all(executor.map(read, range(200)))
+    assert len(pool) <= 3
+
+
+def test_lazy_archives_share_the_pool(tmp_path):
+    paths = []
+    for i in range(4):
+        path = tmp_path / f'{i}.dir'
+        path.write_bytes(movie_bytes({3: generic('STXT', bytes([i]) * 8)}))
+        paths.append(path)
+
+    pool = FileHandlePool(2)
+    archives = [load_director_archive(pool.open(path), ResourceCache(0)) for path in paths]
+    assert len(pool) == 2
+    assert [archive.resources[3].data for archive in archives] == [bytes([i]) * 8 for i in range(4)]
+    assert len(pool) == 2
+
+
+def test_projector_through_the_pool(tmp_path):
+    path = tmp_path / 'projector.exe'
+    path.write_bytes(projector_bytes(application([xtra('Sound.x32', b'xtra')],
+                                                 [('intro.dir', movie({3: generic('STXT', b'x')}))])))
+    projector = load_projector(FileHandlePool(1).open(path))
+    assert projector.application.xtras[0][1].data == b'xtra'
+    assert projector.application.movies[0][1].resources[3].data == b'x'
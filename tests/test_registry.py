@@ -0,0 +1,106 @@
+import io
+import os
+import subprocess
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+import directorfile
+from directorfile.archive import registry
+from directorfile.archive.director import DirectorArchiveParser, GenericResource, load_director_archive
+from directorfile.archive.registry import DIRECTOR_RESOURCES, ParserRegistry, ResourceRegistry, register_resource, \
+    resolve_class
+from directorfile.archive.text import TextResource
+
+from helpers import generic, movie_bytes
+
+
+class MarkerResource(GenericResource):
+    TAG = 'MARK'
+
+    def __init__(self):
+        super().__init__(MarkerResource.TAG)
+
+
+def _run(code: str) -> str:
+    source_path = os.path.dirname(os.path.dirname(directorfile.__file__))
+    return subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                          env={**os.environ, 'PYTHONPATH': source_path}).stdout
+
+
+def test_resolve_class():
+    assert resolve_class('directorfile.archive.text:TextResource') is TextResource
+    assert resolve_class('directorfile.archive.director:MMapResource.Entry').__name__ == 'Entry'
+    assert resolve_class(TextResource) is TextResource
+
+
+def test_resource_registry_resolves_on_first_use():
+    resources = ResourceRegistry({'MARK': f'{__name__}:MarkerResource'})
+    assert resources.get('MARK') is MarkerResource
+    assert resources.get('NONE') is None
+    assert resources.get('NONE', GenericResource) is GenericResource
+
+
+def test_parser_registry_matches_types():
+    parsers = ParserRegistry(['directorfile.archive.director:DirectorArchiveParser'])
+    assert parsers.get('MV93') is DirectorArchiveParser
+    assert parsers.get('APPL') is None
+
+    parsers.register('directorfile.archive.application:ApplicationArchiveParser')
+    assert parsers.get('APPL').__name__ == 'ApplicationArchiveParser'
+
+
+def test_register_resource(monkeypatch):
+    monkeypatch.setattr(DIRECTOR_RESOURCES, '_references', dict(DIRECTOR_RESOURCES._references))
+    data = movie_bytes({3: generic('MARK', b'marker')})
+    assert type(load_director_archive(io.BytesIO(data)).resources[3]) is GenericResource
+
+    register_resource('MARK', f'{__name__}:MarkerResource')
+    resource = load_director_archive(io.BytesIO(data)).resources[3]
+    assert isinstance(resource, MarkerResource)
+    assert resource.data == b'marker'
+
+
+def test_entry_points_are_loaded_on_request(monkeypatch):
+    groups = []
+
+    def iter_entry_points(group):
+        groups.append(group)
+        if group == registry.RESOURCE_ENTRY_POINT_GROUP:
+            return [SimpleNamespace(name='MARK', value=f'{__name__}:MarkerResource'),
+                    SimpleNamespace(name='STXT', value=f'{__name__}:MarkerResource')]
+        return [SimpleNamespace(name='parser', value='directorfile.archive.application:ApplicationArchiveParser')]
+
+    monkeypatch.setattr(registry, '_iter_entry_points', iter_entry_points)
+    resources = ResourceRegistry({'STXT': TextResource})
+    parsers = ParserRegistry()
+    assert not groups
+
+    monkeypatch.setattr(registry, 'DIRECTOR_RESOURCES', resources)
+    monkeypatch.setattr(registry, 'ARCHIVE_PARSERS', parsers)
+    registry.load_entry_points()
+
+    assert sorted(groups) == sorted([registry.PARSER_ENTRY_POINT_GROUP, registry.RESOURCE_ENTRY_POINT_GROUP])
+    assert resources.get('MARK') is MarkerResource
+    # Entry points do not replace the built-in resources
+    assert resources.get('STXT') is TextResource
+    assert parsers.get('APPL').__name__ == 'ApplicationArchiveParser'
+
+
+def test_package_imports_lazily():
+    loaded = _run('import sys, directorfile, directorfile.archive; '
+                  'print(sorted(name for name in sys.modules if name.startswith("directorfile.")))')
+    assert loaded.split() == ["['directorfile.archive',", "'directorfile.archive.registry']"]
+
+
+@pytest.mark.parametrize('package', ['directorfile', 'directorfile.archive'])
+def test_star_import_exports_all(package):
+    output = _run(f'import {package} as package; from {package} import *; '
+                  f'print(all(globals()[name] is getattr(package, name) for name in package.__all__))')
+    assert output.strip() == 'True'
+
+
+def test_unknown_attribute():
+    with pytest.raises(AttributeError):
+        directorfile.missing
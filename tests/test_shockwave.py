@@ -0,0 +1,118 @@
+import io
+import struct
+import zlib
+
+import pytest
+
+from directorfile.archive.cast import KeyTableResource
+from directorfile.archive.director import load_director_archive
+from directorfile.archive.shockwave import ShockwaveArchiveSerializer, save_shockwave_archive
+from directorfile.common import Endianness
+
+from helpers import DIRECTOR_VERSION, generic, movie_bytes
+
+UNLOADED_OFFSET = ShockwaveArchiveSerializer.UNLOADED_OFFSET
+
+
+class Reader:
+    def __init__(self, data: bytes, endianness: Endianness):
+        self.data = data
+        self.position = 0
+        self.endianness = endianness
+
+    def read(self, size: int) -> bytes:
+        data = self.data[self.position:self.position + size]
+        self.position += size
+        return data
+
+    def tag(self) -> str:
+        tag = self.read(4).decode('ascii')
+        return tag if self.endianness == Endianness.BIG_ENDIAN else tag[::-1]
+
+    def varint(self) -> int:
+        value = 0
+        while True:
+            byte = self.read(1)[0]
+            value = (value << 7) | (byte & 0x7f)
+            if not byte & 0x80:
+                return value
+
+
+def _read_shockwave(data: bytes, endianness: Endianness):
+    reader = Reader(data, endianness)
+    assert reader.tag() == 'RIFX'
+    size, = struct.unpack(endianness + 'I', reader.read(4))
+    assert size == len(data) - 8
+    assert reader.tag() == 'FGDM'
+
+    sections = {}
+    for tag in ('Fver', 'Fcdr', 'ABMP'):
+        assert reader.tag() == tag
+        sections[tag] = reader.read(reader.varint())
+    assert reader.tag() == 'FGEI'
+    assert reader.varint() == 0
+    body = data[reader.position:]
+
+    version = Reader(sections['Fver'], endianness)
+    assert (version.varint(), version.varint(), version.varint()) == (0x501, 0, DIRECTOR_VERSION)
+    assert b'zlib\x00' in zlib.decompress(sections['Fcdr'])
+
+    resource_map = Reader(sections['ABMP'], endianness)
+    assert resource_map.varint() == 0
+    map_size = resource_map.varint()
+    entries_data = zlib.decompress(sections['ABMP'][resource_map.position:])
+    assert len(entries_data) == map_size
+
+    entries = Reader(entries_data, endianness)
+    entries.varint(), entries.varint()
+    chunks = {}
+    for _ in range(entries.varint()):
+        index, offset, compressed_size, uncompressed_size, compression = (entries.varint() for _ in range(5))
+        chunks[index] = (offset, compressed_size, uncompressed_size, compression, entries.tag())
+    return chunks, body
+
+
+def _decode_chunks(chunks, body):
+    ils_offset, ils_size, ils_uncompressed_size, _, tag = chunks.pop(2)
+    assert (ils_offset, tag) == (0, 'ILS ')
+    ils = Reader(zlib.decompress(body[:ils_size]), Endianness.BIG_ENDIAN)
+    assert len(ils.data) == ils_uncompressed_size
+
+    payloads = {}
+    while ils.position < len(ils.data):
+        index = ils.varint()
+        payloads[index] = ils.read(chunks[index][2])
+    for index, (offset, compressed_size, uncompressed_size, compression, tag) in chunks.items():
+        if offset == UNLOADED_OFFSET:
+            continue
+        payload = body[offset:offset + compressed_size]
+        payloads[index] = zlib.decompress(payload) if compression == 0 else payload
+        assert len(payloads[index]) == uncompressed_size
+    return payloads
+
+
+@pytest.mark.parametrize('endianness', list(Endianness))
+def test_shockwave_round_trip(endianness):
+    resources = {
+        3: KeyTableResource(),
+        4: generic('VWSC', b'score' * 20),
+        5: generic('STXT', b'text ' * 100),
+        6: generic('BITD', bytes(range(256))),
+    }
+    archive = load_director_archive(io.BytesIO(movie_bytes(resources, endianness)))
+    output = io.BytesIO()
+    save_shockwave_archive(archive, output, endianness, max_workers=2)
+
+    chunks, body = _read_shockwave(output.getvalue(), endianness)
+    assert {index: chunk[4] for index, chunk in chunks.items()} == {
+        2: 'ILS ', 3: 'KEY*', 4: 'VWSC', 5: 'STXT', 6: 'BITD'}
+    # Startup chunks are stored in the initial load segment, the rest are streamed
+    assert [index for index, chunk in chunks.items() if chunk[0] == UNLOADED_OFFSET] == [3, 4]
+    # The text shrinks and is compressed, while the incompressible bitmap is stored as is
+    assert (chunks[5][3], chunks[6][3]) == (0, 1)
+
+    payloads = _decode_chunks(chunks, body)
+    assert payloads[4] == b'score' * 20
+    assert payloads[5] == b'text ' * 100
+    assert payloads[6] == bytes(range(256))
+    assert payloads[3] == struct.pack(endianness + 'HHII', 0x0c, 0x0c, 0, 0)
@@ -0,0 +1,94 @@
+import io
+import json
+import struct
+
+import pytest
+
+from directorfile.archive.director import load_director_archive
+from directorfile.archive.text import TextEncoding, TextResource
+from directorfile.common import Endianness, ParsingLimits
+from directorfile.fulltext import extract_text, iter_archive_text, iter_corpus_text, main
+
+from helpers import application, generic, movie, movie_bytes, projector_bytes
+
+
+def stxt(text: bytes, formatting: bytes = b'') -> bytes:
+    return struct.pack('>III', 12, len(text), len(formatting)) + text + formatting
+
+
+def key_table(entries):
+    return generic('KEY*', struct.pack('>HHII', 0x0c, 0x0c, len(entries), len(entries)) +
+                   b''.join(struct.pack('>II4s', index, owner, tag.encode()) for index, owner, tag in entries))
+
+
+def _text_movie(endianness=Endianness.BIG_ENDIAN):
+    return movie_bytes({
+        3: generic('STXT', stxt(b'caf\x8e\rline', b'\x00\x01')),
+        4: key_table([(5, 1024, 'CAS*'), (3, 7, 'STXT')]),
+        5: generic('CAS*', struct.pack('>2I', 0, 7)),
+        6: generic('STXT', b'xy'),
+    }, endianness)
+
+
+@pytest.mark.parametrize('endianness, text', [
+    (Endianness.BIG_ENDIAN, 'café\nline'),
+    (Endianness.LITTLE_ENDIAN, 'cafŽ\nline'),
+])
+def test_text_resource(endianness, text):
+    archive = load_director_archive(io.BytesIO(_text_movie(endianness)))
+    resource = archive.resources[3]
+    assert isinstance(resource, TextResource)
+    assert resource.encoding == TextEncoding.for_endianness(endianness)
+    assert resource.text == text
+    assert resource.formatting == b'\x00\x01'
+    assert resource.decode('mac_roman') == 'café\nline'
+
+    assert archive.resources[6].text_data == b''
+    assert archive.resources[6].data == b'xy'
+
+
+def test_archive_text_records():
+    records = list(iter_archive_text(io.BytesIO(_text_movie()), 'movie.dir'))
+    assert [(record.source, record.index, record.member, record.text) for record in records] == [
+        ('movie.dir', 3, 2, 'café\nline'),
+        ('movie.dir', 6, None, ''),
+    ]
+
+
+def test_projector_text(tmp_path):
+    text_movie = movie({3: generic('STXT', stxt(b'inside'))})
+    path = tmp_path / 'projector.exe'
+    path.write_bytes(projector_bytes(application(movies=[('movies\\intro.dir', text_movie)])))
+
+    record, = extract_text(str(path), encoding='cp1252')
+    assert (record.source, record.filename, record.text) == (str(path), 'movies\\intro.dir', 'inside')
+
+
+def test_corpus_skips_unreadable_files(tmp_path, capsys):
+    good = tmp_path / 'good.dir'
+    good.write_bytes(_text_movie())
+    bad = tmp_path / 'bad.dir'
+    bad.write_bytes(_text_movie()[:40])
+    missing = tmp_path / 'missing.dir'
+
+    errors = []
+    records = list(iter_corpus_text([str(bad), str(good), str(missing)], max_workers=2,
+                                    on_error=lambda path, error: errors.append(path)))
+    assert [record.text for record in records] == ['café\nline', '']
+    assert errors == [str(bad), str(missing)]
+
+    assert main([str(good), str(bad), '--workers', '1']) == 1
+    captured = capsys.readouterr()
+    assert [json.loads(line)['index'] for line in captured.out.splitlines()] == [3, 6]
+    assert captured.err.startswith(f'{bad}: ')
+
+
+def test_corpus_limits(tmp_path):
+    path = tmp_path / 'movie.dir'
+    path.write_bytes(_text_movie())
+
+    errors = []
+    records = list(iter_corpus_text([str(path)], max_workers=1, limits=ParsingLimits(max_entries=2),
+                                    on_error=lambda path, error: errors.append(error)))
+    assert records == []
+    assert len(errors) == 1 and errors[0].endswith('exceed the limit of 2')
@@ -0,0 +1,69 @@
+import io
+import struct
+
+import pytest
+
+from directorfile.archive.cast import KeyTableResource
+from directorfile.archive.director import GenericResource, load_director_archive, load_memory_map
+from directorfile.archive.lingo import LegacyScriptContextResource, NameTableResource, ScriptContextResource
+from directorfile.common import Endianness, ParsingError, ValidationLevel
+
+from helpers import generic, movie_bytes
+
+SHORT_CHUNKS = [
+    (NameTableResource, b'\x00' * 8),
+    (ScriptContextResource, b'\x00' * 20),
+    (LegacyScriptContextResource, b'\x00' * 20),
+    (KeyTableResource, b'\x00\x0c\x00\x0c'),
+]
+
+
+def _chunk(tag: str, data: bytes) -> bytes:
+    return tag.encode('ascii') + struct.pack('>I', len(data)) + data + b'\xff' * 64
+
+
+def _load(data: bytes, validation: ValidationLevel):
+    return load_director_archive(io.BytesIO(data), validation=validation)
+
+
+def test_trusted_mode_skips_consistency_checks():
+    data = bytearray(movie_bytes({3: generic('STXT', b'text')}))
+    _, imap, _ = load_memory_map(io.BytesIO(bytes(data)))
+    # The imap entry of the mmap is renamed
+    struct.pack_into('>4s', data, imap.mmap_position + 8 + 0x18 + 0x14, b'pami')
+
+    with pytest.raises(ParsingError):
+        _load(bytes(data), ValidationLevel.STRICT)
+    assert _load(bytes(data), ValidationLevel.TRUSTED).resources[3].data == b'text'
+
+
+def test_trusted_mode_skips_header_constants():
+    data = bytearray(movie_bytes({3: generic('STXT', b'text')}))
+    _, imap, _ = load_memory_map(io.BytesIO(bytes(data)))
+    struct.pack_into('>H', data, imap.mmap_position + 8, 0x20)
+
+    with pytest.raises(ParsingError):
+        _load(bytes(data), ValidationLevel.STRICT)
+    assert _load(bytes(data), ValidationLevel.TRUSTED).resources[3].data == b'text'
+
+
+@pytest.mark.parametrize('validation', list(ValidationLevel))
+@pytest.mark.parametrize('resource_class, data', SHORT_CHUNKS)
+def test_short_chunks_are_rejected_at_every_level(resource_class, data, validation):
+    with pytest.raises(ParsingError):
+        resource_class().load(io.BytesIO(_chunk(resource_class.TAG, data)), 0, validation=validation)
+
+
+@pytest.mark.parametrize('validation', list(ValidationLevel))
+def test_key_table_length_must_fit_its_allocation(validation):
+    data = struct.pack('>HHII', 0x0c, 0x0c, 1, 2) + bytes(24)
+    with pytest.raises(ParsingError):
+        KeyTableResource().load(io.BytesIO(_chunk('KEY*', data)), 0, validation=validation)
+
+
+@pytest.mark.parametrize('validation', list(ValidationLevel))
+@pytest.mark.parametrize('resource_class, data', SHORT_CHUNKS)
+def test_short_chunks_in_archives_are_kept_raw(resource_class, data, validation):
+    archive = _load(movie_bytes({3: generic(resource_class.TAG, data)}, Endianness.BIG_ENDIAN), validation)
+    assert type(archive.resources[3]) is GenericResource
+    assert archive.resources[3].data == data
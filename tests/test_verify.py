@@ -0,0 +1,93 @@
+import io
+import struct
+import zlib
+
+from directorfile.archive.director import load_memory_map
+from directorfile.verify import main, verify_archive
+
+from helpers import application, generic, movie_bytes, patch_mmap_entry, projector_bytes, xtra
+
+
+def _movie():
+    return movie_bytes({3: generic('STXT', b'hello'), 4: generic('BITD', b'\x00' * 32)})
+
+
+def _findings(data: bytes):
+    return [str(finding) for finding in verify_archive(io.BytesIO(data)).findings]
+
+
+def test_valid_movie_has_checksums_for_every_chunk():
+    data = _movie()
+    report = verify_archive(io.BytesIO(data), max_workers=2)
+
+    assert report.ok
+    _, _, mmap = load_memory_map(io.BytesIO(data))
+    by_index = report.checksums
+    for entry in mmap.entries[3:]:
+        payload = data[entry.position + 8:entry.position + 8 + entry.size]
+        assert by_index[entry.index] == zlib.crc32(payload)
+
+
+def test_valid_projector():
+    data = projector_bytes(application([xtra('a.x32', b'MZ' + bytes(1000))], [('movie.dir', _movie_resource())]))
+    assert verify_archive(io.BytesIO(data)).ok
+
+
+def _movie_resource():
+    from helpers import movie
+    return movie({3: generic('STXT', b'hello')})
+
+
+def test_chunk_outside_of_the_archive():
+    data = _movie()
+    assert _findings(patch_mmap_entry(data, 3, position=len(data) + 100)) == [
+        '3 STXT: Chunk lies outside of the archive bounds']
+
+
+def test_overlapping_chunks():
+    data = _movie()
+    _, _, mmap = load_memory_map(io.BytesIO(data))
+    findings = _findings(patch_mmap_entry(data, 4, position=mmap.entries[3].position + 2))
+    assert any('overlaps chunk 3' in finding for finding in findings)
+
+
+def test_chunk_header_mismatch():
+    data = _movie()
+    findings = _findings(patch_mmap_entry(data, 3, size=4))
+    assert findings == ['3 STXT: Chunk header size 5 does not match the mmap size 4']
+
+
+def test_empty_memory_map():
+    data = bytearray(_movie())
+    _, imap, _ = load_memory_map(io.BytesIO(bytes(data)))
+    struct.pack_into('>II', data, imap.mmap_position + 8 + 4, 0, 0)
+    assert _findings(bytes(data)) == ['Memory map has no entries']
+
+
+def test_corrupt_xtra_stream():
+    data = bytearray(projector_bytes(application([xtra('a.x32', bytes(range(256)) * 16)])))
+    position = data.index(b'XtraFILE')
+    data[position + 0x28 + 4:position + 0x28 + 12] = b'\xff' * 8
+
+    findings = _findings(bytes(data))
+    assert len(findings) == 1
+    assert 'File: Corrupt Xtra stream' in findings[0]
+
+
+def test_xtra_size_mismatch():
+    data = bytearray(projector_bytes(application([xtra('a.x32', b'payload')])))
+    position = data.index(b'XtraFILE')
+    struct.pack_into('>I', data, position + 0x18, 8)
+
+    assert _findings(bytes(data))[0].endswith('Xtra decompressed to 7 bytes, expected 8')
+
+
+def test_main_exit_code(tmp_path, capsys):
+    path = tmp_path / 'movie.dir'
+    path.write_bytes(_movie())
+    assert main([str(path)]) == 0
+
+    data = _movie()
+    path.write_bytes(patch_mmap_entry(data, 3, position=len(data) + 100))
+    assert main([str(path), '-j', '1']) == 1
+    assert 'outside of the archive bounds' in capsys.readouterr().out
@@ -0,0 +1,78 @@
+import io
+
+import pytest
+
+from directorfile.archive.director import DirectorArchiveResource
+from directorfile.common import BufferedWriteStream, Endianness, EndiannessAwareStream, WriteBuffer, buffered_writer
+
+from helpers import generic, movie, save
+
+
+def _write_all(stream: EndiannessAwareStream):
+    stream.write_tag('RIFX')
+    stream.write_ui16(0xfffe)
+    stream.write_i16(-2)
+    stream.write_ui32(0xdeadbeef)
+    stream.write_i32(-3)
+    stream.write_varint(0x12345)
+    stream.write_string('name')
+    stream.skip(5)
+    stream.write_buffer(b'tail')
+    stream.jump(stream.get_current_pos() - 6)
+    stream.write_ui16(0x0102)
+    stream.jump(stream.get_current_pos() + 4)
+
+
+@pytest.mark.parametrize('endianness', list(Endianness))
+def test_buffered_stream_matches_direct_writes(endianness):
+    direct = io.BytesIO()
+    _write_all(EndiannessAwareStream(direct, endianness))
+
+    buffer = WriteBuffer(capacity=4)
+    _write_all(BufferedWriteStream(buffer, endianness))
+    assert buffer.getvalue() == direct.getvalue()
+    assert buffer.tell() == direct.tell()
+
+
+def test_write_buffer_keeps_absolute_positions():
+    buffer = WriteBuffer(base=0x100)
+    buffer.seek(0x104)
+    buffer.write(b'abc')
+    assert (buffer.tell(), buffer.getvalue()) == (0x107, b'\x00' * 4 + b'abc')
+
+    buffer.seek(0x101)
+    buffer.write(b'x')
+    buffer.seek(2, io.SEEK_END)
+    assert buffer.tell() == 0x109
+    with pytest.raises(ValueError):
+        buffer.seek(0xff)
+
+    fp = io.BytesIO(b'-' * 0x110)
+    buffer.flush_to(fp)
+    assert fp.getvalue()[0x100:0x108] == b'\x00x\x00\x00abc-'
+    assert fp.tell() == 0x109
+
+
+def test_nested_writers_share_one_buffer():
+    fp = io.BytesIO(b'prefix')
+    fp.seek(6)
+    with buffered_writer(fp, Endianness.BIG_ENDIAN) as outer:
+        outer.write_ui32(1)
+        with buffered_writer(outer.fp, Endianness.LITTLE_ENDIAN) as inner:
+            assert inner.fp is outer.fp
+            inner.write_ui32(2)
+        assert fp.getvalue() == b'prefix'
+    assert fp.getvalue() == b'prefix' + b'\x00\x00\x00\x01' + b'\x02\x00\x00\x00'
+
+
+@pytest.mark.parametrize('endianness', list(Endianness))
+def test_archive_saves_at_any_position(endianness):
+    archive = movie({3: generic('STXT', b'text'), 4: generic('BITD', b'\x00' * 1000)})
+    data = save(archive, endianness)
+    prefixed = save(archive, endianness, b'stub' * 3)
+    assert prefixed[:12] == b'stub' * 3
+    assert len(prefixed) == len(data) + 12
+
+    reloaded = DirectorArchiveResource().load(io.BytesIO(prefixed), 12)
+    assert reloaded.resources[3].data == b'text'
+    assert save(reloaded, endianness) == data